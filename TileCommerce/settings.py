@@ -11,16 +11,19 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import re
 from pathlib import Path
 import dj_database_url
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables from a .env file, when there is one; deployed
+# instances set them directly and do not import python-dotenv at startup
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -47,12 +50,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'shop.routers.ReplicaPinningMiddleware',
+    'shop.fastpath.FastPathMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'shop.carts.CartCookieMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,12 +90,42 @@ WSGI_APPLICATION = 'TileCommerce.wsgi.application'
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 # Use dj-database-url for PythonAnywhere MySQL database
+# Connections (see PERFORMANCE_GUIDE.md, "Database Connections"):
+# - by default every worker thread keeps its connection for CONN_MAX_AGE
+#   seconds, checking it still works before the first query of a request
+# - SHOP_DB_POOL=True shares a psycopg 3 pool between the threads of a worker
+#   process instead (PostgreSQL only)
+# - SHOP_DB_PGBOUNCER=True when DATABASE_URL points at PgBouncer in
+#   transaction pooling mode
+def database_from_env(variable):
+    database = dj_database_url.config(
+        env=variable,
+        conn_max_age=int(os.environ.get('CONN_MAX_AGE', '600')),
+        conn_health_checks=os.environ.get('CONN_HEALTH_CHECKS', 'True') == 'True',
+        disable_server_side_cursors=os.environ.get('SHOP_DB_PGBOUNCER', 'False') == 'True',
+    )
+    if os.environ.get('SHOP_DB_POOL', 'False') == 'True':
+        # The pool keeps the connections; Django returns them after each request.
+        # With CONN_HEALTH_CHECKS the pool checks a connection before lending it.
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('SHOP_DB_POOL_MIN_SIZE', '1')),
+            'max_size': int(os.environ.get('SHOP_DB_POOL_MAX_SIZE', '4')),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.environ.get('SHOP_DB_POOL_TIMEOUT', '10')),
+            # Idle connections are closed after this many seconds, down to min_size
+            'max_idle': float(os.environ.get('SHOP_DB_POOL_MAX_IDLE', '600')),
+        }
+    if os.environ.get('SHOP_DB_PGBOUNCER', 'False') == 'True':
+        # Consecutive transactions may run on different server connections, so
+        # prepared statements cannot be reused (server-side cursors are off above)
+        database.setdefault('OPTIONS', {})['prepare_threshold'] = None
+    return database
+
+
 if os.environ.get('DATABASE_URL'):
     DATABASES = {
-        'default': dj_database_url.config(
-            default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600
-        )
+        'default': database_from_env('DATABASE_URL'),
     }
 else:
     # Local development with SQLite
@@ -98,6 +136,45 @@ else:
         }
     }
 
+# Read replicas (shop.routers): every REPLICA*_DATABASE_URL variable adds one,
+# e.g. REPLICA_DATABASE_URL -> 'replica', REPLICA_2_DATABASE_URL -> 'replica_2'.
+# Catalog reads go to a replica, except for PIN_SECONDS after a user's write.
+for _variable in sorted(os.environ):
+    _replica = re.fullmatch(r'(REPLICA\w*)_DATABASE_URL', _variable)
+    if _replica and os.environ[_variable]:
+        DATABASES[_replica.group(1).lower()] = {
+            **database_from_env(_variable),
+            # Tests run against the primary only
+            'TEST': {'MIRROR': 'default'},
+        }
+
+SHOP_REPLICAS = {
+    'DATABASES': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': int(os.environ.get('SHOP_REPLICA_PIN_SECONDS', '5')),
+    'COOKIE': 'shop_primary',
+}
+if SHOP_REPLICAS['DATABASES']:
+    DATABASE_ROUTERS = ['shop.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Rate limit counters must be shared by every worker, so production should
+# set REDIS_URL; the local-memory cache is per process.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -118,6 +195,33 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Authentication
+# Users log in with an email address or a username; see shop.backends.
+
+AUTHENTICATION_BACKENDS = [
+    'shop.backends.EmailOrUsernameBackend',
+]
+
+# The first hasher encodes new passwords; the others only verify old hashes,
+# which are re-encoded with the preferred hasher on the next login.
+# SHOP_PBKDF2_ITERATIONS changes the PBKDF2 work factor (Django's default when unset).
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'shop.hashers.TunablePBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',  # requires argon2-cffi
+}
+_preferred_hasher = os.environ.get('SHOP_PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[_preferred_hasher]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != _preferred_hasher
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+SHOP_PBKDF2_ITERATIONS = int(os.environ.get('SHOP_PBKDF2_ITERATIONS', '0')) or None
+
+# Threads used for password hashing by the async authentication path
+SHOP_AUTH_HASH_THREADS = int(os.environ.get('SHOP_AUTH_HASH_THREADS', '4'))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -132,6 +236,9 @@ USE_TZ = True
 
 # Security settings for production
 SECURE_SSL_REDIRECT = not DEBUG
+# Load balancer probes arrive over plain HTTP; a redirect would pass them
+# without running the checks
+SECURE_REDIRECT_EXEMPT = [r'^healthz$', r'^readyz$']
 SESSION_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_SECURE = not DEBUG
 SECURE_BROWSER_XSS_FILTER = True
@@ -158,3 +265,188 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = 'media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Request instrumentation (shop.middleware.RequestInstrumentationMiddleware)
+# Adds Server-Timing headers and one JSON log line per sampled request.
+SHOP_INSTRUMENTATION = {
+    'ENABLED': os.environ.get('SHOP_INSTRUMENTATION', 'False') == 'True',
+    'SAMPLE_RATE': float(os.environ.get('SHOP_INSTRUMENTATION_SAMPLE_RATE', '1.0')),
+    'SERVER_TIMING': True,
+    # Identical statements repeated this often in one request are logged as N+1 suspects
+    'DUPLICATE_THRESHOLD': 3,
+}
+
+
+# Prometheus-style metrics served at /metrics (shop.metrics)
+# Set SHOP_METRICS_DIR to a directory shared by all gunicorn workers so the
+# endpoint reports every worker, not just the one answering the scrape.
+SHOP_METRICS = {
+    'ENABLED': os.environ.get('SHOP_METRICS', 'False') == 'True',
+    'DIR': os.environ.get('SHOP_METRICS_DIR', ''),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.environ.get('SHOP_METRICS_TOKEN', ''),
+}
+
+
+# Profiling (shop.profiling.ProfilingMiddleware)
+# ENABLED lets staff profile one request with ?__profile=cprofile|stats|sample.
+# SAMPLER runs a background stack sampler in every worker for SAMPLER_DURATION
+# seconds; keep it on only briefly in production.
+SHOP_PROFILING = {
+    'ENABLED': os.environ.get('SHOP_PROFILING', 'False') == 'True',
+    'SAMPLER': os.environ.get('SHOP_PROFILING_SAMPLER', 'False') == 'True',
+    'DIR': os.environ.get('SHOP_PROFILING_DIR', str(BASE_DIR / 'profiles')),
+    'SAMPLE_INTERVAL': 0.01,
+    'SAMPLER_DURATION': int(os.environ.get('SHOP_PROFILING_SAMPLER_DURATION', '300')),
+    'MAX_STACKS': 10000,
+    # Sampling slows down once it costs more than this share of wall time
+    'MAX_OVERHEAD': 0.02,
+}
+
+
+# HTTP caching of catalog pages (shop.catalog)
+# Home, product list and product pages send ETag/Last-Modified and answer
+# revalidations with 304. Anonymous pages may be kept by shared caches (CDNs)
+# for SHARED_MAX_AGE seconds; browsers always revalidate.
+SHOP_HTTP_CACHE = {
+    'SHARED_MAX_AGE': int(os.environ.get('SHOP_SHARED_MAX_AGE', '60')),
+}
+
+
+# Price facets on the product list (shop.facets)
+# Lower bounds of the price buckets; the last bucket is open-ended. Run
+# "manage.py rebuild_facets" after changing them.
+SHOP_PRICE_BUCKETS = (0, 25, 50, 100, 250, 500, 1000)
+
+
+# Search-as-you-type suggestions (shop.autocomplete)
+# Each process keeps an in-memory index of product and category names. It is
+# rebuilt when the catalog version changes, checked at most every
+# CHECK_INTERVAL seconds, and at least every MAX_AGE seconds to refresh
+# popularity. HTTP_MAX_AGE lets browsers and CDNs reuse responses.
+SHOP_AUTOCOMPLETE = {
+    'LIMIT': 8,
+    'MAX_LIMIT': 20,
+    'CATEGORY_LIMIT': 3,
+    'MIN_LENGTH': 1,
+    'CHECK_INTERVAL': int(os.environ.get('SHOP_AUTOCOMPLETE_CHECK_INTERVAL', '5')),
+    'MAX_AGE': int(os.environ.get('SHOP_AUTOCOMPLETE_MAX_AGE', '3600')),
+    'HTTP_MAX_AGE': 60,
+}
+
+
+# Sitemaps and product feed (shop.feeds)
+# "manage.py generate_feeds" writes them to DIR; sitemap.xml, the sitemap
+# chunks and feeds/products.{xml,csv}.gz serve them from there. Links are
+# absolute, so BASE_URL (SHOP_SITE_URL) must be the public site address.
+# CHUNK_SIZE products share one sitemap file (protocol maximum 50,000).
+SHOP_FEEDS = {
+    'DIR': os.environ.get('SHOP_FEEDS_DIR', str(BASE_DIR / 'feeds')),
+    'BASE_URL': os.environ.get('SHOP_SITE_URL', ''),
+    'CHUNK_SIZE': 50_000,
+    'CURRENCY': 'INR',
+    'HTTP_MAX_AGE': 3600,
+}
+
+
+# Admin changelists (shop.admin, shop.paginators)
+# On PostgreSQL, changelists of large tables take page counts from planner
+# statistics; estimates below EXACT_COUNT_BELOW rows are counted exactly.
+# Bulk catalog actions update and delete BATCH_SIZE products per transaction.
+SHOP_ADMIN = {
+    'EXACT_COUNT_BELOW': 10_000,
+    'BATCH_SIZE': 2_000,
+}
+
+
+# Anonymous carts (shop.carts)
+# STORAGE 'session' keeps the compact cart string in the session; 'cookie'
+# keeps it in a signed cookie, so visitors who only fill a cart create no
+# session rows. Existing session carts are read and moved over either way.
+SHOP_CARTS = {
+    'STORAGE': os.environ.get('SHOP_CART_STORAGE', 'session'),
+    'COOKIE': 'shop_cart',
+}
+
+
+# Cleanup of abandoned carts, empty wishlists and expired sessions
+# (shop.cleanup, "manage.py cleanup_shop", a Render cron job). Carts go after
+# CART_DAYS without a change, empty wishlists after WISHLIST_HOURS. Rows are
+# deleted BATCH_SIZE at a time with PAUSE seconds between batches, so it can
+# run while the site is busy. ARCHIVE_DIR, if set, receives a gzipped JSONL
+# copy of the deleted carts and wishlists.
+SHOP_CLEANUP = {
+    'CART_DAYS': int(os.environ.get('SHOP_CART_RETENTION_DAYS', '90')),
+    'WISHLIST_HOURS': 24,
+    'BATCH_SIZE': 500,
+    'PAUSE': 0.05,
+    'ARCHIVE_DIR': os.environ.get('SHOP_CLEANUP_ARCHIVE_DIR', ''),
+}
+
+
+# Middleware fast path (shop.fastpath)
+# GET/HEAD requests for ROUTES skip the session, CSRF, auth and messages
+# middleware; those views must not use request.session or request.user.
+# Paths matching NOT_FOUND get a cacheable 404 without resolving the URL.
+SHOP_FASTPATH = {
+    'ENABLED': os.environ.get('SHOP_FASTPATH', 'True') == 'True',
+    'ROUTES': [
+        'healthz', 'readyz', 'robots_txt', 'sitemap_index', 'sitemap_section', 'product_feed',
+        'product_autocomplete', 'product_facets',
+    ],
+    'NOT_FOUND': [
+        r'^favicon\.ico$',
+        r'^apple-touch-icon[\w-]*\.png$',
+        r'\.(?:php|aspx?|cgi)$',
+        r'^wp-',
+    ],
+    'NOT_FOUND_MAX_AGE': 86400,
+}
+
+
+# Rate limiting (shop.ratelimit)
+# Login, signup and cart endpoints are throttled per client IP and, for
+# login/signup, per submitted account. RATES overrides a view's default rate
+# ('<count>/<s|m|h|d>') by scope. Set PROXY_COUNT to the number of trusted
+# proxies in front of the app (render.yaml sets 1) so X-Forwarded-For is
+# used; with 0 behind a proxy every client shares the proxy's address.
+# Counters live in the default cache, which must be shared (REDIS_URL).
+SHOP_RATELIMIT = {
+    'ENABLED': os.environ.get('SHOP_RATELIMIT', 'True') == 'True',
+    'CACHE': 'default',
+    'PROXY_COUNT': int(os.environ.get('SHOP_RATELIMIT_PROXY_COUNT', '0')),
+    'RATES': {},
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/6.0/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'shop': {
+            'handlers': ['console'],
+            'level': os.environ.get('SHOP_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
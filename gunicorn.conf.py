@@ -0,0 +1,122 @@
+"""
+Gunicorn settings, read from the environment. Gunicorn loads this file from
+the working directory; start the site with ``gunicorn -c gunicorn.conf.py``.
+Variables and measurements are in PERFORMANCE_GUIDE.md, "Gunicorn".
+"""
+import gc
+import math
+import os
+import resource
+import time
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TileCommerce.settings')
+
+
+def _cpus():
+    """CPUs this container may use: its cgroup quota, else its CPU affinity"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPUS = _cpus()
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    # Needs the uvicorn-worker package; serves the ASGI application
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}
+
+mode = os.environ.get('GUNICORN_WORKER_CLASS', 'auto')
+if mode == 'auto':
+    # On small instances memory, not CPU, limits the number of processes;
+    # threads overlap the waits on a remote database instead
+    mode = 'gthread' if CPUS <= 2 else 'sync'
+if mode not in WORKER_CLASSES:
+    raise ValueError(f'GUNICORN_WORKER_CLASS must be auto or one of {", ".join(WORKER_CLASSES)}, not {mode!r}')
+
+worker_class = WORKER_CLASSES[mode]
+wsgi_app = 'TileCommerce.asgi:application' if mode == 'uvicorn' else 'TileCommerce.wsgi:application'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * CPUS + 1 if mode == 'sync' else CPUS + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if mode == 'gthread' else 1))
+
+# Import Django and the project once in the master; workers share those
+# pages copy-on-write instead of each importing them
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Restart workers after this many requests, staggered by up to the jitter so
+# they do not all restart (and warm up) at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+# Heartbeat files on tmpfs: a slow disk cannot make a busy worker look dead
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+statsd_host = os.environ.get('GUNICORN_STATSD_HOST') or None
+statsd_prefix = 'tilecommerce'
+
+
+def when_ready(server):
+    server.log.info('%d %s workers x %d threads on %d CPUs, preload %s, recycled after %d (+%d) requests',
+                    workers, mode, threads, CPUS, preload_app, max_requests, max_requests_jitter)
+    if preload_app:
+        from django.db import connections
+        from django.urls import get_resolver
+
+        # Django imports the URLconf (views, admin) on the first request;
+        # import it here so workers inherit it instead of each importing it
+        get_resolver().urlconf_module
+        # Workers must not inherit a connection the master opened while importing
+        connections.close_all()
+        # Keep the collector from touching (and so copying) the preloaded
+        # objects in every worker
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Runs in each new worker once the application is loaded, before it accepts requests"""
+    from shop import metrics, warmup
+
+    started = time.time()
+    timings = warmup.warm()
+    worker.log.info('Worker %d warmed up in %.2fs (%s)', worker.pid, time.time() - started,
+                    ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in timings.items()))
+    if metrics.enabled():
+        metrics.WORKER_STARTED.set(started, pid=worker.pid)
+        metrics.WORKER_WARMUP_SECONDS.set(time.time() - started, pid=worker.pid)
+        metrics.flush()
+
+
+def post_request(worker, req, environ, resp):
+    from shop import metrics
+
+    if metrics.enabled():
+        metrics.WORKER_REQUESTS.set(worker.nr, pid=worker.pid)
+        # ru_maxrss is in kilobytes on Linux
+        metrics.WORKER_MAX_RSS.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, pid=worker.pid)
+
+
+def worker_exit(server, worker):
+    from shop import metrics
+
+    if metrics.enabled():
+        metrics.flush()
+
+
+def child_exit(server, worker):
+    from shop import metrics
+
+    if metrics.enabled():
+        metrics.retire(worker.pid)
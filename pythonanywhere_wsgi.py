@@ -15,3 +15,8 @@ os.environ['DJANGO_SETTINGS_MODULE'] = 'TileCommerce.settings'
 # Import Django WSGI application
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+# Warm caches (URLs, templates, facets, search suggestions) when a worker
+# loads this file, rather than during its first requests
+from shop import warmup
+warmup.warm()
@@ -0,0 +1,185 @@
+import hashlib
+import re
+import secrets
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Substr
+from django.utils.dateparse import parse_date
+
+from .addresses import address_book
+from .catalog import CATEGORIES
+from .models import Address, CartItem, CatalogVersion, UserProfile, Wishlist, WishlistItem
+
+
+# Longer numeric suffixes are ignored so the cast can never overflow
+MAX_SUFFIX_DIGITS = 9
+
+
+def random_username(base):
+    """``base`` with a random suffix that the numbered sequence never produces"""
+    return f'{base}_{secrets.token_hex(4)}'
+
+
+def allocate_username(base):
+    """
+    Return ``base`` if it is free, otherwise ``base`` followed by the next
+    unused number, using a single aggregate query over the prefix. Once the
+    next number would need more than ``MAX_SUFFIX_DIGITS`` digits, return
+    ``random_username(base)`` instead.
+    """
+    taken = User.objects.filter(
+        Q(username=base) | Q(username__regex=rf'^{re.escape(base)}[0-9]{{1,{MAX_SUFFIX_DIGITS}}}$'),
+        username__startswith=base,
+    ).aggregate(
+        count=Count('pk'),
+        highest=Max(Case(
+            When(username=base, then=Value(0, output_field=BigIntegerField())),
+            default=Cast(Substr('username', len(base) + 1), BigIntegerField()),
+        )),
+    )
+    if not taken['count']:
+        return base
+    suffix = str(taken['highest'] + 1)
+    if len(suffix) > MAX_SUFFIX_DIGITS:
+        return random_username(base)
+    return f'{base}{suffix}'
+
+
+def create_customer(email, password, first_name='', last_name='', attempts=5):
+    """
+    Create a ``User`` named after the email local part, plus its
+    ``UserProfile``, in one transaction.
+
+    Concurrent signups can pick the same username between the lookup and
+    the insert; the loser gets an ``IntegrityError`` and tries the next one.
+    If the lookup offers the name that just failed again, the numbering
+    cannot get past it (e.g. a taken name whose suffix is too long to be
+    counted), so the retry uses a random suffix.
+    """
+    base = email.split('@')[0]
+    hashed_password = make_password(password)
+    username = None
+    for attempt in range(attempts):
+        candidate = allocate_username(base)
+        username = random_username(base) if candidate == username else candidate
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    username=username,
+                    email=User.objects.normalize_email(email),
+                    password=hashed_password,
+                    first_name=first_name,
+                    last_name=last_name,
+                )
+                UserProfile.objects.create(user=user)
+            return user
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+
+
+# Wishlist products shown on the profile page; the rest are on /wishlist/
+PROFILE_WISHLIST_PREVIEW = 6
+
+
+def load_profile(user):
+    """
+    Everything the profile page shows, in at most four queries: the profile,
+    the addresses, the wishlist with its item count, and the first wishlist
+    items with their products.
+    """
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    wishlist = Wishlist.objects.filter(user=user).annotate(item_count=Count('items')).first()
+    wishlist_items = []
+    if wishlist and wishlist.item_count:
+        wishlist_items = list(
+            wishlist.items.select_related('product')
+            .only('wishlist_id', 'added_at', 'product__id', 'product__name', 'product__price', 'product__image')
+            [:PROFILE_WISHLIST_PREVIEW]
+        )
+    return {
+        'user': user,
+        'profile': profile,
+        'addresses': list(address_book(user)),
+        'wishlist': wishlist,
+        'wishlist_items': wishlist_items,
+        'wishlist_count': wishlist.item_count if wishlist else 0,
+    }
+
+
+def _per_user(model, user_path, **aggregates):
+    """Scalar subqueries aggregating the outer user's ``model`` rows"""
+    rows = model.objects.filter(**{user_path: OuterRef('pk')}).order_by().values(user_path)
+    return {name: Subquery(rows.annotate(value=aggregate).values('value')) for name, aggregate in aggregates.items()}
+
+
+def profile_validators(user):
+    """
+    ``(etag, last_modified)`` for the profile page, from one query.
+
+    Last-Modified is the newest ``updated_at`` across the profile, addresses,
+    wishlist, cart and the categories nav; the ETag also covers row counts
+    (so deletions invalidate it), the user's own fields and ``last_login``
+    (which rotates the CSRF token).
+    """
+    categories = CatalogVersion.objects.filter(key=CATEGORIES)
+    state = User.objects.filter(pk=user.pk).values('pk', 'first_name', 'last_name', 'email', 'last_login').annotate(
+        **_per_user(UserProfile, 'user', profile_updated=Max('updated_at')),
+        **_per_user(Address, 'user', addresses_updated=Max('updated_at'), addresses=Count('pk')),
+        **_per_user(WishlistItem, 'wishlist__user', wishlist_updated=Max('added_at'),
+                    wishlist_products_updated=Max('product__updated_at'), wishlist_items=Count('pk')),
+        **_per_user(CartItem, 'cart__user', cart_updated=Max('updated_at'), cart_items=Count('pk')),
+        # Rendered on every page by the categories_context processor
+        categories_version=Subquery(categories.values('version')),
+        categories_updated=Subquery(categories.values('updated_at')),
+    ).get()
+    timestamps = [
+        state[key] for key in ('last_login', 'profile_updated', 'addresses_updated', 'wishlist_updated',
+                               'wishlist_products_updated', 'cart_updated', 'categories_updated')
+        if state[key] is not None
+    ]
+    etag = hashlib.sha256(repr(sorted(state.items())).encode()).hexdigest()[:32]
+    return etag, max(timestamps, default=None)
+
+
+USER_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def update_profile(user, profile, data, files):
+    """
+    Apply the profile form to ``user`` and ``profile``, writing only the
+    columns that changed. Return True if anything was saved.
+    """
+    user_changes = [field for field in USER_FIELDS if _assign(user, field, data.get(field, ''))]
+    date_of_birth = data.get('date_of_birth', '')
+    profile_changes = [
+        field for field, value in (
+            ('date_of_birth', parse_date(date_of_birth) if date_of_birth else None),
+            ('gender', data.get('gender', '') or None),
+            ('phone_number', data.get('phone_number', '')),
+            ('country_code', data.get('country_code', '+1')),
+        )
+        if _assign(profile, field, value)
+    ]
+    if 'profile_picture' in files:
+        profile.profile_picture = files['profile_picture']
+        profile_changes.append('profile_picture')
+
+    if not user_changes and not profile_changes:
+        return False
+    with transaction.atomic():
+        if user_changes:
+            user.save(update_fields=user_changes)
+        # updated_at also versions the user fields shown on the profile page
+        profile.save(update_fields=profile_changes + ['updated_at'])
+    return True
+
+
+def _assign(instance, field, value):
+    if getattr(instance, field) == value:
+        return False
+    setattr(instance, field, value)
+    return True
@@ -0,0 +1,131 @@
+"""
+Address book helpers.
+
+Every address stores a normalized fingerprint with a unique index on
+``(user, fingerprint)``, so duplicate detection is one index lookup and the
+database itself rejects duplicates.
+"""
+from django.db import transaction
+
+from .models import ADDRESS_FINGERPRINT_FIELDS, Address, address_fingerprint
+
+
+# Columns the address book lists (profile page and checkout)
+ADDRESS_BOOK_FIELDS = ('id', *ADDRESS_FINGERPRINT_FIELDS)
+
+
+def address_book(user):
+    """The user's addresses, newest first, loading only the listed columns"""
+    return Address.objects.filter(user=user).only(*ADDRESS_BOOK_FIELDS).order_by('-created_at')
+
+
+def _find(user, fingerprint, exclude=None):
+    addresses = Address.objects.filter(user=user, fingerprint=fingerprint)
+    if exclude is not None:
+        addresses = addresses.exclude(pk=exclude)
+    return addresses.values_list('pk', flat=True).first()
+
+
+def add_address(user, data):
+    """
+    Save ``data`` as a new address unless the user already has an identical
+    one. Return ``(address_id, created)``.
+
+    The insert is an upsert on ``(user, fingerprint)``, so a concurrent
+    request saving the same address cannot create a duplicate or fail.
+    """
+    fingerprint = address_fingerprint(data)
+    existing = _find(user, fingerprint)
+    if existing is not None:
+        return existing, False
+    address = Address(user=user, fingerprint=fingerprint, **data)
+    Address.objects.bulk_create(
+        [address],
+        update_conflicts=True,
+        unique_fields=['user', 'fingerprint'],
+        update_fields=['updated_at'],
+    )
+    if address.pk is None:
+        # Backends that cannot return ids from an upsert (MySQL)
+        address.pk = _find(user, fingerprint)
+    return address.pk, True
+
+
+def save_address(address):
+    """
+    Save an edited address. If the edit makes it identical to another of
+    the user's addresses, it is merged into that one instead. Return the id
+    of the address that remains.
+    """
+    duplicate = _find(address.user_id, address.get_fingerprint(), exclude=address.pk)
+    if duplicate is not None:
+        address.delete()
+        return duplicate
+    address.save()
+    return address.pk
+
+
+def collapse_duplicates(batch_size=2000):
+    """
+    Recompute every fingerprint and delete duplicate addresses, keeping the
+    oldest of each. Return ``(updated, deleted)``.
+
+    Addresses are read in user order, about ``batch_size`` at a time rounded
+    up to whole users, and each batch is committed in its own transaction,
+    so a user's duplicates are always deleted before the surviving address
+    takes their fingerprint and no lock is held for longer than one batch.
+    """
+    updated = deleted = 0
+    last_user = None
+    while True:
+        remaining = Address.objects.order_by('user_id', 'pk')
+        if last_user is not None:
+            remaining = remaining.filter(user_id__gt=last_user)
+        # The user owning the batch_size-th remaining address ends this batch
+        boundary = list(remaining.values_list('user_id', flat=True)[batch_size - 1:batch_size])
+        batch = remaining.filter(user_id__lte=boundary[0]) if boundary else remaining
+        with transaction.atomic():
+            addresses = list(batch.only('pk', 'user_id', 'fingerprint', *ADDRESS_FINGERPRINT_FIELDS))
+            to_update, to_delete = _duplicates(addresses)
+            _flush(to_update, to_delete)
+        updated, deleted = updated + len(to_update), deleted + len(to_delete)
+        if not boundary:
+            return updated, deleted
+        last_user = addresses[-1].user_id
+
+
+def _duplicates(addresses):
+    """The addresses whose fingerprint changed and the pks of duplicates, for addresses ordered by user"""
+    to_update = []
+    to_delete = []
+    user_id = None
+    seen = set()
+    for address in addresses:
+        if address.user_id != user_id:
+            user_id = address.user_id
+            seen = set()
+        fingerprint = address_fingerprint(vars(address))
+        if fingerprint in seen:
+            to_delete.append(address.pk)
+            continue
+        seen.add(fingerprint)
+        if address.fingerprint != fingerprint:
+            address.fingerprint = fingerprint
+            to_update.append(address)
+    return to_update, to_delete
+
+
+def _flush(to_update, to_delete):
+    if to_delete:
+        Address.objects.filter(pk__in=to_delete).delete()
+    if not to_update:
+        return
+    # Park changed rows on unique placeholders first, so a stale fingerprint
+    # cannot collide with a new one while the unique index is in place
+    fingerprints = [address.fingerprint for address in to_update]
+    for address in to_update:
+        address.fingerprint = f'~{address.pk}'
+    Address.objects.bulk_update(to_update, ['fingerprint'])
+    for address, fingerprint in zip(to_update, fingerprints):
+        address.fingerprint = fingerprint
+    Address.objects.bulk_update(to_update, ['fingerprint'])
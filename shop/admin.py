@@ -1,10 +1,184 @@
-from django.contrib import admin
+import time
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+
+from . import addresses, bulk, facets
 from .models import Category, Product, Customer, Cart, CartItem, Address, UserProfile, Wishlist, WishlistItem
+from .paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows: no exact total
+    next to search results, no facet counts, and estimated page counts on
+    PostgreSQL (see shop.paginators).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    """
+    Filter by a typed username instead of listing every user, which a
+    related-field filter renders as one link per user
+    """
+    title = 'user'
+    parameter_name = 'username'
+    placeholder = 'Exact username'
+    template = 'admin/shop/input_filter.html'
+    # Lookup path from the model to the user
+    user_path = 'user'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.user_path}__username': self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+            'value': self.value() or '',
+            # The other filters, kept when the form is submitted
+            'hidden': [(name, value) for name, value in changelist.params.items() if name != self.parameter_name],
+        }
+
+
+class CartUserFilter(UsernameFilter):
+    user_path = 'cart__user'
+
+
+class WishlistUserFilter(UsernameFilter):
+    user_path = 'wishlist__user'
+
+
+class PriceBucketFilter(admin.SimpleListFilter):
+    """The storefront's price buckets (shop.facets) rather than every distinct price"""
+    title = 'price'
+    parameter_name = 'price_bucket'
+
+    def lookups(self, request, model_admin):
+        return [(str(bucket), facets.bucket_label(bucket)) for bucket in range(len(facets.bucket_bounds()))]
+
+    def queryset(self, request, queryset):
+        buckets = facets.parse_buckets([self.value() or ''])
+        return queryset.filter(facets.price_filter(buckets)) if buckets else queryset
+
+
+def _per_cart(expression, output_field):
+    """Correlated subquery aggregating one cart's items, evaluated only for the rows shown"""
+    return Coalesce(
+        Subquery(
+            CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+            .annotate(total=expression).values('total'),
+            output_field=output_field,
+        ),
+        0,
+        output_field=output_field,
+    )
+
+
+class PriceAdjustmentForm(forms.Form):
+    percent = forms.DecimalField(required=False, max_digits=6, decimal_places=2,
+                                 help_text='Percentage change, e.g. 10 or -15')
+    amount = forms.DecimalField(required=False, max_digits=10, decimal_places=2,
+                                help_text='Amount added after the percentage, e.g. -5.00')
+
+    def clean(self):
+        data = super().clean()
+        if not data.get('percent') and not data.get('amount'):
+            raise forms.ValidationError('Enter a percentage, an amount or both.')
+        if data.get('percent') is not None and data['percent'] <= -100:
+            raise forms.ValidationError('Prices cannot drop by 100% or more.')
+        return data
+
+
+class MoveToCategoryForm(forms.Form):
+    category = forms.ModelChoiceField(queryset=Category.objects.only('pk', 'name'))
+
+
+class ConfirmForm(forms.Form):
+    pass
+
+
+def bulk_action_page(modeladmin, request, title, submit, form_class, describe, run):
+    """
+    Intermediate page of a bulk action. ``describe()`` returns the summary
+    and optional ``[(name, count)]`` preview shown on it; once its form is
+    submitted, ``run(cleaned_data)`` does the work and returns the message
+    shown on the changelist.
+    """
+    form = form_class(request.POST if 'apply' in request.POST else None)
+    if form.is_bound and form.is_valid():
+        started = time.perf_counter()
+        message = run(form.cleaned_data)
+        modeladmin.message_user(request, f'{message} in {time.perf_counter() - started:.1f}s.', messages.SUCCESS)
+        return None
+    summary, preview = describe()
+    return TemplateResponse(request, 'admin/shop/bulk_action.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': title,
+        'summary': summary,
+        'preview': preview,
+        'opts': modeladmin.model._meta,
+        'media': modeladmin.media,
+        'form': form,
+        'submit': submit,
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        'select_across': request.POST.get('select_across', '0'),
+        'action': request.POST['action'],
+    })
+
+
+def adjust_prices_page(modeladmin, request, products):
+    return bulk_action_page(
+        modeladmin, request, 'Adjust prices', 'Adjust prices', PriceAdjustmentForm,
+        lambda: (f'Adjust the prices of {products.count()} products.', None),
+        lambda data: f'{bulk.adjust_prices(products, data["percent"] or 0, data["amount"] or 0)} prices adjusted',
+    )
+
+
+def move_to_category_page(modeladmin, request, products):
+    return bulk_action_page(
+        modeladmin, request, 'Move to category', 'Move products', MoveToCategoryForm,
+        lambda: (f'Move {products.count()} products to another category.', None),
+        lambda data: f'{bulk.move_to_category(products, data["category"])} products moved to {data["category"]}',
+    )
+
+
+class CatalogBulkActions:
+    """
+    Replace the default delete action: it loads every selected row and all
+    related objects to list them, then deletes them one signal at a time
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(CatalogBulkActions, admin.ModelAdmin):
     list_display = ('name', 'slug', 'created_at')
+    actions = ('adjust_prices', 'move_products', 'delete_categories')
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name', 'description')
     readonly_fields = ('created_at',)
@@ -18,11 +192,33 @@ class CategoryAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description='Adjust prices of products in selected categories', permissions=['change'])
+    def adjust_prices(self, request, queryset):
+        return adjust_prices_page(self, request, Product.objects.filter(category__in=queryset))
+
+    @admin.action(description='Move products of selected categories to another category', permissions=['change'])
+    def move_products(self, request, queryset):
+        return move_to_category_page(self, request, Product.objects.filter(category__in=queryset))
+
+    @admin.action(description='Delete selected categories and their products', permissions=['delete'])
+    def delete_categories(self, request, queryset):
+        def run(data):
+            categories, products = bulk.delete_categories(queryset)
+            return f'{categories} categories and {products} products deleted'
+        return bulk_action_page(
+            self, request, 'Delete categories', 'Yes, delete', ConfirmForm,
+            lambda: ('Delete the selected categories? These rows will be deleted:', bulk.cascade_summary(queryset)),
+            run,
+        )
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(CatalogBulkActions, LargeTableAdmin):
     list_display = ('name', 'category', 'price', 'created_at')
-    list_filter = ('category', 'created_at', 'price')
+    actions = ('adjust_prices', 'move_to_category', 'delete_products')
+    list_filter = ('category', 'created_at', PriceBucketFilter)
+    list_select_related = ('category',)
+    autocomplete_fields = ('category',)
     search_fields = ('name', 'description')
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
@@ -38,11 +234,28 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description='Adjust prices of selected products', permissions=['change'])
+    def adjust_prices(self, request, queryset):
+        return adjust_prices_page(self, request, queryset)
+
+    @admin.action(description='Move selected products to another category', permissions=['change'])
+    def move_to_category(self, request, queryset):
+        return move_to_category_page(self, request, queryset)
+
+    @admin.action(description='Delete selected products', permissions=['delete'])
+    def delete_products(self, request, queryset):
+        return bulk_action_page(
+            self, request, 'Delete products', 'Yes, delete', ConfirmForm,
+            lambda: ('Delete the selected products? These rows will be deleted:', bulk.cascade_summary(queryset)),
+            lambda data: f'{bulk.delete_products(queryset)} products deleted',
+        )
+
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ('get_customer_name', 'user', 'phone_number', 'city', 'created_at')
     list_filter = ('created_at', 'country', 'state')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'phone_number', 'address')
     readonly_fields = ('user', 'created_at', 'updated_at')
     fieldsets = (
@@ -76,9 +289,10 @@ class CartItemInline(admin.TabularInline):
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     list_display = ('user', 'get_total_items', 'get_total_price', 'updated_at')
     list_filter = ('created_at', 'updated_at')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('user', 'created_at', 'updated_at')
     inlines = [CartItemInline]
@@ -92,19 +306,30 @@ class CartAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        # Totals in the changelist query instead of loading every item per row
+        money = DecimalField(max_digits=12, decimal_places=2)
+        return super().get_queryset(request).annotate(
+            total_items=_per_cart(Sum('quantity'), IntegerField()),
+            total_price=_per_cart(Sum(F('quantity') * F('product__price'), output_field=money), money),
+        )
+
     def get_total_items(self, obj):
-        return obj.get_total_items()
+        return obj.total_items
     get_total_items.short_description = 'Total Items'
+    get_total_items.admin_order_field = 'total_items'
 
     def get_total_price(self, obj):
-        return f"${obj.get_total_price()}"
+        return f"${obj.total_price:.2f}"
     get_total_price.short_description = 'Total Price'
+    get_total_price.admin_order_field = 'total_price'
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ('product', 'cart', 'quantity', 'get_total_price', 'added_at')
-    list_filter = ('added_at', 'updated_at', 'cart__user')
+    list_filter = ('added_at', 'updated_at', CartUserFilter)
+    list_select_related = ('product', 'cart__user')
     search_fields = ('product__name', 'cart__user__username')
     readonly_fields = ('cart', 'product', 'added_at', 'updated_at')
     fieldsets = (
@@ -123,9 +348,11 @@ class CartItemAdmin(admin.ModelAdmin):
 
 
 @admin.register(Address)
-class AddressAdmin(admin.ModelAdmin):
+class AddressAdmin(LargeTableAdmin):
     list_display = ('get_customer_name', 'user', 'address', 'city', 'country', 'created_at')
-    list_filter = ('country', 'city', 'created_at')
+    # City is left out: its filter would list almost every address
+    list_filter = ('country', 'created_at', UsernameFilter)
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'first_name', 'last_name', 'address', 'city')
     readonly_fields = ('user', 'created_at', 'updated_at')
     fieldsets = (
@@ -144,14 +371,35 @@ class AddressAdmin(admin.ModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # An edit that duplicates another of the user's addresses would hit
+        # the unique fingerprint; merge into that address instead
+        kept = addresses.save_address(obj)
+        if obj.pk is None:
+            obj.pk = kept
+            obj.refresh_from_db()
+            self.message_user(request, f'The address now matched "{obj}" and was merged into it.', messages.WARNING)
+
+    def response_change(self, request, obj):
+        if '_continue' in request.POST and request.resolver_match.kwargs.get('object_id') != str(obj.pk):
+            # Merged: carry on editing the address that remains
+            url = reverse('admin:shop_address_change', args=[obj.pk], current_app=self.admin_site.name)
+            return HttpResponseRedirect(add_preserved_filters(
+                {'preserved_filters': self.get_preserved_filters(request), 'opts': self.opts}, url,
+            ))
+        return super().response_change(request, obj)
+
     def get_customer_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
     get_customer_name.short_description = 'Name'
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ('get_user_name', 'user', 'gender', 'phone_number', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('gender', 'created_at')
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name', 'phone_number')
     readonly_fields = ('user', 'created_at', 'updated_at')
@@ -181,12 +429,15 @@ class WishlistItemInline(admin.TabularInline):
     extra = 0
     fields = ('product', 'added_at')
     readonly_fields = ('added_at',)
+    # A select would list every product on each row
+    autocomplete_fields = ('product',)
 
 
 @admin.register(Wishlist)
-class WishlistAdmin(admin.ModelAdmin):
+class WishlistAdmin(LargeTableAdmin):
     list_display = ('get_user_name', 'user', 'get_items_count', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name')
     readonly_fields = ('user', 'created_at', 'updated_at')
     inlines = [WishlistItemInline]
@@ -204,15 +455,24 @@ class WishlistAdmin(admin.ModelAdmin):
         return obj.user.get_full_name() or obj.user.username
     get_user_name.short_description = 'User'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(items_count=Coalesce(Subquery(
+            WishlistItem.objects.filter(wishlist=OuterRef('pk')).order_by().values('wishlist')
+            .annotate(count=Count('pk')).values('count')
+        ), 0))
+
     def get_items_count(self, obj):
-        return obj.items.count()
+        return obj.items_count
     get_items_count.short_description = 'Items in Wishlist'
+    get_items_count.admin_order_field = 'items_count'
 
 
 @admin.register(WishlistItem)
-class WishlistItemAdmin(admin.ModelAdmin):
+class WishlistItemAdmin(LargeTableAdmin):
     list_display = ('get_product_name', 'get_user_name', 'added_at')
-    list_filter = ('added_at', 'wishlist__user')
+    list_filter = ('added_at', WishlistUserFilter)
+    list_select_related = ('product', 'wishlist__user')
+    autocomplete_fields = ('wishlist', 'product')
     search_fields = ('product__name', 'wishlist__user__username', 'wishlist__user__email')
     readonly_fields = ('added_at',)
     fieldsets = (
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class ShopConfig(AppConfig):
     name = 'shop'
+
+    def ready(self):
+        from shop import metrics, signals  # noqa: F401 - connects receivers
+        from shop.middleware import instrument_cache
+
+        if metrics.enabled():
+            instrument_cache()
@@ -0,0 +1,225 @@
+"""
+Search-as-you-type suggestions served from memory.
+
+Each process keeps a word-prefix index over product and category names.
+Names are split into normalized words; the distinct words are kept in one
+sorted list, so the words starting with a typed prefix are a contiguous range
+found with two bisects. Every word has an array of the positions of the
+names containing it, and names are numbered by popularity (cart and wishlist
+lines), so the top suggestions are the first values of a lazy merge over that
+range. Further query words narrow that down by intersecting their
+positions, or by checking the candidate names for very common words.
+
+The index is rebuilt when the catalog version changes (see shop.catalog),
+checked at most every ``CHECK_INTERVAL`` seconds, and at least every
+``MAX_AGE`` seconds so popularity stays current. Between rebuilds a
+suggestion request runs no queries.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from itertools import accumulate, groupby, islice
+
+from django.conf import settings
+from django.db.models import Count
+
+from .catalog import CATALOG
+from .models import CartItem, CatalogVersion, Category, Product, WishlistItem
+
+
+WORD = re.compile(r'\w+(?:\.\w+)*')
+# Sorts after every character, so prefix + LAST ends the range of the prefix
+LAST = '\U0010ffff'
+# A set intersection costs about a tenth of a text check per value
+CHECK_RATIO = 10
+# Candidates checked on their text before switching to set intersections
+SCAN_LIMIT = 64
+
+_index = None
+_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'SHOP_AUTOCOMPLETE', {})
+
+
+def words(text):
+    """Case- and accent-insensitive words of ``text``: 'Crème Wood-Look' -> ['creme', 'wood', 'look']"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WORD.findall(text.casefold())
+
+
+class PrefixIndex:
+    """Word-prefix index over texts given in rank order, best first"""
+
+    def __init__(self, texts):
+        postings = defaultdict(lambda: array('i'))
+        self.texts = []
+        for position, text in enumerate(texts):
+            text_words = words(text)
+            # Leading space so ' ' + prefix only matches at word starts
+            self.texts.append(' ' + ' '.join(text_words))
+            for word in dict.fromkeys(text_words):
+                postings[word].append(position)
+        self.words = sorted(postings)
+        self.postings = [postings[word] for word in self.words]
+        # Postings before each word, to size a prefix's range without merging it
+        self.offsets = list(accumulate((len(p) for p in self.postings), initial=0))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _range(self, prefix):
+        lo = bisect_left(self.words, prefix)
+        return lo, bisect_right(self.words, prefix + LAST, lo)
+
+    def _size(self, word_range):
+        lo, hi = word_range
+        return self.offsets[hi] - self.offsets[lo]
+
+    def search(self, prefixes, limit):
+        """Positions of the best ``limit`` texts with a word starting with each prefix"""
+        if not prefixes or limit <= 0:
+            return []
+        ranges = sorted(((self._range(prefix), prefix) for prefix in set(prefixes)),
+                        key=lambda item: self._size(item[0]))
+        (lo, hi), _ = ranges[0]
+        # Postings are sorted, so the first distinct values are the best
+        stream = (position for position, _ in groupby(heapq.merge(*self.postings[lo:hi])))
+        if len(ranges) == 1:
+            return list(islice(stream, limit))
+
+        # Other words usually match often among the rarest prefix's texts, so
+        # check the best few candidates on their text first
+        checks = [' ' + prefix for _, prefix in ranges[1:]]
+        found = []
+        head = list(islice(stream, SCAN_LIMIT))
+        for position in head:
+            if all(prefix in self.texts[position] for prefix in checks):
+                found.append(position)
+                if len(found) == limit:
+                    return found
+        if len(head) < SCAN_LIMIT:
+            return found
+        scanned = head[-1]
+
+        # Sparse matches: intersect with the rarest prefix's texts. Prefixes
+        # matching far more texts than are left are cheaper to check on the text.
+        candidates = set().union(*self.postings[lo:hi])
+        checks = []
+        for (lo, hi), prefix in ranges[1:]:
+            if self._size((lo, hi)) > CHECK_RATIO * len(candidates):
+                checks.append(' ' + prefix)
+                continue
+            matched = set()
+            for postings in self.postings[lo:hi]:
+                matched |= candidates.intersection(postings)
+            candidates = matched
+            if not candidates:
+                return found
+        for position in sorted(candidates):
+            if position > scanned and all(prefix in self.texts[position] for prefix in checks):
+                found.append(position)
+                if len(found) == limit:
+                    break
+        return found
+
+
+class Index:
+    def __init__(self, version, products, categories):
+        """``products``: [(id, name)], ``categories``: [(slug, name)], both most popular first"""
+        self.version = version
+        self.built_at = self.checked_at = time.monotonic()
+        # Ids in an array rather than (id, name) tuples: a quarter less memory
+        self.product_ids = array('q', (pk for pk, _ in products))
+        self.product_names = [name for _, name in products]
+        self.categories = categories
+        self.product_index = PrefixIndex(self.product_names)
+        self.category_index = PrefixIndex(name for _, name in categories)
+
+    def suggest(self, query, limit, category_limit):
+        """``(products, categories)`` matching every word of ``query``"""
+        prefixes = words(query)
+        return (
+            [(self.product_ids[i], self.product_names[i]) for i in self.product_index.search(prefixes, limit)],
+            [self.categories[i] for i in self.category_index.search(prefixes, category_limit)],
+        )
+
+
+def catalog_version():
+    return CatalogVersion.objects.filter(key=CATALOG).values_list('version', flat=True).first()
+
+
+def build(version=None):
+    """
+    Load names and popularity: one pass over products plus two grouped
+    counts of cart and wishlist lines.
+    """
+    popularity = Counter(dict(
+        CartItem.objects.order_by().values_list('product_id').annotate(n=Count('pk'))
+    ))
+    popularity.update(dict(
+        WishlistItem.objects.order_by().values_list('product_id').annotate(n=Count('pk'))
+    ))
+    category_popularity = Counter()
+    products = []
+    for pk, name, category_id in Product.objects.order_by().values_list('pk', 'name', 'category_id').iterator(
+        chunk_size=10_000
+    ):
+        products.append((pk, name))
+        category_popularity[category_id] += 1 + popularity[pk]
+    # Most popular first, newest first among equals
+    products.sort(key=lambda product: (-popularity[product[0]], -product[0]))
+    categories = sorted(
+        Category.objects.values_list('pk', 'slug', 'name'),
+        key=lambda category: (-category_popularity[category[0]], category[2]),
+    )
+    return Index(version, products, [(slug, name) for _, slug, name in categories])
+
+
+def current():
+    """
+    This process's index, rebuilt when the catalog version changed. While one
+    thread rebuilds, others keep serving the previous index.
+    """
+    global _index
+    config = _config()
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < config.get('CHECK_INTERVAL', 5):
+        return index
+    if not _lock.acquire(blocking=index is None):
+        return index
+    try:
+        index = _index
+        if index is not None and now - index.checked_at < config.get('CHECK_INTERVAL', 5):
+            return index
+        version = catalog_version()
+        if index is None or index.version != version or now - index.built_at >= config.get('MAX_AGE', 3600):
+            index = build(version)
+        index.checked_at = now
+        _index = index
+        return index
+    finally:
+        _lock.release()
+
+
+def reset():
+    """Drop this process's index; the next request rebuilds it"""
+    global _index
+    _index = None
+
+
+def suggest(query, limit=None):
+    """``(products, categories)`` for the typed ``query``: [(id, name)], [(slug, name)]"""
+    config = _config()
+    limit = config.get('LIMIT', 8) if limit is None else min(limit, config.get('MAX_LIMIT', 20))
+    if len(query.strip()) < config.get('MIN_LENGTH', 1):
+        return [], []
+    return current().suggest(query, limit, config.get('CATEGORY_LIMIT', 3))
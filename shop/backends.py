@@ -0,0 +1,89 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher
+from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+
+
+_hash_pool = None
+
+
+def hash_pool():
+    """Bounded pool used by the async path for CPU-bound password hashing"""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'SHOP_AUTH_HASH_THREADS', 4),
+            thread_name_prefix='shop-password-hash',
+        )
+    return _hash_pool
+
+
+def users_by_login(identifier):
+    """
+    Users matching an email (case-insensitive, served by the LOWER(email)
+    index) or an exact username, oldest first
+    """
+    if '@' in identifier:
+        users = User.objects.annotate(email_lower=Lower('email')).filter(email_lower=identifier.lower())
+    else:
+        users = User.objects.filter(username=identifier)
+    return users.order_by('pk')
+
+
+def needs_rehash(encoded):
+    """True when the stored hash is not in the preferred hasher/work factor"""
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher('default')
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticate with either an email address or a username.
+
+    Passwords stored with an older hasher or work factor are re-hashed with
+    the preferred one on successful login (``User.check_password`` does this
+    in the sync path). The async path runs hashing in a bounded thread pool
+    so event-loop workers are never blocked by PBKDF2.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = users_by_login(username).first()
+        if user is None:
+            # Run the hasher anyway so missing accounts take as long as
+            # wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        loop = asyncio.get_running_loop()
+        user = await users_by_login(username).afirst()
+        if user is None:
+            await loop.run_in_executor(hash_pool(), User().set_password, password)
+            return None
+        valid = await loop.run_in_executor(hash_pool(), check_password, password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if needs_rehash(user.password):
+            await loop.run_in_executor(hash_pool(), partial(user.set_password, password))
+            await user.asave(update_fields=['password'])
+        return user
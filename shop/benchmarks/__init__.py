@@ -0,0 +1,58 @@
+"""
+Request-level benchmarks for the shop.
+
+Scenarios are registered with ``register`` and executed by the ``bench_shop``
+management command against whatever database is configured, normally one
+populated by ``seed_shop``. Every iteration runs inside a transaction that is
+rolled back, so benchmarks never change the dataset.
+"""
+
+SCENARIOS = []
+
+
+class Scenario:
+    """
+    One request to benchmark.
+
+    ``url``, ``data`` and ``headers`` may be callables receiving the per-iteration context
+    dict built by the runner (dataset fixtures plus whatever the setup step
+    created, e.g. ``cart_item_id``). ``setup`` is called with that dict
+    after the standard setup, inside the rolled-back transaction.
+    ``settings`` overrides Django settings while the scenario runs. The
+    context also holds the prepared test ``client``.
+
+    ``status`` is the response status the scenario must get, and
+    ``location`` (a path, or a callable receiving the context) the
+    ``Location`` a redirect must point to, so a route that starts failing or
+    redirecting to the login page fails the run instead of setting a budget.
+    """
+
+    def __init__(self, name, route, url, query_budget, method='get', data=None,
+                 user=False, cart_lines=0, ajax=False, session=None, headers=None, setup=None, iterations=None,
+                 settings=None, status=200, location=None):
+        self.name = name
+        self.route = route
+        self.url = url
+        self.query_budget = query_budget
+        self.method = method
+        self.data = data
+        self.user = user
+        self.cart_lines = cart_lines
+        self.ajax = ajax
+        self.session = session
+        self.headers = headers
+        self.setup = setup
+        self.iterations = iterations
+        self.settings = settings or {}
+        self.status = status
+        self.location = location
+
+    def __repr__(self):
+        return f'<Scenario {self.name}>'
+
+
+def register(*args, **kwargs):
+    """Create a scenario and add it to the registry"""
+    scenario = Scenario(*args, **kwargs)
+    SCENARIOS.append(scenario)
+    return scenario
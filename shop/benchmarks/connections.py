@@ -0,0 +1,140 @@
+"""
+Request throughput against the configured database as concurrency grows, for
+each way of holding database connections.
+
+Each worker is a thread with its own test client, like the threads of one
+gunicorn worker process. Around every request a worker calls
+``close_old_connections`` as Django's request handler does on
+``request_started`` and ``request_finished`` (the test client skips it), so
+connections are opened, kept, checked and returned as they are when serving:
+
+* ``per-request``: ``CONN_MAX_AGE = 0``, a new connection for every request
+* ``persistent``: ``CONN_MAX_AGE`` with ``CONN_HEALTH_CHECKS``, one connection
+  per thread, checked before its first query in each request
+* ``pool``: one psycopg 3 pool shared by the threads, checking connections
+  before lending them (PostgreSQL only)
+
+Only GET requests are sent, so nothing needs rolling back.
+"""
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from shop.benchmarks.runner import percentile
+
+
+MODES = {
+    'per-request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    # Django passes CONN_HEALTH_CHECKS on to the pool as its check
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True},
+}
+# Used when settings configure no pool (SHOP_DB_POOL)
+DEFAULT_POOL = {'min_size': 1, 'max_size': 4, 'timeout': 10}
+
+
+def unsupported(mode):
+    """Why ``mode`` cannot run against the configured database, or None"""
+    if mode != 'pool':
+        return None
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'postgresql':
+        return f'needs PostgreSQL, not {connection.vendor}'
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    if not is_psycopg3:
+        return 'needs psycopg 3 (psycopg[pool])'
+    return None
+
+
+@contextmanager
+def configured(mode):
+    """
+    Switch the default database to ``mode`` for connections opened inside the
+    block. Connection wrappers share the settings dict, and worker threads
+    create their wrappers after the switch.
+    """
+    connections.close_all()
+    db = connections.settings[DEFAULT_DB_ALIAS]
+    saved = {key: db.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+    options = dict(db.get('OPTIONS') or {})
+    pool = options.pop('pool', None)
+    if mode == 'pool':
+        options['pool'] = pool if isinstance(pool, dict) else DEFAULT_POOL
+    db.update(MODES[mode], OPTIONS=options)
+    try:
+        yield options.get('pool')
+    finally:
+        if mode == 'pool':
+            connections[DEFAULT_DB_ALIAS].close_pool()
+        connections.close_all()
+        db.update(saved)
+
+
+def run(mode, workers, requests, path):
+    """One mode at one concurrency: ``requests`` per worker, all workers at once"""
+    latencies = []
+    opened = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(workers + 1)
+
+    def count_connection(sender, connection, **kwargs):
+        with lock:
+            opened.append(connection.alias)
+
+    def work():
+        client = Client(SERVER_NAME='localhost')
+        timings = []
+        start.wait()
+        try:
+            for _ in range(requests):
+                began = time.perf_counter()
+                close_old_connections()
+                response = client.get(path, secure=True)
+                close_old_connections()
+                timings.append(time.perf_counter() - began)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{path} returned {response.status_code}')
+        except Exception as e:
+            with lock:
+                errors.append(e)
+        finally:
+            connections.close_all()
+            with lock:
+                latencies.extend(timings)
+
+    with configured(mode) as pool:
+        connection_created.connect(count_connection)
+        try:
+            threads = [threading.Thread(target=work) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+            # A pool hands out its own connections; Django only sees checkouts
+            connection_count = (
+                connections[DEFAULT_DB_ALIAS].pool.get_stats()['connections_num'] if pool else len(opened)
+            )
+        finally:
+            connection_created.disconnect(count_connection)
+    if errors:
+        raise errors[0]
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'workers': workers,
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'connections': connection_count,
+    }
@@ -0,0 +1,78 @@
+"""
+HTTP load against a running server, for comparing gunicorn configurations.
+
+Each client thread keeps one keep-alive connection (reopened when the server
+closes it, as sync workers do) and requests the given paths in turn for a
+fixed duration. Failures on a reused connection are retried once. Requests
+carry ``X-Forwarded-Proto: https``, which gunicorn trusts from 127.0.0.1, so
+production settings do not redirect to HTTPS.
+"""
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from shop.benchmarks.runner import percentile
+
+
+def run(base_url, paths, concurrency, duration):
+    target = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+    headers = {'Host': 'localhost', 'X-Forwarded-Proto': 'https'}
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        connection = connection_class(target.hostname, target.port, timeout=60)
+        timings = []
+        counts = {}
+        i = offset
+        try:
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                began = time.perf_counter()
+                status = 'error'
+                # A kept-alive connection may have been closed by a worker that
+                # exited (recycling); browsers and proxies retry those once
+                for _ in range(2):
+                    reused = connection.sock is not None
+                    try:
+                        connection.request('GET', path, headers=headers)
+                        response = connection.getresponse()
+                        response.read()
+                        status = response.status
+                        break
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        if not reused:
+                            break
+                timings.append(time.perf_counter() - began)
+                counts[status] = counts.get(status, 0) + 1
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(timings)
+                for status, count in counts.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'statuses': statuses,
+    }
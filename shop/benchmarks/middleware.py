@@ -0,0 +1,164 @@
+"""
+Time and queries spent in each middleware, per benchmark scenario.
+
+A probe is inserted before every entry of ``settings.MIDDLEWARE`` and one
+before the view. Each probe records when the request reaches it and when the
+response leaves it, so a middleware's own cost is its probe's span minus the
+span of the probe after it. Queries are counted the same way. ``view`` also
+covers URL resolution and the ``process_view`` hooks (CSRF checks), which
+Django runs after the last middleware. A request answered by a middleware
+(``shop.fastpath`` calls the view itself) has no time after that middleware,
+and its own time includes the view.
+
+The report also says whether the request read the session and resolved
+``request.user``; both are lazy, so a route that does neither never loads
+them. Requests come from the ``bench_shop`` client, inside rolled-back
+transactions, as in ``runner``.
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.functional import LazyObject, empty
+from django.utils.module_loading import import_string
+
+from shop.benchmarks import runner
+
+
+# (probe index, 'in' or 'out', perf_counter, queries so far) for the current request
+_marks = []
+_requests = []
+
+
+class _Probe:
+    index = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _marks.append((self.index, 'in', time.perf_counter(), len(connection.queries_log)))
+        _requests.append(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _marks.append((self.index, 'out', time.perf_counter(), len(connection.queries_log)))
+
+
+def _probe(index):
+    name = f'Probe{index}'
+    if name not in globals():
+        globals()[name] = type(name, (_Probe,), {'index': index})
+    return f'{__name__}.{name}'
+
+
+def probed(middleware):
+    """``middleware`` with a probe before each entry and before the view"""
+    stack = []
+    for index, path in enumerate(middleware):
+        stack += [_probe(index), path]
+    return stack + [_probe(len(middleware))]
+
+
+def in_use(middleware):
+    """Entries Django keeps, i.e. that do not raise MiddlewareNotUsed with the current settings"""
+    used = []
+    for path in middleware:
+        try:
+            import_string(path)(lambda request: None)
+        except MiddlewareNotUsed:
+            continue
+        used.append(path)
+    return used
+
+
+def _spans(count):
+    """``{probe index: (seconds, queries)}`` from the marks of one request"""
+    entered = {}
+    spans = {}
+    for index, direction, at, queries in _marks:
+        if direction == 'in':
+            entered[index] = (at, queries)
+        elif index in entered:
+            spans[index] = (at - entered[index][0], queries - entered[index][1])
+    own = {}
+    for index in range(count + 1):
+        if index not in spans:
+            continue
+        seconds, queries = spans[index]
+        inner_seconds, inner_queries = spans.get(index + 1, (0.0, 0))
+        own[index] = (seconds - inner_seconds, queries - inner_queries)
+    return own
+
+
+def _evaluated(lazy):
+    return lazy is not None and getattr(lazy, '_wrapped', None) is not empty
+
+
+def _loaded(request):
+    session = request.__dict__.get('session')
+    if isinstance(session, LazyObject):
+        # shop.fastpath's stand-in, which raises when used
+        session_read = _evaluated(session)
+    else:
+        session_read = bool(session is not None and session.accessed)
+    return session_read, _evaluated(request.__dict__.get('user'))
+
+
+def run_scenario(scenario, dataset, iterations):
+    middleware = list(settings.MIDDLEWARE)
+    with runner.scenario_settings(scenario), override_settings(MIDDLEWARE=probed(middleware)):
+        used = set(in_use(middleware))
+        timings = {index: [] for index in range(len(middleware) + 1)}
+        queries = {}
+        for iteration in range(iterations + 1):
+            with transaction.atomic():
+                client = Client(SERVER_NAME='localhost')
+                ctx = dataset.context()
+                runner.prepare(scenario, client, ctx)
+                _marks.clear()
+                _requests.clear()
+                with CaptureQueriesContext(connection):
+                    response = runner.request(scenario, client, ctx)
+                    own = _spans(len(middleware))
+                loaded = _loaded(_requests[0]) if _requests else (False, False)
+                transaction.set_rollback(True)
+            # The first run warms caches; its queries are reported, its time is not
+            if iteration == 0:
+                queries = {index: spent[1] for index, spent in own.items()}
+                continue
+            for index, (seconds, _) in own.items():
+                timings[index].append(seconds * 1_000_000)
+
+    names = [path.rsplit('.', 1)[-1] for path in middleware] + ['view']
+    rows = []
+    for index, name in enumerate(names):
+        if index < len(middleware) and middleware[index] not in used:
+            continue
+        samples = timings[index]
+        rows.append({
+            'name': name,
+            # None: the request never got this far (a middleware answered it)
+            'own_us': statistics.median(samples) if samples else None,
+            'queries': queries.get(index),
+        })
+    return {
+        'route': scenario.route,
+        'status': response.status_code,
+        'rows': rows,
+        'total_us': sum(row['own_us'] or 0 for row in rows),
+        'session_read': loaded[0],
+        'user_resolved': loaded[1],
+    }
+
+
+# A route of each kind: probes, static-like files, JSON for anonymous and
+# logged-in users, and pages
+DEFAULT_SCENARIOS = (
+    'healthz', 'readyz', 'robots_txt', 'sitemap_index', 'product_autocomplete', 'product_facets',
+    'is_in_wishlist', 'home', 'cart_anonymous_50', 'favicon_miss',
+)
@@ -0,0 +1,320 @@
+"""Scenarios covering every route in shop/urls.py"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils.http import http_date
+
+from shop import autocomplete, carts, feeds, health, seeding
+from shop.accounts import profile_validators
+from shop.addresses import add_address
+from shop.benchmarks import register
+from shop.models import Category, ProductRecommendation
+
+
+DELIVERY_ADDRESS = {
+    'first_name': 'Bench',
+    'last_name': 'Mark',
+    'email': 'bench@example.com',
+    'address': '1 Benchmark Way',
+    'address2': '',
+    'city': 'Austin',
+    'postal_code': '73301',
+    'state': 'TX',
+    'country': 'United States',
+    'phone': '5550100',
+}
+
+PROFILE_FORM = {
+    'first_name': 'Bench',
+    'last_name': 'Mark',
+    'email': 'bench@example.com',
+    'date_of_birth': '1990-01-01',
+    'gender': 'O',
+    'phone_number': '5550100',
+    'country_code': '+1',
+}
+
+CARD_PAYMENT = {
+    'payment_method': 'card',
+    'cardholder': 'Bench Mark',
+    'cardnumber': '4242424242424242',
+    'expiry': '12/30',
+    'cvv': '123',
+}
+
+
+def url(name, *keys):
+    """Build a url callable that reverses ``name`` with context values"""
+    return lambda ctx: reverse(name, args=[ctx[key] for key in keys])
+
+
+def listing(query):
+    return lambda ctx: reverse('products_list') + '?' + query.format(**ctx)
+
+
+def current_etag(page_url):
+    """Setup step that fetches the page once and keeps its ETag for If-None-Match"""
+    def setup(ctx):
+        ctx['etag'] = ctx['client'].get(page_url(ctx), secure=True)['ETag']
+    return setup
+
+
+IF_NONE_MATCH = lambda ctx: {'If-None-Match': ctx['etag']}
+
+
+# Catalog
+register('home', 'home', url('home'), query_budget=4)
+register('home_not_modified', 'home', url('home'), setup=current_etag(url('home')),
+         headers=IF_NONE_MATCH, status=304, query_budget=2)
+register('products_list', 'products_list', url('products_list'), query_budget=7)
+register('products_list_category', 'products_list', listing('category={category_slug}'), query_budget=7)
+register('products_list_deep_page', 'products_list', listing('page={deep_page}'), query_budget=7)
+register('products_list_search', 'products_list', listing('search={search_term}'), query_budget=7)
+register('products_list_search_sorted', 'products_list',
+         listing('search={search_term}&sort=price&page=3'), query_budget=7)
+register('products_list_not_modified', 'products_list', url('products_list'),
+         setup=current_etag(url('products_list')), headers=IF_NONE_MATCH, status=304, query_budget=2)
+register('products_list_category_not_modified', 'products_list', listing('category={category_slug}'),
+         setup=current_etag(listing('category={category_slug}')), headers=IF_NONE_MATCH, status=304, query_budget=2)
+register('products_list_faceted', 'products_list',
+         listing('category={category_slug}&price=1&price=2&sort=price'), query_budget=7)
+register('product_facets', 'product_facets', url('product_facets'), query_budget=4)
+register('product_facets_filtered', 'product_facets',
+         lambda ctx: reverse('product_facets') + f'?category={ctx["category_slug"]}&price=1', query_budget=4)
+# Served from the in-memory index; the rebuild scenario measures a catalog change
+register('product_autocomplete', 'product_autocomplete', lambda ctx: reverse('product_autocomplete') + '?q=mar',
+         setup=lambda ctx: autocomplete.current(), query_budget=0)
+register('product_autocomplete_multiword', 'product_autocomplete',
+         lambda ctx: reverse('product_autocomplete') + '?q=carrara+wall+60',
+         setup=lambda ctx: autocomplete.current(), query_budget=0)
+register('product_autocomplete_rebuild', 'product_autocomplete',
+         lambda ctx: reverse('product_autocomplete') + '?q=mar',
+         setup=lambda ctx: autocomplete.reset(), iterations=3, query_budget=5)
+# Falls back to category neighbours unless the product has stored recommendations
+register('product_detail', 'product_detail', url('product_detail', 'product_id'), query_budget=8)
+
+
+def stored_recommendations(ctx):
+    ProductRecommendation.objects.filter(product_id=ctx['product_id']).delete()
+    ProductRecommendation.objects.bulk_create([
+        ProductRecommendation(product_id=ctx['product_id'], rank=rank, recommended_id=other, score=1.0)
+        for rank, other in enumerate(ctx['product_ids'][1:13])
+    ])
+
+
+register('product_detail_recommended', 'product_detail', url('product_detail', 'product_id'),
+         setup=stored_recommendations, query_budget=7)
+register('product_detail_authenticated', 'product_detail', url('product_detail', 'product_id'),
+         user=True, cart_lines=50, query_budget=13)
+register('product_detail_not_modified', 'product_detail', url('product_detail', 'product_id'),
+         setup=current_etag(url('product_detail', 'product_id')), headers=IF_NONE_MATCH, status=304, query_budget=3)
+register('product_detail_authenticated_not_modified', 'product_detail', url('product_detail', 'product_id'),
+         user=True, cart_lines=50, setup=current_etag(url('product_detail', 'product_id')),
+         headers=IF_NONE_MATCH, status=304, query_budget=5)
+
+# Cart
+CART_COOKIE = {**settings.SHOP_CARTS, 'STORAGE': 'cookie'}
+
+
+def json_session_cart(ctx):
+    session = ctx['client'].session
+    session[carts.SESSION_KEY] = {str(product_id): 2 for product_id in ctx['product_ids'][:50]}
+    session.save()
+
+
+register('cart_anonymous_empty', 'cart', url('cart'), query_budget=2)
+register('cart_anonymous_50', 'cart', url('cart'), cart_lines=50, query_budget=4)
+register('cart_anonymous_50_cookie', 'cart', url('cart'), cart_lines=50, settings={'SHOP_CARTS': CART_COOKIE},
+         query_budget=4)
+# A session saved before the compact encoding
+register('cart_anonymous_50_json_session', 'cart', url('cart'), cart_lines=50, setup=json_session_cart,
+         query_budget=4)
+register('cart_authenticated_empty', 'cart', url('cart'), user=True, query_budget=7)
+register('cart_authenticated_50', 'cart', url('cart'), user=True, cart_lines=50, query_budget=212)
+register('add_to_cart_anonymous_50', 'add_to_cart', url('add_to_cart', 'product_id'),
+         method='post', data={'quantity': 1}, cart_lines=50, ajax=True, query_budget=6)
+register('add_to_cart_anonymous_50_cookie', 'add_to_cart', url('add_to_cart', 'product_id'),
+         method='post', data={'quantity': 1}, cart_lines=50, ajax=True, settings={'SHOP_CARTS': CART_COOKIE},
+         query_budget=3)
+register('add_to_cart_authenticated_50', 'add_to_cart', url('add_to_cart', 'product_id'),
+         method='post', data={'quantity': 1}, user=True, cart_lines=50, ajax=True, query_budget=58)
+register('remove_from_cart_authenticated', 'remove_from_cart', url('remove_from_cart', 'cart_item_id'),
+         user=True, cart_lines=50, status=302, location=url('cart'), query_budget=4)
+register('remove_from_cart_anonymous', 'remove_from_cart', url('remove_from_cart', 'product_id'),
+         cart_lines=50, status=302, location=url('cart'), query_budget=4)
+register('update_cart_item_authenticated', 'update_cart_item', url('update_cart_item', 'cart_item_id'),
+         method='post', data={'quantity': 3}, user=True, cart_lines=50, ajax=True, query_budget=5)
+register('update_cart_item_anonymous', 'update_cart_item', url('update_cart_item', 'product_id'),
+         method='post', data={'quantity': 3}, cart_lines=50, ajax=True, query_budget=5)
+register('clear_cart_authenticated', 'clear_cart', url('clear_cart'), user=True, cart_lines=50,
+         status=302, location=url('cart'), query_budget=4)
+
+# Checkout
+register('address', 'address', url('address'), user=True, cart_lines=50, query_budget=59)
+register('address_select_existing', 'address', url('address'), method='post',
+         data=lambda ctx: {'selected_address': ctx['address_id']},
+         user=True, cart_lines=50, ajax=True, query_budget=7)
+register('address_add_new', 'address', url('address'), method='post', data=DELIVERY_ADDRESS,
+         user=True, cart_lines=50, ajax=True, query_budget=8)
+register('address_add_existing', 'address', url('address'), method='post', data=DELIVERY_ADDRESS,
+         user=True, cart_lines=50, ajax=True, setup=lambda ctx: add_address(ctx['user'], DELIVERY_ADDRESS),
+         query_budget=7)
+register('get_address_data', 'get_address_data', url('get_address_data', 'address_id'),
+         user=True, query_budget=3)
+register('update_address', 'update_address', url('update_address', 'address_id'), method='post',
+         data=DELIVERY_ADDRESS, user=True, ajax=True, query_budget=5)
+register('delete_address', 'delete_address', url('delete_address', 'address_id'),
+         user=True, ajax=True, query_budget=4)
+register('payment', 'payment', url('payment'), user=True, cart_lines=50,
+         session={'delivery_address': DELIVERY_ADDRESS}, query_budget=211)
+register('payment_submit', 'payment', url('payment'), method='post', data=CARD_PAYMENT,
+         user=True, cart_lines=50, ajax=True, session={'delivery_address': DELIVERY_ADDRESS},
+         query_budget=6)
+
+# Wishlist
+register('wishlist', 'wishlist', url('wishlist'), user=True, query_budget=8)
+register('add_to_wishlist', 'add_to_wishlist', url('add_to_wishlist', 'product_id'),
+         user=True, ajax=True, query_budget=6)
+register('remove_from_wishlist', 'remove_from_wishlist', url('remove_from_wishlist', 'product_id'),
+         user=True, ajax=True, query_budget=6)
+register('is_in_wishlist', 'is_in_wishlist', url('is_in_wishlist', 'product_id'),
+         user=True, query_budget=5)
+
+# Account
+register('profile', 'profile', url('profile'), user=True, query_budget=10)
+
+
+def profile_etag(ctx):
+    ctx['profile_etag'] = profile_validators(ctx['user'])[0]
+
+
+register('profile_not_modified', 'profile', url('profile'), user=True, cart_lines=5, setup=profile_etag,
+         headers=lambda ctx: {'If-None-Match': f'"{ctx["profile_etag"]}"'}, status=304, query_budget=3)
+register('profile_update', 'profile', url('profile'), method='post', data=PROFILE_FORM,
+         user=True, ajax=True, query_budget=7)
+register('login_page', 'login', url('login'), query_budget=1)
+# Password hashing dominates these two, so they run fewer iterations
+register('login_email', 'login', url('login'), method='post',
+         data=lambda ctx: {'username': ctx['user'].email, 'password': seeding.SEED_PASSWORD},
+         cart_lines=5, iterations=5, status=302, location=url('home'), query_budget=37)
+register('login_username', 'login', url('login'), method='post',
+         data=lambda ctx: {'username': ctx['user'].username, 'password': seeding.SEED_PASSWORD},
+         iterations=5, status=302, location=url('home'), query_budget=12)
+register('signup_page', 'signup', url('signup'), query_budget=1)
+register('signup', 'signup', url('signup'), method='post',
+         data=lambda ctx: {
+             'first_name': 'Bench',
+             'last_name': 'Mark',
+             'email': f'bench{ctx["iteration"]}@example.com',
+             'password1': 'benchpass123',
+             'password2': 'benchpass123',
+         },
+         cart_lines=5, iterations=5, status=302, location=url('home'), query_budget=42)
+
+
+def colliding_usernames(ctx):
+    """10k existing users named collide, collide1 ... collide9999"""
+    User.objects.bulk_create(
+        [User(username=f'collide{i or ""}') for i in range(10_000)], batch_size=2_000
+    )
+
+
+register('signup_colliding_prefix_10k', 'signup', url('signup'), method='post',
+         data=lambda ctx: {
+             'first_name': 'Bench',
+             'last_name': 'Mark',
+             'email': f'collide@bench{ctx["iteration"]}.example.com',
+             'password1': 'benchpass123',
+             'password2': 'benchpass123',
+         },
+         setup=colliding_usernames, iterations=5, status=302, location=url('home'), query_budget=17)
+register('logout', 'logout', url('logout'), user=True, status=302, location=url('home'), query_budget=4)
+
+# Rate limiting: throttled requests are rejected before any session or ORM work
+THROTTLED = lambda scope: {'SHOP_RATELIMIT': {**settings.SHOP_RATELIMIT, 'ENABLED': True, 'RATES': {scope: '0/m'}}}
+register('login_throttled', 'login', url('login'), method='post',
+         data=lambda ctx: {'username': ctx['user'].username, 'password': seeding.SEED_PASSWORD},
+         settings=THROTTLED('login-ip'), status=429, query_budget=0)
+register('signup_throttled', 'signup', url('signup'), method='post',
+         data={'email': 'throttled@example.com', 'password1': 'benchpass123', 'password2': 'benchpass123'},
+         settings=THROTTLED('signup-account'), status=429, query_budget=0)
+register('add_to_cart_throttled', 'add_to_cart', url('add_to_cart', 'product_id'),
+         method='post', data={'quantity': 1}, ajax=True, settings=THROTTLED('cart'), status=429, query_budget=0)
+
+# Operations
+METRICS = {'SHOP_METRICS': {**settings.SHOP_METRICS, 'ENABLED': True, 'DIR': '', 'TOKEN': 'bench-metrics-token'}}
+register('metrics', 'metrics', url('metrics'), settings=METRICS,
+         headers={'Authorization': f'Bearer {METRICS["SHOP_METRICS"]["TOKEN"]}'}, query_budget=0)
+register('robots_txt', 'robots_txt', url('robots_txt'), query_budget=0)
+register('healthz', 'healthz', url('healthz'), query_budget=0)
+# Not a route: browsers and scanners asking for files the site does not
+# have, answered by shop.fastpath before the URL is resolved
+register('favicon_miss', 'not_found', lambda ctx: '/favicon.ico', status=404, query_budget=0)
+# A worker warms up and checks migrations once, before it takes traffic;
+# after that a probe is one SELECT 1 per database
+register('readyz', 'readyz', url('readyz'), setup=lambda ctx: health.readiness(), query_budget=1)
+
+
+# Admin changelists (not in shop/urls.py, so not required for coverage)
+def staff(ctx):
+    User.objects.filter(pk=ctx['user'].pk).update(is_staff=True, is_superuser=True)
+
+
+# Session, user, page, count and the related rows of the page, whatever the page size
+ADMIN_CHANGELISTS = {
+    'product': 5, 'cart': 4, 'cartitem': 4, 'wishlist': 4, 'wishlistitem': 4, 'address': 5, 'customer': 6,
+    'userprofile': 4,
+}
+for model, budget in ADMIN_CHANGELISTS.items():
+    register(f'admin_{model}_changelist', f'admin:shop_{model}_changelist', url(f'admin:shop_{model}_changelist'),
+             user=True, setup=staff, iterations=5, query_budget=budget)
+
+def bulk_action(action, **fields):
+    """Changelist POST running ``action`` on the context's products"""
+    return lambda ctx: {'action': action, '_selected_action': ctx['product_ids'], 'select_across': 0, **fields}
+
+
+def category_action(action, **fields):
+    def data(ctx):
+        category_id = Category.objects.filter(slug=ctx['category_slug']).values_list('pk', flat=True).get()
+        return {'action': action, '_selected_action': [category_id], 'select_across': 0, **fields}
+    return data
+
+
+# Bulk actions: the confirmation page, then the batched update with the facet rebuild
+register('admin_product_adjust_prices_form', 'admin:shop_product_changelist', url('admin:shop_product_changelist'),
+         method='post', data=bulk_action('adjust_prices'), user=True, setup=staff, iterations=5, query_budget=6)
+register('admin_product_adjust_prices', 'admin:shop_product_changelist', url('admin:shop_product_changelist'),
+         method='post', data=bulk_action('adjust_prices', apply='yes', percent='5'), user=True, setup=staff,
+         iterations=5, status=302, location=url('admin:shop_product_changelist'), query_budget=23)
+register('admin_category_delete_preview', 'admin:shop_category_changelist', url('admin:shop_category_changelist'),
+         method='post', data=category_action('delete_categories'), user=True, setup=staff, iterations=5,
+         query_budget=11)
+
+# Sitemaps and feeds are generated once into a scratch directory, then served from disk
+FEEDS = {'SHOP_FEEDS': {**settings.SHOP_FEEDS, 'BASE_URL': 'https://localhost',
+                        'DIR': os.path.join(tempfile.gettempdir(), 'tilecommerce-bench-feeds')}}
+
+
+def generated_feeds(ctx):
+    if not os.path.exists(os.path.join(feeds.directory(), feeds.MANIFEST)):
+        feeds.generate()
+
+
+def feed_file(name, filename):
+    return lambda ctx: reverse(name, kwargs={'filename': filename})
+
+
+register('sitemap_index', 'sitemap_index', url('sitemap_index'), settings=FEEDS, setup=generated_feeds,
+         query_budget=0)
+register('sitemap_index_not_modified', 'sitemap_index', url('sitemap_index'), settings=FEEDS,
+         setup=generated_feeds, headers=lambda ctx: {'If-Modified-Since': http_date()}, status=304, query_budget=0)
+register('sitemap_section', 'sitemap_section', feed_file('sitemap_section', 'sitemap-products-0.xml.gz'),
+         settings=FEEDS, setup=generated_feeds, query_budget=0)
+register('product_feed_xml', 'product_feed', feed_file('product_feed', 'products.xml.gz'),
+         settings=FEEDS, setup=generated_feeds, query_budget=0)
+register('product_feed_csv', 'product_feed', feed_file('product_feed', 'products.csv.gz'),
+         settings=FEEDS, setup=generated_feeds, query_budget=0)
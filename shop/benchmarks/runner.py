@@ -0,0 +1,259 @@
+import json
+import time
+
+from django.db import connection, transaction
+from django.test import Client
+from django.conf import settings
+from django.core import signing
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from shop import carts, seeding
+from shop.models import Product, Category, Cart, CartItem, Address, Wishlist, WishlistItem
+from shop.urls import urlpatterns
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class DatasetMissing(Exception):
+    pass
+
+
+class Dataset:
+    """Fixtures picked once from the seeded database"""
+
+    def __init__(self):
+        address = (
+            Address.objects.filter(user__username__startswith=seeding.SEED_USERNAME_PREFIX)
+            .select_related('user')
+            .order_by('pk')
+            .first()
+        )
+        if address is None:
+            raise DatasetMissing('No seeded users with addresses found. Run "manage.py seed_shop" first.')
+        self.user = address.user
+        self.address_id = address.pk
+        self.product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True)[:50])
+        first_product = Product.objects.select_related('category').get(pk=self.product_ids[0])
+        self.product_id = first_product.pk
+        self.category_slug = first_product.category.slug
+        self.product_count = Product.objects.count()
+        self.category_count = Category.objects.count()
+        # Near the end of the unfiltered listing, where OFFSET is most expensive
+        self.deep_page = max(1, self.product_count // 9 - 1)
+        self.search_term = 'marble'
+        self.counter = 0
+
+    def describe(self):
+        return {
+            'products': self.product_count,
+            'categories': self.category_count,
+            'user': self.user.username,
+        }
+
+    def context(self):
+        self.counter += 1
+        return {
+            'user': self.user,
+            'address_id': self.address_id,
+            'product_id': self.product_id,
+            'product_ids': self.product_ids,
+            'category_slug': self.category_slug,
+            'deep_page': self.deep_page,
+            'search_term': self.search_term,
+            'iteration': self.counter,
+        }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def resolve(value, ctx):
+    return value(ctx) if callable(value) else value
+
+
+def prepare(scenario, client, ctx):
+    """Put the client and database in the state the scenario expects"""
+    products = ctx['product_ids'][:scenario.cart_lines]
+    if scenario.user:
+        user = ctx['user']
+        client.force_login(user)
+        cart, _ = Cart.objects.get_or_create(user=user)
+        cart.items.all().delete()
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product_id=product_id, quantity=2) for product_id in products]
+        )
+        first_item = cart.items.order_by('pk').first()
+        ctx['cart_item_id'] = first_item.pk if first_item else 0
+        wishlist, _ = Wishlist.objects.get_or_create(user=user)
+        WishlistItem.objects.get_or_create(wishlist=wishlist, product_id=ctx['product_id'])
+
+    session = client.session
+    if not scenario.user and products:
+        cart = carts.encode({product_id: 2 for product_id in products})
+        if carts.storage() == 'cookie':
+            signer = signing.get_cookie_signer(salt=carts.cookie_name() + carts.SALT)
+            client.cookies[carts.cookie_name()] = signer.sign(cart)
+        else:
+            session[carts.SESSION_KEY] = cart
+    for key, value in (scenario.session or {}).items():
+        session[key] = resolve(value, ctx)
+    session.save()
+    ctx['client'] = client
+    if scenario.setup:
+        scenario.setup(ctx)
+
+
+def request(scenario, client, ctx):
+    url = resolve(scenario.url, ctx)
+    data = resolve(scenario.data, ctx)
+    headers = {'X-Requested-With': 'XMLHttpRequest'} if scenario.ajax else {}
+    headers.update(resolve(scenario.headers, ctx) or {})
+    send = getattr(client, scenario.method)
+    return send(url, data=data, secure=True, headers=headers)
+
+
+def outcome(scenario, response, ctx):
+    """``(status, location)`` of ``response`` and what ``scenario`` expects of them"""
+    location = response.get('Location') if 300 <= response.status_code < 400 else None
+    return {
+        'status': response.status_code,
+        'expected_status': scenario.status,
+        'location': location,
+        'expected_location': resolve(scenario.location, ctx),
+    }
+
+
+def run_once(scenario, dataset, capture=False):
+    """Run one rolled-back iteration; return (seconds, query count, outcome)"""
+    with transaction.atomic():
+        client = Client(SERVER_NAME='localhost')
+        ctx = dataset.context()
+        prepare(scenario, client, ctx)
+        if capture:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request(scenario, client, ctx)
+                elapsed = time.perf_counter() - started
+            query_count = len(queries)
+        else:
+            started = time.perf_counter()
+            response = request(scenario, client, ctx)
+            elapsed = time.perf_counter() - started
+            query_count = None
+        result = outcome(scenario, response, ctx)
+        transaction.set_rollback(True)
+    return elapsed, query_count, result
+
+
+def scenario_settings(scenario):
+    """
+    Settings for one scenario. Every benchmark request comes from the same
+    client, so rate limiting is off unless the scenario turns it on.
+    """
+    overrides = {'SHOP_RATELIMIT': {**getattr(settings, 'SHOP_RATELIMIT', {}), 'ENABLED': False}}
+    overrides.update(scenario.settings)
+    return override_settings(**overrides)
+
+
+def run_scenario(scenario, dataset, iterations):
+    with scenario_settings(scenario):
+        # The first run counts queries and warms caches; it is not timed
+        _, query_count, first = run_once(scenario, dataset, capture=True)
+        timings = []
+        mismatches = 0
+        for _ in range(scenario.iterations or iterations):
+            elapsed, _, later = run_once(scenario, dataset)
+            timings.append(elapsed * 1000)
+            mismatches += later['status'] != first['status']
+        timings.sort()
+    result = {
+        'route': scenario.route,
+        **first,
+        # Timed runs that answered differently from the first one
+        'status_changes': mismatches,
+        'queries': query_count,
+        'query_budget': scenario.query_budget,
+        'iterations': len(timings),
+        'mean_ms': sum(timings) / len(timings),
+        # Sequential requests per second for one worker
+        'throughput_rps': 1000 * len(timings) / sum(timings),
+        'min_ms': timings[0],
+        'max_ms': timings[-1],
+    }
+    for pct in PERCENTILES:
+        result[f'p{pct}_ms'] = percentile(timings, pct)
+    return result
+
+
+def run(scenarios, iterations, dataset=None):
+    dataset = dataset or Dataset()
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'dataset': dataset.describe(),
+        },
+        'results': {
+            scenario.name: run_scenario(scenario, dataset, iterations)
+            for scenario in scenarios
+        },
+    }
+
+
+def uncovered_routes(scenarios):
+    """Names in shop/urls.py that no scenario exercises"""
+    covered = {scenario.route for scenario in scenarios}
+    return sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered)
+
+
+def check(report, baseline=None, threshold=0.2, min_delta_ms=1.0, metric='p95_ms'):
+    """
+    Return a list of failure messages.
+
+    A scenario fails when its response status or redirect target is not the
+    expected one, when it runs more queries than its budget, or when its
+    ``metric`` is more than ``threshold`` (and at least ``min_delta_ms``)
+    slower than in the baseline report.
+    """
+    failures = []
+    previous = (baseline or {}).get('results', {})
+    for name, result in report['results'].items():
+        if result['status'] != result['expected_status']:
+            failures.append(f'{name}: status {result["status"]}, expected {result["expected_status"]}'
+                            + (f' (redirect to {result["location"]})' if result['location'] else ''))
+        elif result['expected_location'] is not None and result['location'] != result['expected_location']:
+            failures.append(
+                f'{name}: redirected to {result["location"]}, expected {result["expected_location"]}'
+            )
+        if result['status_changes']:
+            failures.append(f'{name}: {result["status_changes"]} timed runs answered other than {result["status"]}')
+        if result['query_budget'] is not None and result['queries'] > result['query_budget']:
+            failures.append(
+                f'{name}: {result["queries"]} queries exceeds budget of {result["query_budget"]}'
+            )
+        if name in previous:
+            before = previous[name][metric]
+            after = result[metric]
+            if after - before >= min_delta_ms and after > before * (1 + threshold):
+                failures.append(
+                    f'{name}: {metric} regressed from {before:.2f}ms to {after:.2f}ms'
+                )
+    return failures
+
+
+def save(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,85 @@
+"""
+Per-request cost of reading and writing an anonymous cart, by format.
+
+What a request that touches the cart pays besides the database round trip,
+for each storage format:
+
+* ``json-session`` - the former format, a JSON object of string ids in the session
+* ``compact-session`` - the ``shop.carts`` string in the session
+* ``cookie`` - the ``shop.carts`` string in a signed cookie, no session
+
+``decode`` reads the stored value back into ``{product_id: quantity}``: the
+session's ``SessionStore.decode`` (signature check, decompression, JSON) then
+``carts.decode``, or the cookie's signature check then ``carts.decode``.
+``encode`` is the reverse. ``bytes`` is what is stored: the ``session_data``
+column, or the cookie value.
+"""
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import signing
+
+from shop import carts
+
+
+def _json_session(cart):
+    return SessionStore().encode({carts.SESSION_KEY: {str(product_id): q for product_id, q in cart.items()}})
+
+
+def _compact_session(cart):
+    return SessionStore().encode({carts.SESSION_KEY: carts.encode(cart)})
+
+
+def _cookie_signer():
+    return signing.get_cookie_signer(salt=carts.cookie_name() + carts.SALT)
+
+
+def _cookie(cart):
+    return _cookie_signer().sign(carts.encode(cart))
+
+
+def _read_session(value):
+    return carts.decode(SessionStore().decode(value).get(carts.SESSION_KEY))
+
+
+def _read_cookie(value):
+    return carts.decode(_cookie_signer().unsign(value, max_age=settings.SESSION_COOKIE_AGE))
+
+
+# name: (encode, decode)
+FORMATS = {
+    'json-session': (_json_session, _read_session),
+    'compact-session': (_compact_session, _read_session),
+    'cookie': (_cookie, _read_cookie),
+}
+
+
+def _per_call_us(func, arg, iterations, repeats=5):
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func(arg)
+        runs.append((time.perf_counter() - started) / iterations * 1_000_000)
+    return statistics.median(runs)
+
+
+def run(lines, iterations, product_count=50_000, seed=42):
+    """``[{format, lines, bytes, decode_us, encode_us}]`` for carts of ``lines`` random products"""
+    rng = random.Random(seed)
+    cart = {product_id: rng.randint(1, 5) for product_id in rng.sample(range(1, product_count + 1), lines)}
+    results = []
+    for name, (encode, decode) in FORMATS.items():
+        stored = encode(cart)
+        assert decode(stored) == cart, name
+        results.append({
+            'format': name,
+            'lines': lines,
+            'bytes': len(stored),
+            'decode_us': _per_call_us(decode, stored, iterations),
+            'encode_us': _per_call_us(encode, cart, iterations),
+        })
+    return results
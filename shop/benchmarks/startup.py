@@ -0,0 +1,99 @@
+"""
+Cold-start cost of a fresh interpreter, as paid by every management command,
+cron job and new web worker.
+
+Each scenario runs in a new process, several times, for wall-clock time, and
+once more under ``python -X importtime`` to list the modules it imports and
+the most expensive ones. A scenario fails when its median time exceeds its
+budget or when it imports a module it has no use for: a command that pulls
+in Pillow or the views is paying for the web stack on every cron run.
+"""
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+
+SETUP = (
+    "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TileCommerce.settings'); "
+    "import django; django.setup()"
+)
+
+# Imported only by the web stack: system checks (Pillow, via the ImageField
+# check), the URLconf (views, feeds, admin URLs)
+WEB_ONLY = ('PIL', 'shop.urls', 'shop.views', 'shop.feeds')
+# Only the recommendations run needs these
+BATCH_ONLY = ('numpy', 'scipy')
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    argv: list
+    budget_ms: float
+    forbidden: tuple = field(default=())
+
+
+SCENARIOS = [
+    Scenario('setup', 'django.setup(), as every command does',
+             ['-c', SETUP], budget_ms=450, forbidden=WEB_ONLY + BATCH_ONLY),
+    Scenario('command', 'a maintenance command end to end (dedupe_users --dry-run)',
+             ['manage.py', 'dedupe_users', '--dry-run'], budget_ms=550,
+             forbidden=WEB_ONLY + BATCH_ONLY),
+    Scenario('wsgi', 'the WSGI application, as the gunicorn master preloads it',
+             ['-c', "import TileCommerce.wsgi; from django.urls import get_resolver; get_resolver().urlconf_module"],
+             budget_ms=550, forbidden=('PIL', *BATCH_ONLY)),
+]
+
+
+def parse_importtime(stderr):
+    """``[(module, self_us, cumulative_us, depth)]`` from ``-X importtime`` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def _spawn(argv, *options):
+    return subprocess.run([sys.executable, *options, *argv], cwd=settings.BASE_DIR,
+                          capture_output=True, text=True)
+
+
+def measure(scenario, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = _spawn(scenario.argv)
+        timings.append(time.perf_counter() - started)
+        if process.returncode:
+            raise RuntimeError(f'{scenario.name} exited with {process.returncode}: {process.stderr.strip()}')
+    modules = parse_importtime(_spawn(scenario.argv, '-X', 'importtime').stderr)
+    imported = {name for name, *_ in modules}
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'budget_ms': scenario.budget_ms,
+        'modules': len(imported),
+        'import_ms': sum(self_us for _, self_us, _, _ in modules) / 1000,
+        'slowest': sorted(modules, key=lambda m: m[1], reverse=True),
+        'forbidden': [prefix for prefix in scenario.forbidden
+                      if any(name == prefix or name.startswith(prefix + '.') for name in imported)],
+    }
+
+
+def check(results):
+    failures = []
+    for name, result in results.items():
+        if result['median_ms'] > result['budget_ms']:
+            failures.append(f'{name}: {result["median_ms"]:.0f}ms over its {result["budget_ms"]:.0f}ms budget')
+        if result['forbidden']:
+            failures.append(f'{name}: imports {", ".join(result["forbidden"])}')
+    return failures
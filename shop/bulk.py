@@ -0,0 +1,123 @@
+"""
+Bulk catalog maintenance behind the product and category admin actions.
+
+Each operation walks the selected products in primary-key batches, one
+transaction per batch, and changes a batch with a single UPDATE or DELETE.
+The per-row receivers in shop.signals are muted meanwhile; facet counts and
+catalog versions are brought up to date once at the end, so invalidation
+costs the same for ten products or a million.
+"""
+from collections import deque
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from . import facets, signals
+from .catalog import bump_all
+from .models import Product
+
+
+def _batch_size():
+    return getattr(settings, 'SHOP_ADMIN', {}).get('BATCH_SIZE', 2_000)
+
+
+def batches(queryset, batch_size):
+    """
+    Primary keys of ``queryset`` in ascending batches. Each batch starts after
+    the last key of the previous one rather than at an OFFSET, so changes to
+    earlier batches cannot shift rows in or out of later ones.
+    """
+    keys = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        batch = list((keys if last is None else keys.filter(pk__gt=last))[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def finish():
+    """Recount facets and invalidate catalog pages once, after rows changed without signals"""
+    facets.rebuild()
+    bump_all()
+
+
+def _each_batch(products, change, batch_size=None):
+    """Apply ``change(queryset)`` to every batch; return the sum of its results"""
+    total = 0
+    with signals.muted():
+        try:
+            for batch in batches(products, batch_size or _batch_size()):
+                with transaction.atomic():
+                    total += change(Product.objects.filter(pk__in=batch))
+        finally:
+            # Also after a failure: the earlier batches are committed
+            finish()
+    return total
+
+
+def adjust_prices(products, percent=0, amount=0, batch_size=None):
+    """
+    ``price = round(price * (1 + percent / 100) + amount, 2)``, never below
+    zero; return the number of products updated
+    """
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+    # Not a money field: that would round the factor to two places (+12.75% -> x1.13)
+    factor = Value(1 + Decimal(percent) / 100, output_field=models.DecimalField(max_digits=12, decimal_places=6))
+    price = Greatest(
+        Round(F('price') * factor + Value(Decimal(amount), output_field=money), 2, output_field=money),
+        Value(Decimal('0.00'), output_field=money),
+    )
+    # updated_at marks the rows for incremental feed generation (shop.feeds)
+    return _each_batch(products, lambda batch: batch.update(price=price, updated_at=timezone.now()), batch_size)
+
+
+def move_to_category(products, category, batch_size=None):
+    """Move ``products`` to ``category``; return the number of products moved"""
+    return _each_batch(
+        products, lambda batch: batch.update(category=category, updated_at=timezone.now()), batch_size
+    )
+
+
+def delete_products(products, batch_size=None):
+    """Delete ``products`` and their cart, wishlist and recommendation rows; return the number of products"""
+    return _each_batch(products, lambda batch: batch.delete()[1].get(Product._meta.label, 0), batch_size)
+
+
+def delete_categories(categories, batch_size=None):
+    """Delete ``categories``, their products in batches first; return (categories, products) deleted"""
+    products = delete_products(Product.objects.filter(category__in=categories), batch_size)
+    with signals.muted():
+        deleted = categories.delete()[1].get(categories.model._meta.label, 0)
+    finish()
+    return deleted, products
+
+
+def cascade_summary(queryset):
+    """
+    ``[(verbose name plural, count)]`` of every model that deleting
+    ``queryset`` would delete rows from, with one COUNT per model. Unlike the
+    admin's default confirmation page, no row is loaded.
+    """
+    found = {queryset.model: queryset}
+    pending = deque([queryset.model])
+    while pending:
+        model = pending.popleft()
+        for relation in model._meta.get_fields(include_hidden=True):
+            cascades = getattr(relation, 'on_delete', None) is models.CASCADE
+            if not relation.auto_created or relation.concrete or not cascades:
+                continue
+            condition = Q(**{f'{relation.field.name}__in': found[model].values('pk')})
+            related = relation.related_model
+            if related in found:
+                # Reached twice, e.g. recommendations of and to a product
+                found[related] = related._base_manager.filter(Q(pk__in=found[related].values('pk')) | condition)
+            else:
+                found[related] = related._base_manager.filter(condition)
+                pending.append(related)
+    return [(str(model._meta.verbose_name_plural), rows.count()) for model, rows in found.items()]
@@ -0,0 +1,172 @@
+"""
+Compact storage of anonymous carts.
+
+A cart maps product ids to quantities. Instead of a JSON object of string
+ids it is stored as ``<version>.<payload>``: the lines sorted by product id,
+each written as the gap from the previous id and the quantity, both as
+LEB128 varints, base64url-encoded without padding. 50 random lines from
+a 50,000 product catalog take about 190 characters instead of 590.
+
+Where it lives depends on ``SHOP_CARTS['STORAGE']``:
+
+* ``session`` - ``request.session['cart']``
+* ``cookie`` - a signed cookie, so a visitor with only a cart needs no
+  session row; ``CartCookieMiddleware`` writes it on the way out. A cart too
+  large for a cookie is kept in the session instead.
+
+Carts saved before this encoding (a JSON object of string ids) are read as
+they are and rewritten compactly on their next change, in either storage.
+"""
+import base64
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+
+logger = logging.getLogger('shop.carts')
+
+VERSION = '1'
+SESSION_KEY = 'cart'
+SALT = 'shop.carts'
+# Browsers keep cookies up to 4096 bytes including the name, the signature
+# and the attributes
+COOKIE_MAX_LENGTH = 3800
+
+
+def _config():
+    return getattr(settings, 'SHOP_CARTS', {})
+
+
+def storage():
+    return _config().get('STORAGE', 'session')
+
+
+def cookie_name():
+    return _config().get('COOKIE', 'shop_cart')
+
+
+def _pack(numbers):
+    out = bytearray()
+    for n in numbers:
+        while n > 0x7f:
+            out.append(n & 0x7f | 0x80)
+            n >>= 7
+        out.append(n)
+    return bytes(out)
+
+
+def _unpack(data):
+    numbers = []
+    n = shift = 0
+    for byte in data:
+        n |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(n)
+            n = shift = 0
+    if shift:
+        raise ValueError('truncated varint')
+    return numbers
+
+
+def encode(cart):
+    """``{product_id: quantity}`` as a compact string; lines of quantity 0 or less are dropped"""
+    numbers = []
+    previous = 0
+    for product_id in sorted(product_id for product_id, quantity in cart.items() if quantity > 0):
+        numbers += (product_id - previous, cart[product_id])
+        previous = product_id
+    if not numbers:
+        return ''
+    return f'{VERSION}.{base64.urlsafe_b64encode(_pack(numbers)).rstrip(b"=").decode("ascii")}'
+
+
+def decode(value):
+    """
+    ``{product_id: quantity}`` from ``encode`` output or the JSON object
+    form; an unreadable value is logged and read as an empty cart
+    """
+    if not value:
+        return {}
+    try:
+        if isinstance(value, dict):
+            return {int(product_id): int(quantity) for product_id, quantity in value.items()}
+        version, _, payload = value.partition('.')
+        if version != VERSION:
+            raise ValueError(f'unknown version {version!r}')
+        numbers = _unpack(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        if len(numbers) % 2:
+            raise ValueError('odd number of values')
+    except (AttributeError, TypeError, ValueError) as e:
+        logger.warning('Discarding unreadable cart: %s', e)
+        return {}
+    cart = {}
+    product_id = 0
+    for gap, quantity in zip(numbers[::2], numbers[1::2]):
+        product_id += gap
+        cart[product_id] = quantity
+    return cart
+
+
+def load(request):
+    """The request's cart as ``{product_id: quantity}``, decoded once per request"""
+    cart = getattr(request, '_shop_cart', None)
+    if cart is None:
+        value = None
+        if storage() == 'cookie':
+            value = request.get_signed_cookie(cookie_name(), default=None, salt=SALT,
+                                              max_age=settings.SESSION_COOKIE_AGE)
+        if value is None:
+            # Session storage, a cart too large for the cookie, or one saved
+            # before the cookie storage was turned on
+            value = request.session.get(SESSION_KEY)
+        cart = request._shop_cart = decode(value)
+    return cart
+
+
+def save(request, cart):
+    """Store ``cart`` (as changed in place or replaced) for the next request"""
+    request._shop_cart = cart
+    value = encode(cart)
+    if storage() == 'cookie':
+        if len(value) <= COOKIE_MAX_LENGTH:
+            request._shop_cart_cookie = value
+            request.session.pop(SESSION_KEY, None)
+            return
+        # An empty value deletes the cookie, so the session copy is read
+        request._shop_cart_cookie = ''
+    if value:
+        request.session[SESSION_KEY] = value
+    else:
+        request.session.pop(SESSION_KEY, None)
+
+
+class CartCookieMiddleware:
+    """
+    Write the cart cookie of requests that changed the cart, with
+    ``SHOP_CARTS['STORAGE'] = 'cookie'``. Place it after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if storage() != 'cookie':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie = cookie_name()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        value = getattr(request, '_shop_cart_cookie', None)
+        if value:
+            response.set_signed_cookie(
+                self.cookie, value, salt=SALT, max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        elif value is not None and self.cookie in request.COOKIES:
+            response.delete_cookie(self.cookie, samesite='Lax')
+        if hasattr(request, '_shop_cart'):
+            # As SessionMiddleware does for pages that read the session
+            patch_vary_headers(response, ('Cookie',))
+        return response
@@ -0,0 +1,155 @@
+"""
+Catalog versions and HTTP caching for catalog pages.
+
+Product and category changes bump version counters (see shop.signals):
+
+* ``catalog`` - any product or category
+* ``categories`` - the category list shown in the navigation
+* ``category:<id>`` - one category and its products
+* ``recommendations`` - precomputed related products
+
+Pages derive their ETag and Last-Modified from the counters they depend on,
+so a revalidation costs one primary-key query instead of a full render.
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import CartItem, CatalogVersion
+
+
+CATALOG = 'catalog'
+CATEGORIES = 'categories'
+# Bumped after each recommendations run (shop.recommendations); its
+# updated_at is the start of that run
+RECOMMENDATIONS = 'recommendations'
+
+_pending = threading.local()
+
+
+def category_key(category_id):
+    return f'category:{category_id}'
+
+
+def bump(*keys, at=None):
+    """Increment the given counters, creating missing ones, as changed ``at`` (default now)"""
+    now = at or timezone.now()
+    for key in keys:
+        if CatalogVersion.objects.filter(key=key).update(version=F('version') + 1, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                CatalogVersion.objects.create(key=key, version=1)
+            if at is not None:
+                # auto_now overrides the timestamp on create
+                CatalogVersion.objects.filter(key=key).update(updated_at=at)
+        except IntegrityError:
+            # Created by a concurrent request
+            CatalogVersion.objects.filter(key=key).update(version=F('version') + 1, updated_at=now)
+
+
+def bump_on_commit(*keys):
+    """
+    Bump ``keys`` once the current transaction commits. Keys from one
+    transaction are merged, so deleting a whole category bumps each counter
+    once rather than once per product.
+    """
+    if not hasattr(_pending, 'keys'):
+        _pending.keys = set()
+    _pending.keys.update(keys)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    # Later callbacks of the same transaction find nothing left to do. Keys
+    # from a rolled-back transaction are bumped at the next commit, which
+    # only over-invalidates.
+    keys, _pending.keys = _pending.keys, set()
+    bump(*sorted(keys))
+
+
+def bump_all():
+    """Invalidate every catalog page, e.g. after bulk changes that bypass signals"""
+    CatalogVersion.objects.update(version=F('version') + 1, updated_at=timezone.now())
+    existing = set(CatalogVersion.objects.filter(key__in=[CATALOG, CATEGORIES]).values_list('key', flat=True))
+    bump(*(key for key in (CATALOG, CATEGORIES) if key not in existing))
+
+
+def validators(request, *keys, per_user=True):
+    """
+    ``(etag, last_modified)`` of a page that depends on ``keys``.
+
+    Pages for signed-in users also show the cart badge and a CSRF token, so
+    their validators include the user, ``last_login`` and the cart state.
+    With ``per_user=False`` (responses that are the same for everyone) the
+    user is not loaded.
+    """
+    rows = dict(
+        (key, (version, updated_at))
+        for key, version, updated_at in CatalogVersion.objects.filter(key__in=keys).values_list(
+            'key', 'version', 'updated_at')
+    )
+    parts = [request.get_full_path(), *(f'{key}={rows.get(key, (0,))[0]}' for key in keys)]
+    timestamps = [updated_at for _, updated_at in rows.values()]
+    user = request.user if per_user else None
+    if user is not None and user.is_authenticated:
+        cart = CartItem.objects.filter(cart__user=user).aggregate(items=Count('pk'), updated_at=Max('updated_at'))
+        parts += [f'user={user.pk}', f'login={user.last_login}', f'cart={cart["items"]}@{cart["updated_at"]}']
+        timestamps += [user.last_login, cart['updated_at']]
+    etag = hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+    return etag, max((t for t in timestamps if t is not None), default=None)
+
+
+def catalog_page(get_validators, per_user=True):
+    """
+    Serve GET/HEAD with an ETag and Last-Modified from
+    ``get_validators(request, *args, **kwargs)`` and answer matching
+    revalidations with 304 before the view runs.
+
+    Anonymous pages are ``public`` (shared caches may keep them for
+    ``SHOP_HTTP_CACHE['SHARED_MAX_AGE']`` seconds); pages for signed-in users
+    are ``private``. Both are revalidated by browsers on every visit.
+    ``get_validators`` may return None to skip, e.g. for a missing object.
+
+    ``per_user=False`` is for responses that are the same for everyone, such
+    as JSON: they are always ``public`` and never load the session or user.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            # Pending flash messages must be rendered, never answered with a 304
+            if per_user and len(messages.get_messages(request)):
+                return view_func(request, *args, **kwargs)
+            page = get_validators(request, *args, **kwargs)
+            if page is None:
+                return view_func(request, *args, **kwargs)
+            etag, last_modified = quote_etag(page[0]), page[1]
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response.headers.setdefault('ETag', etag)
+                if last_modified:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+
+            if per_user and request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                shared_max_age = getattr(settings, 'SHOP_HTTP_CACHE', {}).get('SHARED_MAX_AGE', 0)
+                patch_cache_control(response, public=True, max_age=0, s_maxage=shared_max_age)
+            return response
+        return wrapper
+    return decorator
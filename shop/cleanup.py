@@ -0,0 +1,201 @@
+"""
+Delete abandoned carts, empty wishlists and expired sessions.
+
+Nothing else removes them: a signed-in user's ``Cart`` stays forever once
+created, a ``Wishlist`` stays after its last product is removed, and Django
+only deletes expired sessions when ``clearsessions`` runs, in a single
+statement. ``tasks()``:
+
+* ``carts`` - carts whose lines have not changed for ``CART_DAYS``; their
+  lines go with them
+* ``wishlists`` - wishlists with no products, older than ``WISHLIST_HOURS``
+* ``sessions`` - sessions past their expiry date (database-backed engines only)
+
+Rows are deleted in batches walked in primary key order: each batch reads
+the next ``batch_size`` stale primary keys after the previous batch, locks
+those rows (skipping rows a request holds, on databases with row locks),
+keeps the ones that are no longer stale and deletes the rest, in its own
+short transaction. A request that touches a cart while it
+is being collected is never blocked for longer than one batch, and a cart
+that became active again is not deleted.
+
+With an archive directory, the deleted rows (carts with their lines) are
+first written to ``<task>-<time>.jsonl.gz``, one JSON object per line.
+Sessions are never archived: they hold login state, and an expired one is
+of no use.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Cart, CartItem, Wishlist, WishlistItem
+
+
+def _config():
+    return getattr(settings, 'SHOP_CLEANUP', {})
+
+
+def archive_directory():
+    """Where deleted rows are archived by default; '' to not archive"""
+    return str(_config().get('ARCHIVE_DIR', '') or '')
+
+
+class Task:
+    """
+    One kind of stale row.
+
+    ``stale(now)`` returns a queryset of ``model`` matching the rows to
+    delete. ``children`` are ``(key, model, foreign key)`` triples of rows
+    archived with their parent under ``key``; deleting the parent deletes
+    them. ``archive`` is False for rows that must not be copied anywhere.
+    """
+
+    def __init__(self, name, model, stale, children=(), archive=True):
+        self.name = name
+        self.model = model
+        self.stale = stale
+        self.children = children
+        self.archive = archive
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+
+def _abandoned_carts(now):
+    cutoff = now - timedelta(days=_config().get('CART_DAYS', 90))
+    recent_lines = CartItem.objects.filter(cart=OuterRef('pk'), updated_at__gte=cutoff)
+    return Cart.objects.filter(updated_at__lt=cutoff).exclude(Exists(recent_lines))
+
+
+def _empty_wishlists(now):
+    # Not one just created: add_to_wishlist saves its first product right after
+    cutoff = now - timedelta(hours=_config().get('WISHLIST_HOURS', 24))
+    items = WishlistItem.objects.filter(wishlist=OuterRef('pk'))
+    return Wishlist.objects.filter(created_at__lt=cutoff).exclude(Exists(items))
+
+
+def session_model():
+    """The session model of ``SESSION_ENGINE``, or None if sessions are not stored in the database"""
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(store, 'get_model_class'):
+        return None
+    return store.get_model_class()
+
+
+def _expired_sessions(now):
+    return session_model().objects.filter(expire_date__lt=now)
+
+
+def tasks():
+    """The tasks that apply with the current settings, in the order they run"""
+    found = [
+        Task('carts', Cart, _abandoned_carts, children=(('items', CartItem, 'cart_id'),)),
+        Task('wishlists', Wishlist, _empty_wishlists),
+    ]
+    model = session_model()
+    if model is not None:
+        found.append(Task('sessions', model, _expired_sessions, archive=False))
+    return found
+
+
+def _rows(task, pks, using):
+    """The rows ``pks`` of ``task`` with their children, as JSON-ready dicts"""
+    key_field = task.model._meta.pk.attname
+    rows = {row[key_field]: row for row in task.model.objects.using(using).filter(pk__in=pks).values()}
+    for key, model, foreign_key in task.children:
+        for row in rows.values():
+            row[key] = []
+        for child in model.objects.using(using).filter(**{f'{foreign_key}__in': pks}).values():
+            rows[child[foreign_key]][key].append(child)
+    return list(rows.values())
+
+
+class _Archive:
+    """A gzipped JSONL file, created when the first row is written"""
+
+    def __init__(self, directory, task, now):
+        self.path = os.path.join(directory, f'{task.name}-{now:%Y%m%dT%H%M%SZ}.jsonl.gz')
+        self.file = None
+
+    def write(self, rows):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+        for row in rows:
+            self.file.write(json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n')
+        # Each batch is on disk before its rows are deleted
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def collect(task, now=None, batch_size=500, pause=0.0, archive_dir='', max_seconds=None, progress=None):
+    """
+    Delete ``task``'s stale rows in batches of ``batch_size``, sleeping
+    ``pause`` seconds between batches and stopping after ``max_seconds``.
+    Return ``{'deleted': {model label: rows}, 'batches', 'seconds',
+    'archive' (path or None), 'finished'}``. ``progress`` is called with
+    the running totals after each batch.
+    """
+    now = now or timezone.now()
+    using = router.db_for_write(task.model)
+    archive = _Archive(archive_dir, task, now) if archive_dir and task.archive else None
+    deleted = {}
+    batches = 0
+    last = None
+    started = time.perf_counter()
+    finished = False
+    try:
+        while True:
+            with transaction.atomic(using=using):
+                stale = task.stale(now).using(using)
+                if last is not None:
+                    stale = stale.filter(pk__gt=last)
+                # Rows a request has locked are left for the next run
+                locked = list(
+                    stale.order_by('pk').select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size]
+                )
+                if not locked:
+                    finished = True
+                    break
+                last = locked[-1]
+                # Rows that became active between the read and the lock are kept
+                pks = list(task.stale(now).using(using).filter(pk__in=locked).values_list('pk', flat=True))
+                counts = {}
+                if pks:
+                    if archive is not None:
+                        archive.write(_rows(task, pks, using))
+                    _, counts = task.model.objects.using(using).filter(pk__in=pks).delete()
+            batches += 1
+            for label, count in counts.items():
+                deleted[label] = deleted.get(label, 0) + count
+            if progress:
+                progress(deleted, time.perf_counter() - started)
+            if len(locked) < batch_size:
+                finished = True
+                break
+            if max_seconds is not None and time.perf_counter() - started >= max_seconds:
+                break
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive is not None:
+            archive.close()
+    return {
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': time.perf_counter() - started,
+        'archive': archive.path if archive is not None and archive.file is not None else None,
+        'finished': finished,
+    }
@@ -0,0 +1,192 @@
+"""
+Faceted filtering of the catalog by category and price.
+
+``ProductFacet`` holds the number of products per (category, price bucket).
+``rebuild`` fills it with one GROUP BY; after that shop.signals keeps it
+current as products are added, changed or deleted. Each process caches the
+whole table (categories x buckets, a few thousand rows) until the catalog
+version changes, so the counts for any combination of filters are sums over
+an in-memory dict rather than COUNT queries.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .catalog import CATALOG
+from .models import CatalogVersion, Product, ProductFacet
+
+
+# Lower bounds of the price buckets; the last bucket is open-ended
+DEFAULT_PRICE_BUCKETS = (0, 25, 50, 100, 250, 500, 1000)
+
+# (catalog version, {(category_id, bucket): count})
+_cache = None
+
+
+def bucket_bounds():
+    return tuple(getattr(settings, 'SHOP_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS))
+
+
+def bucket_for(price):
+    return max(0, bisect_right(bucket_bounds(), Decimal(str(price))) - 1)
+
+
+def bucket_range(bucket):
+    """``(low, high)`` of a bucket; ``high`` is None for the last one"""
+    bounds = bucket_bounds()
+    return bounds[bucket], bounds[bucket + 1] if bucket + 1 < len(bounds) else None
+
+
+def bucket_label(bucket):
+    low, high = bucket_range(bucket)
+    return f'{low} – {high}' if high is not None else f'{low}+'
+
+
+def parse_buckets(values):
+    """Valid bucket numbers from query string values"""
+    count = len(bucket_bounds())
+    # isdigit() alone accepts '²', which int() rejects, and '１', which it reads as 1
+    return sorted({int(value) for value in values if value.isascii() and value.isdigit() and int(value) < count})
+
+
+def price_filter(buckets):
+    """Q matching products in any of ``buckets``"""
+    condition = Q()
+    for bucket in buckets:
+        low, high = bucket_range(bucket)
+        condition |= Q(price__gte=low, price__lt=high) if high is not None else Q(price__gte=low)
+    return condition
+
+
+def _bucket_expression():
+    bounds = bucket_bounds()
+    return Case(
+        *(When(price__lt=bound, then=Value(bucket)) for bucket, bound in enumerate(bounds[1:])),
+        default=Value(len(bounds) - 1),
+    )
+
+
+def rebuild():
+    """
+    Recount every facet from the products table; return the number of rows.
+    Run after bulk changes that send no signals or after changing
+    SHOP_PRICE_BUCKETS.
+    """
+    rows = (
+        Product.objects.order_by()
+        .annotate(bucket=_bucket_expression())
+        .values_list('category_id', 'bucket')
+        .annotate(count=Count('pk'))
+    )
+    with transaction.atomic():
+        ProductFacet.objects.all().delete()
+        ProductFacet.objects.bulk_create(
+            [ProductFacet(category_id=category_id, price_bucket=bucket, count=count)
+             for category_id, bucket, count in rows],
+            batch_size=2000,
+        )
+    return len(rows)
+
+
+def adjust(category_id, price, delta):
+    """Add ``delta`` products to the facet of ``category_id`` and ``price``"""
+    facet = ProductFacet.objects.filter(category_id=category_id, price_bucket=bucket_for(price))
+    if delta < 0:
+        # Never below zero, even if the table drifted
+        facet.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    if facet.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ProductFacet.objects.create(category_id=category_id, price_bucket=bucket_for(price), count=delta)
+    except IntegrityError:
+        # Created concurrently
+        facet.update(count=F('count') + delta)
+
+
+def facet_counts():
+    """``{(category_id, bucket): count}``, reloaded when the catalog version changes"""
+    global _cache
+    version = CatalogVersion.objects.filter(key=CATALOG).values_list('version', flat=True).first()
+    cached = _cache
+    if cached is None or version is None or cached[0] != version:
+        counts = {
+            (category_id, bucket): count
+            for category_id, bucket, count in ProductFacet.objects.values_list('category_id', 'price_bucket', 'count')
+            if count
+        }
+        cached = _cache = (version, counts)
+    return cached[1]
+
+
+def summarize(category_ids=(), buckets=()):
+    """
+    ``(total, category_counts, bucket_counts)`` for a filter. Each facet's
+    counts apply the other facet's selection but not its own, so customers
+    see what adding a value would give.
+    """
+    category_ids, buckets = set(category_ids), set(buckets)
+    total = 0
+    category_counts = defaultdict(int)
+    bucket_counts = defaultdict(int)
+    for (category_id, bucket), count in facet_counts().items():
+        in_categories = not category_ids or category_id in category_ids
+        in_buckets = not buckets or bucket in buckets
+        if in_buckets:
+            category_counts[category_id] += count
+        if in_categories:
+            bucket_counts[bucket] += count
+        if in_categories and in_buckets:
+            total += count
+    return total, category_counts, bucket_counts
+
+
+def _toggler(query, param):
+    """Build listing URLs with one value of ``param`` added or removed, keeping other filters"""
+    base = reverse('products_list')
+    others = [(key, value) for key, values in query.lists() if key not in (param, 'page') for value in values]
+    selected = [value for value in query.getlist(param) if value]
+
+    def url(value):
+        values = [v for v in selected if v != value] if value in selected else [*selected, value]
+        return f'{base}?{urlencode(others + [(param, v) for v in values])}'
+    return url
+
+
+def sidebar(query, categories, selected_categories, selected_buckets):
+    """Facet values with counts, selection state and toggle URLs for the listing sidebar"""
+    total, category_counts, bucket_counts = summarize(
+        [category.pk for category in selected_categories], selected_buckets
+    )
+    selected_ids = {category.pk for category in selected_categories}
+    category_url, price_url = _toggler(query, 'category'), _toggler(query, 'price')
+    prices = []
+    for bucket in range(len(bucket_bounds())):
+        low, high = bucket_range(bucket)
+        prices.append({
+            'bucket': bucket,
+            'min': low,
+            'max': high,
+            'label': bucket_label(bucket),
+            'count': bucket_counts.get(bucket, 0),
+            'selected': bucket in selected_buckets,
+            'url': price_url(str(bucket)),
+        })
+    return {
+        'total': total,
+        'categories': [{
+            'slug': category.slug,
+            'name': category.name,
+            'count': category_counts.get(category.pk, 0),
+            'selected': category.pk in selected_ids,
+            'url': category_url(category.slug),
+        } for category in categories],
+        'prices': prices,
+    }
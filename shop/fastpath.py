@@ -0,0 +1,118 @@
+"""
+Serve routes that need no session or user without the middleware that loads them.
+
+Every request otherwise passes through the session, CSRF, auth and messages
+middleware (about 100-150us per request, before the view) even when the view
+never looks at a session. For GET and HEAD requests to a view named in
+``SHOP_FASTPATH['ROUTES']``, ``FastPathMiddleware`` resolves the URL and
+calls the view itself, so the middleware after it never runs. Requests for
+paths matching ``SHOP_FASTPATH['NOT_FOUND']`` (favicon and scanner misses)
+get a cacheable 404 without resolving at all.
+
+On the fast path ``request.session`` and ``request.user`` raise
+ImproperlyConfigured when used, so a listed view that starts reading them
+fails loudly in development instead of quietly answering as anonymous.
+Views listed here must:
+
+* return the same response to everyone (no session, user, messages or CSRF token)
+* not set cookies that middleware after this one would add (sessions, carts, CSRF)
+* not need ``process_view`` hooks or template response rendering by middleware
+
+The middleware before this one (security, static files, replica pinning,
+instrumentation) still runs for these requests.
+"""
+import functools
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.http import HttpResponseNotFound
+from django.urls import URLResolver, Resolver404, get_resolver
+from django.urls.resolvers import RegexPattern
+from django.utils.cache import patch_cache_control
+from django.utils.functional import SimpleLazyObject
+
+
+def _config():
+    return getattr(settings, 'SHOP_FASTPATH', {})
+
+
+def routes():
+    """URL names served on the fast path"""
+    return frozenset(_config().get('ROUTES', ()))
+
+
+def _prune(patterns, names):
+    """``patterns`` with only the URL patterns called one of ``names``, keeping their includes"""
+    kept = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            included = _prune(pattern.url_patterns, names)
+            if included:
+                kept.append(URLResolver(pattern.pattern, included, pattern.default_kwargs,
+                                        pattern.app_name, pattern.namespace))
+        elif pattern.name in names:
+            kept.append(pattern)
+    return kept
+
+
+@functools.lru_cache(maxsize=None)
+def _resolver(urlconf, names):
+    """A resolver of ``urlconf`` that only knows the URL patterns called one of ``names``"""
+    return URLResolver(RegexPattern(r'^/'), _prune(get_resolver(urlconf).url_patterns, names))
+
+
+def _unavailable(attribute, view_name):
+    def fail():
+        raise ImproperlyConfigured(
+            f'request.{attribute} is not available in {view_name!r}, which is served on the fast path. '
+            f'Remove it from SHOP_FASTPATH["ROUTES"] or stop using request.{attribute}.'
+        )
+    return SimpleLazyObject(fail)
+
+
+class FastPathMiddleware:
+    """
+    Answer requests for ``SHOP_FASTPATH`` routes without the middleware after
+    this one. Place it before SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        config = _config()
+        if not config.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.routes = routes()
+        self.not_found = [re.compile(pattern) for pattern in config.get('NOT_FOUND', ())]
+        self.not_found_max_age = config.get('NOT_FOUND_MAX_AGE', 86400)
+        self.names = frozenset(name.rpartition(':')[2] for name in self.routes)
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        path = request.path_info.lstrip('/')
+        if any(pattern.search(path) for pattern in self.not_found):
+            response = HttpResponseNotFound(b'Not Found', content_type='text/plain')
+            patch_cache_control(response, public=True, max_age=self.not_found_max_age)
+            # Expected misses; do not log a warning for each as Django does for 404s
+            response._has_been_logged = True
+            return response
+        try:
+            # Resolving against the fast routes alone costs other requests a
+            # few microseconds instead of a second full resolve. Built on the
+            # first request, as importing the URLconf here would slow down
+            # every process start.
+            match = _resolver(settings.ROOT_URLCONF, self.names).resolve(request.path_info)
+        except Resolver404:
+            return self.get_response(request)
+        # Another route of the same name in a different namespace
+        if match.view_name not in self.routes:
+            return self.get_response(request)
+
+        request.resolver_match = match
+        request.session = _unavailable('session', match.view_name)
+        request.user = _unavailable('user', match.view_name)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
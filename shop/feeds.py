@@ -0,0 +1,302 @@
+"""
+Sitemaps and the merchant product feed, written to static files.
+
+Crawlers and shopping engines read the whole catalog from a few gzipped
+files instead of walking the paginated product list. Products are split
+into chunks by primary key (``pk // CHUNK_SIZE``), so a product stays in the
+same chunk between runs. ``generate`` compares each chunk's product count and
+latest ``updated_at`` with the manifest of the previous run, and re-reads
+only the chunks that changed, streaming them with ``iterator()``. Per chunk
+it writes:
+
+* ``sitemap-products-<n>.xml.gz``, one sitemap
+* ``parts/products-<n>.xml.gz`` and ``parts/products-<n>.csv.gz``, the
+  chunk's feed entries, each a complete gzip member
+
+``products.xml.gz`` and ``products.csv.gz`` are assembled by concatenating
+those members between a header and a footer member (RFC 1952 allows a gzip
+file to hold several), so unchanged chunks are neither queried nor
+recompressed.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+from datetime import timezone as dt_timezone
+from contextlib import contextmanager, suppress
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, Q
+from django.db.models.functions import Cast, Floor
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .catalog import CATALOG, CATEGORIES, category_key
+from .models import CatalogVersion, Category, Product
+
+
+# Bump when the output changes so the next run rewrites every chunk
+FORMAT = 1
+MANIFEST = 'manifest.json'
+SITEMAP_INDEX = 'sitemap.xml'
+# Sitemap protocol maximum of URLs per file
+SITEMAP_LIMIT = 50_000
+FEED_COLUMNS = ('id', 'title', 'description', 'link', 'image_link', 'price', 'availability', 'condition',
+                'product_type')
+# RSS elements where RSS has one, the Google namespace otherwise
+FEED_TAGS = tuple(column if column in ('title', 'description', 'link') else f'g:{column}' for column in FEED_COLUMNS)
+
+SITEMAP_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_FOOTER = '</urlset>\n'
+FEED_FOOTER = '</channel>\n</rss>\n'
+
+
+class BaseURLMissing(Exception):
+    pass
+
+
+def _config():
+    return getattr(settings, 'SHOP_FEEDS', {})
+
+
+def directory():
+    return str(_config().get('DIR', settings.BASE_DIR / 'feeds'))
+
+
+@contextmanager
+def _atomic(path):
+    """Yield a temporary path that replaces ``path`` only if the block succeeds"""
+    tmp = f'{path}.tmp'
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        with suppress(FileNotFoundError):
+            os.remove(tmp)
+
+
+@contextmanager
+def _writer(path, compress=True):
+    """Text stream to ``path``, gzip-compressed unless ``compress`` is false"""
+    with _atomic(path) as tmp, open(tmp, 'wb') as raw:
+        # mtime=0 keeps unchanged output byte-identical between runs
+        stream = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if compress else raw
+        with io.TextIOWrapper(stream, encoding='utf-8', newline='') as text:
+            yield text
+
+
+def _url_template(name, base_url):
+    """``'https://shop/product/{}/'``: one reverse() instead of one per product"""
+    placeholder = 987654321
+    return urljoin(base_url, reverse(name, args=[placeholder])).replace(str(placeholder), '{}')
+
+
+def _lastmod(value):
+    return value.astimezone(dt_timezone.utc).isoformat(timespec='seconds')
+
+
+def chunk_signatures(chunk_size):
+    """``{chunk: [product count, latest updated_at]}`` in one grouped query"""
+    # Integer floor: "/" is decimal division on MySQL
+    rows = (
+        Product.objects.order_by()
+        .annotate(chunk=Cast(Floor(F('pk') / chunk_size), IntegerField()))
+        .values_list('chunk')
+        .annotate(count=Count('pk'), lastmod=Max('updated_at'))
+    )
+    return {str(chunk): [count, _lastmod(lastmod)] for chunk, count, lastmod in rows}
+
+
+def feed_header(base_url):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+        f'<title>TileCommerce</title>\n<link>{escape(base_url)}</link>\n'
+        '<description>TileCommerce product feed</description>\n'
+    )
+
+
+def write_chunk(path, chunk, chunk_size, base_url):
+    """Write one chunk's sitemap and feed parts; return the number of products"""
+    currency = _config().get('CURRENCY', 'INR')
+    product_url = _url_template('product_detail', base_url)
+    products = (
+        Product.objects.filter(pk__gte=chunk * chunk_size, pk__lt=(chunk + 1) * chunk_size)
+        .select_related('category')
+        .only('pk', 'name', 'description', 'price', 'image', 'updated_at', 'category__name')
+        .order_by('pk')
+    )
+    count = 0
+    with _writer(os.path.join(path, f'sitemap-products-{chunk}.xml.gz')) as sitemap, \
+            _writer(os.path.join(path, 'parts', f'products-{chunk}.xml.gz')) as xml, \
+            _writer(os.path.join(path, 'parts', f'products-{chunk}.csv.gz')) as csv_part:
+        sitemap.write(SITEMAP_HEADER)
+        rows = csv.writer(csv_part)
+        for product in products.iterator(chunk_size=2_000):
+            link = product_url.format(product.pk)
+            image = urljoin(base_url, product.image.url) if product.image else ''
+            values = (
+                product.pk,
+                product.name[:150],
+                # Merchant feeds reject descriptions over 5000 characters
+                product.description[:5000],
+                link,
+                image,
+                f'{product.price} {currency}',
+                'in_stock',
+                'new',
+                product.category.name,
+            )
+            sitemap.write(f'<url><loc>{escape(link)}</loc><lastmod>{_lastmod(product.updated_at)}</lastmod></url>\n')
+            xml.write('<item>' + ''.join(
+                f'<{tag}>{escape(str(value))}</{tag}>' for tag, value in zip(FEED_TAGS, values)
+            ) + '</item>\n')
+            rows.writerow(values)
+            count += 1
+        sitemap.write(SITEMAP_FOOTER)
+    return count
+
+
+def write_catalog_sitemaps(path, base_url):
+    """
+    Sitemaps for the home page, the product list and each category listing;
+    return ``[(filename, lastmod)]``.
+    """
+    versions = dict(
+        CatalogVersion.objects.filter(Q(key=CATALOG) | Q(key__startswith='category:'))
+        .values_list('key', 'updated_at')
+    )
+    now = timezone.now()
+    listing = urljoin(base_url, reverse('products_list'))
+    changed = versions.get(CATALOG, now)
+    entries = [(urljoin(base_url, reverse('home')), changed), (listing, changed)]
+    entries += [
+        (f'{listing}?category={slug}', versions.get(category_key(pk), now))
+        for pk, slug in Category.objects.order_by('pk').values_list('pk', 'slug')
+    ]
+    written = []
+    for start in range(0, len(entries), SITEMAP_LIMIT):
+        batch = entries[start:start + SITEMAP_LIMIT]
+        filename = f'sitemap-catalog-{len(written)}.xml.gz'
+        with _writer(os.path.join(path, filename)) as sitemap:
+            sitemap.write(SITEMAP_HEADER)
+            for loc, lastmod in batch:
+                sitemap.write(f'<url><loc>{escape(loc)}</loc><lastmod>{_lastmod(lastmod)}</lastmod></url>\n')
+            sitemap.write(SITEMAP_FOOTER)
+        written.append((filename, max(lastmod for _, lastmod in batch)))
+    return written
+
+
+def _assemble(path, filename, header, footer, parts):
+    """Concatenate gzip members into one feed file"""
+    with _atomic(os.path.join(path, filename)) as tmp, open(tmp, 'wb') as out:
+        out.write(gzip.compress(header.encode(), mtime=0))
+        for part in parts:
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out)
+        if footer:
+            out.write(gzip.compress(footer.encode(), mtime=0))
+
+
+def _write_index(path, base_url, sitemaps):
+    with _writer(os.path.join(path, SITEMAP_INDEX), compress=False) as index:
+        index.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for filename, lastmod in sitemaps:
+            index.write(f'<sitemap><loc>{escape(urljoin(base_url, filename))}</loc>'
+                        f'<lastmod>{lastmod}</lastmod></sitemap>\n')
+        index.write('</sitemapindex>\n')
+
+
+def _remove_chunk(path, chunk):
+    for filename in (f'sitemap-products-{chunk}.xml.gz', f'parts/products-{chunk}.xml.gz',
+                     f'parts/products-{chunk}.csv.gz'):
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(path, filename))
+
+
+def generate(full=False, base_url=None, progress=None):
+    """
+    Bring the sitemaps and feeds in ``SHOP_FEEDS['DIR']`` up to date.
+    Return ``{'chunks', 'regenerated', 'products'}``, the last being the
+    number of products written.
+    """
+    config = _config()
+    base_url = (base_url or config.get('BASE_URL') or '').rstrip('/') + '/'
+    if base_url == '/':
+        raise BaseURLMissing('Set SHOP_SITE_URL or pass --base-url; sitemaps need absolute URLs.')
+    chunk_size = min(config.get('CHUNK_SIZE', SITEMAP_LIMIT), SITEMAP_LIMIT)
+    path = directory()
+    os.makedirs(os.path.join(path, 'parts'), exist_ok=True)
+
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    categories_version = CatalogVersion.objects.filter(key=CATEGORIES).values_list('version', flat=True).first()
+    settings_changed = (
+        previous.get('format'), previous.get('base_url'), previous.get('chunk_size'),
+        previous.get('categories_version'),
+    ) != (FORMAT, base_url, chunk_size, categories_version)
+    reuse = {} if full or settings_changed else previous.get('chunks', {})
+
+    signatures = chunk_signatures(chunk_size)
+    written = 0
+    changed = [chunk for chunk, signature in signatures.items() if reuse.get(chunk) != signature]
+    for chunk in changed:
+        written += write_chunk(path, int(chunk), chunk_size, base_url)
+        if progress:
+            progress(chunk, written)
+    for chunk in set(previous.get('chunks', {})) - set(signatures):
+        _remove_chunk(path, chunk)
+
+    chunks = sorted(signatures, key=int)
+    sitemaps = [(name, _lastmod(lastmod)) for name, lastmod in write_catalog_sitemaps(path, base_url)]
+    sitemaps += [(f'sitemap-products-{chunk}.xml.gz', signatures[chunk][1]) for chunk in chunks]
+    current = {filename for filename, _ in sitemaps}
+    for filename in os.listdir(path):
+        if filename.startswith('sitemap-catalog-') and filename not in current:
+            os.remove(os.path.join(path, filename))
+    _write_index(path, base_url, sitemaps)
+
+    parts = lambda extension: [os.path.join(path, 'parts', f'products-{chunk}.{extension}.gz') for chunk in chunks]
+    _assemble(path, 'products.xml.gz', feed_header(base_url), FEED_FOOTER, parts('xml'))
+    _assemble(path, 'products.csv.gz', ','.join(FEED_COLUMNS) + '\r\n', '', parts('csv'))
+
+    # Written last: an interrupted run leaves the previous manifest, so the
+    # next run redoes the chunks this one did not finish
+    with _writer(os.path.join(path, MANIFEST), compress=False) as f:
+        json.dump({
+            'format': FORMAT,
+            'base_url': base_url,
+            'chunk_size': chunk_size,
+            'categories_version': categories_version,
+            'generated_at': timezone.now().isoformat(),
+            'chunks': signatures,
+        }, f, indent=1)
+    return {'chunks': len(chunks), 'regenerated': len(changed), 'products': written}
+
+
+def serve(request, filename):
+    """Stream a generated file with Last-Modified, answering revalidations with 304"""
+    path = os.path.join(directory(), filename)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('Not generated yet. Run "manage.py generate_feeds".')
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), int(stat.st_mtime)):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'))
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_cache_control(response, public=True, max_age=_config().get('HTTP_MAX_AGE', 3600))
+    return response
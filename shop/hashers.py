@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from
+    ``settings.SHOP_PBKDF2_ITERATIONS``.
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes verify
+    unchanged and are re-encoded with the configured work factor on the next
+    successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'SHOP_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,96 @@
+"""
+Liveness and readiness checks for the load balancer and zero-downtime deploys.
+
+``/healthz`` answers from the process alone: if it responds, the worker is
+alive. ``/readyz`` runs ``CHECKS`` and answers 503 until all of them pass:
+
+* ``database`` - ``SELECT 1`` on every configured database (primary and replicas)
+* ``cache`` - a set and get round trip on the default cache
+* ``migrations`` - the primary has no unapplied migrations; remembered once
+  true, since a running process never sees its migrations unapplied
+* ``warmup`` - every warmup step has succeeded in this process (shop.warmup),
+  warming it now if not
+
+Failures are logged in full; the response only names the exception, so a
+public probe does not reveal database hosts or credentials.
+"""
+import logging
+import uuid
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import warmup
+
+
+logger = logging.getLogger('shop.health')
+
+_migrated = False
+
+
+class NotReady(Exception):
+    pass
+
+
+def _database():
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def _cache():
+    # A key per probe, so concurrent probes of a shared cache do not race
+    key = f'shop:readyz:{uuid.uuid4().hex}'
+    cache.set(key, 1, timeout=10)
+    try:
+        if cache.get(key) != 1:
+            raise NotReady('cache did not return the value just set')
+    finally:
+        cache.delete(key)
+
+
+def _migrations():
+    global _migrated
+    if _migrated:
+        return
+    # Loads every migration module, so only until the first success
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise NotReady(f'{len(plan)} unapplied migrations')
+    _migrated = True
+
+
+def _warmup():
+    if warmup.completed is None:
+        timings = warmup.warm()
+        if warmup.completed is None:
+            failed = [name for name, _ in warmup.STEPS if name not in timings]
+            raise NotReady(f'warmup failed: {", ".join(failed)}')
+
+
+CHECKS = (
+    ('database', _database),
+    ('cache', _cache),
+    ('migrations', _migrations),
+    ('warmup', _warmup),
+)
+
+
+def readiness():
+    """``(ready, {check: 'ok' or what failed})``"""
+    results = {}
+    for name, check in CHECKS:
+        try:
+            check()
+        except NotReady as e:
+            logger.warning('Readiness check %s failed: %s', name, e)
+            results[name] = str(e)
+        except Exception as e:
+            logger.exception('Readiness check %s failed', name)
+            results[name] = type(e).__name__
+        else:
+            results[name] = 'ok'
+    return all(result == 'ok' for result in results.values()), results
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from shop.benchmarks import connections as bench
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure request throughput as concurrent workers grow, with a new database '
+        'connection per request, persistent connections and a connection pool.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help='Concurrent worker threads to try')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Requests per worker')
+        parser.add_argument('--modes', nargs='+', choices=list(bench.MODES), default=list(bench.MODES),
+                            help='Connection modes to compare')
+        parser.add_argument('--path', default=None,
+                            help='Page to request (default: the first product)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path is None:
+            product_id = Product.objects.order_by('pk').values_list('pk', flat=True).first()
+            if product_id is None:
+                raise CommandError('No products found. Run "manage.py seed_shop" first.')
+            path = reverse('product_detail', args=[product_id])
+        # Imports, URL resolution and template loading happen before timing
+        Client(SERVER_NAME='localhost').get(path, secure=True)
+
+        self.stdout.write(f'GET {path}')
+        self.stdout.write(
+            f'{"mode":12} {"workers":>8} {"requests":>9} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} '
+            f'{"connections":>12}'
+        )
+        for mode in options['modes']:
+            reason = bench.unsupported(mode)
+            if reason:
+                self.stdout.write(f'{mode:12} skipped: {reason}')
+                continue
+            for workers in options['workers']:
+                result = bench.run(mode, workers, options['requests'], path)
+                self.stdout.write(
+                    f'{mode:12} {workers:>8} {result["requests"]:>9} {result["throughput_rps"]:>9.1f} '
+                    f'{result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["connections"]:>12}'
+                )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmarks import SCENARIOS, routes  # noqa: F401 - registers scenarios
+from shop.benchmarks import middleware as bench
+from shop.benchmarks import runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Report the time and queries each middleware adds to benchmark scenarios, and whether '
+        'they load the session and the user.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='*', default=list(bench.DEFAULT_SCENARIOS),
+                            help='Scenario names (default: one route of each kind)')
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Timed requests per scenario; medians are reported')
+
+    def handle(self, *args, **options):
+        scenarios = [s for s in SCENARIOS if s.name in options['only']]
+        unknown = set(options['only']) - {s.name for s in scenarios}
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        try:
+            dataset = runner.Dataset()
+        except runner.DatasetMissing as e:
+            raise CommandError(str(e))
+
+        for scenario in scenarios:
+            result = bench.run_scenario(scenario, dataset, options['iterations'])
+            self.stdout.write(
+                f'{scenario.name} ({result["route"]}, {result["status"]}): {result["total_us"]:,.0f} us, '
+                f'session {"read" if result["session_read"] else "untouched"}, '
+                f'user {"resolved" if result["user_resolved"] else "lazy"}'
+            )
+            for row in result['rows']:
+                own = '-' if row['own_us'] is None else f'{row["own_us"]:,.0f}'
+                queries = '-' if row['queries'] is None else row['queries']
+                self.stdout.write(f'    {row["name"]:34} {own:>8} us {queries:>4} queries')
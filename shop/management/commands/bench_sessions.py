@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from shop.benchmarks import sessions as bench
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the stored size and the per-request decode and encode cost of anonymous '
+        'carts in the former JSON session format, the compact session format and a signed cookie.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 5, 50, 200],
+                            help='Cart sizes to measure')
+        parser.add_argument('--iterations', type=int, default=2000,
+                            help='Calls per timing run (the median of 5 runs is reported)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"format":16} {"lines":>6} {"bytes":>7} {"decode us":>10} {"encode us":>10}')
+        for lines in options['lines']:
+            for result in bench.run(lines, options['iterations']):
+                self.stdout.write(
+                    f'{result["format"]:16} {result["lines"]:>6} {result["bytes"]:>7} '
+                    f'{result["decode_us"]:>10.1f} {result["encode_us"]:>10.1f}'
+                )
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmarks import SCENARIOS, routes  # noqa: F401 - registers scenarios
+from shop.benchmarks import runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every shop route against the seeded dataset, recording latency '
+        'percentiles and query counts, and fail on query budget or latency regressions.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed iterations per scenario')
+        parser.add_argument('--only', nargs='*', default=None,
+                            help='Run only these scenario names')
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path')
+        parser.add_argument('--baseline', default=None,
+                            help='Compare against a previously saved JSON report')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 slowdown against the baseline')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Ignore slowdowns smaller than this many milliseconds')
+        parser.add_argument('--list', action='store_true',
+                            help='List scenarios and exit')
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            scenarios = [s for s in SCENARIOS if s.name in options['only']]
+            unknown = set(options['only']) - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        if options['list']:
+            for scenario in scenarios:
+                self.stdout.write(f'{scenario.name:40} {scenario.route}')
+            return
+
+        try:
+            report = runner.run(scenarios, options['iterations'])
+        except runner.DatasetMissing as e:
+            raise CommandError(str(e))
+
+        self.print_report(report)
+        if options['output']:
+            runner.save(report, options['output'])
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        baseline = runner.load(options['baseline']) if options['baseline'] else None
+        failures = runner.check(
+            report,
+            baseline,
+            threshold=options['threshold'],
+            min_delta_ms=options['min_delta_ms'],
+        )
+        if not options['only']:
+            failures += [f'{name}: route has no benchmark scenario'
+                         for name in runner.uncovered_routes(scenarios)]
+        if failures:
+            for failure in failures:
+                self.stderr.write(f'✗ {failure}')
+            raise CommandError(f'{len(failures)} benchmark check(s) failed')
+        self.stdout.write(self.style.SUCCESS('✓ All benchmark checks passed'))
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"scenario":40} {"queries":>8} {"budget":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>8}'
+        )
+        for name, result in report['results'].items():
+            budget = '-' if result['query_budget'] is None else result['query_budget']
+            self.stdout.write(
+                f'{name:40} {result["queries"]:>8} {budget:>7} '
+                f'{result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                f'{result["throughput_rps"]:>8.1f}'
+            )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmarks import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Time cold starts (django.setup, a maintenance command, the WSGI application) in fresh '
+        'processes, list their slowest imports, and fail on time budgets or web-only imports.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Timed runs per scenario; the median is reported')
+        parser.add_argument('--only', nargs='*', default=None,
+                            help='Run only these scenario names')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Slowest imports (by own time) to list per scenario')
+
+    def handle(self, *args, **options):
+        scenarios = startup.SCENARIOS
+        if options['only']:
+            scenarios = [s for s in scenarios if s.name in options['only']]
+            unknown = set(options['only']) - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        results = {}
+        for scenario in scenarios:
+            try:
+                results[scenario.name] = result = startup.measure(scenario, options['runs'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            self.stdout.write(
+                f'{scenario.name}: {scenario.description}\n'
+                f'  {result["median_ms"]:.0f}ms median (min {result["min_ms"]:.0f}ms, budget '
+                f'{result["budget_ms"]:.0f}ms), {result["modules"]} modules, {result["import_ms"]:.0f}ms importing'
+            )
+            for name, self_us, cumulative_us, _ in result['slowest'][:options['top']]:
+                self.stdout.write(f'    {self_us / 1000:>6.1f}ms {cumulative_us / 1000:>7.1f}ms  {name}')
+
+        failures = startup.check(results)
+        if failures:
+            for failure in failures:
+                self.stderr.write(f'✗ {failure}')
+            raise CommandError(f'{len(failures)} startup check(s) failed')
+        self.stdout.write(self.style.SUCCESS('✓ All startup checks passed'))
@@ -0,0 +1,111 @@
+from contextlib import ExitStack
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop import routers
+from shop.models import Product, WishlistItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Check read-replica routing end to end. Renames a product on the primary only, '
+        'then checks which name pages show before and after a write, and after the pin expires. '
+        'Locally, point REPLICA_DATABASE_URL at a second SQLite file and pass --sync.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true',
+                            help='Copy the primary SQLite database into each SQLite replica first')
+
+    def handle(self, *args, **options):
+        aliases = routers.replicas()
+        if not aliases:
+            raise CommandError(
+                'No replicas configured. Set REPLICA_DATABASE_URL, '
+                'e.g. sqlite:////tmp/tilecommerce-replica.sqlite3, and pass --sync.'
+            )
+        if options['sync']:
+            for alias in aliases:
+                self.sync(alias)
+
+        product = Product.objects.using(DEFAULT_DB_ALIAS).order_by('pk').first()
+        user = User.objects.filter(is_active=True).order_by('pk').first()
+        if product is None or user is None:
+            raise CommandError('No products or users found. Run "manage.py seed_shop" first.')
+        for alias in aliases:
+            if not Product.objects.using(alias).filter(pk=product.pk, name=product.name).exists():
+                raise CommandError(f'Replica "{alias}" does not match the primary; pass --sync.')
+
+        page = reverse('product_detail', args=[product.pk])
+        marker = f'{product.name} (primary)'
+        self.marker = marker.encode()
+        self.failures = 0
+        client = Client(SERVER_NAME='localhost')
+        added = False
+        # Without signals: catalog versions stay equal on both sides
+        Product.objects.using(DEFAULT_DB_ALIAS).filter(pk=product.pk).update(name=marker)
+        try:
+            self.stdout.write(f'{"step":18} {"expected":>9} {"default":>8} {"replicas":>9}')
+            self.step('Anonymous', 'replica', lambda: client.get(page, secure=True))
+            client.force_login(user)
+            self.step('Signed in', 'replica', lambda: client.get(page, secure=True))
+            added = not WishlistItem.objects.filter(wishlist__user=user, product=product).exists()
+            self.step('Add to wishlist', 'pins', lambda: client.post(
+                reverse('add_to_wishlist', args=[product.pk]), secure=True,
+                headers={'X-Requested-With': 'XMLHttpRequest'},
+            ))
+            self.step('After the write', 'primary', lambda: client.get(page, secure=True))
+            # What the browser does once the cookie's max-age has passed
+            client.cookies.pop(routers.pin_cookie(), None)
+            self.step('Pin expired', 'replica', lambda: client.get(page, secure=True))
+        finally:
+            Product.objects.using(DEFAULT_DB_ALIAS).filter(pk=product.pk).update(name=product.name)
+            if added:
+                WishlistItem.objects.filter(wishlist__user=user, product=product).delete()
+        if self.failures:
+            raise CommandError(f'{self.failures} routing check(s) failed')
+        self.stdout.write(self.style.SUCCESS(f'✓ Catalog reads routed to {", ".join(aliases)}'))
+
+    def step(self, label, expected, send):
+        """
+        Send one request and check where its catalog reads went: ``replica``
+        and ``primary`` by the product name shown and the queries run,
+        ``pins`` by the pin cookie in the response
+        """
+        aliases = routers.replicas()
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in [DEFAULT_DB_ALIAS, *aliases]
+            }
+            response = send()
+        replica_queries = sum(len(captured[alias]) for alias in aliases)
+        if expected == 'pins':
+            ok = routers.pin_cookie() in response.cookies
+        else:
+            from_replica = expected == 'replica'
+            ok = (
+                response.status_code == 200
+                and (self.marker in response.content) != from_replica
+                and (replica_queries > 0) == from_replica
+            )
+        self.failures += not ok
+        mark = self.style.SUCCESS('✓') if ok else self.style.ERROR('✗')
+        self.stdout.write(
+            f'{label:18} {expected:>9} {len(captured[DEFAULT_DB_ALIAS]):>8} {replica_queries:>9} {mark}'
+        )
+
+    def sync(self, alias):
+        source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+            raise CommandError('--sync only copies SQLite databases')
+        source.ensure_connection()
+        target.ensure_connection()
+        source.connection.backup(target.connection)
+        self.stdout.write(f'Copied {source.settings_dict["NAME"]} to {target.settings_dict["NAME"]}')
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shop import cleanup
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete abandoned carts, empty wishlists and expired sessions in small batches, optionally '
+        'archiving carts and wishlists to gzipped JSONL first. Safe to run while the site is busy.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        config = getattr(settings, 'SHOP_CLEANUP', {})
+        parser.add_argument('--only', nargs='*', choices=['carts', 'wishlists', 'sessions'],
+                            help='Tasks to run (default: all)')
+        parser.add_argument('--batch-size', type=int, default=config.get('BATCH_SIZE', 500),
+                            help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=config.get('PAUSE', 0.05),
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--archive', default=cleanup.archive_directory(),
+                            help='Directory for <task>-<time>.jsonl.gz copies of deleted rows '
+                                 '(default SHOP_CLEANUP_ARCHIVE_DIR; sessions are never archived)')
+        parser.add_argument('--no-archive', dest='archive', action='store_const', const='',
+                            help='Do not archive, even if SHOP_CLEANUP_ARCHIVE_DIR is set')
+        parser.add_argument('--max-seconds', type=float, default=None,
+                            help='Stop each task after this long; the next run carries on')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count the stale rows without deleting them')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        tasks = [task for task in cleanup.tasks() if not options['only'] or task.name in options['only']]
+        skipped = set(options['only'] or ()) - {task.name for task in tasks}
+        for name in sorted(skipped):
+            self.stderr.write(f'✗ {name}: not stored in the database with SESSION_ENGINE {settings.SESSION_ENGINE}')
+
+        now = timezone.now()
+        for task in tasks:
+            if options['dry_run']:
+                started = time.perf_counter()
+                count = task.stale(now).count()
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ {task.name}: {count} stale rows would be deleted '
+                    f'(counted in {time.perf_counter() - started:.1f}s)'
+                ))
+                continue
+
+            def progress(deleted, elapsed, task=task):
+                self.stdout.write(f'  {task.name}: {sum(deleted.values())} rows deleted in {elapsed:.1f}s')
+
+            result = cleanup.collect(
+                task, now=now, batch_size=options['batch_size'], pause=options['pause'],
+                archive_dir=options['archive'], max_seconds=options['max_seconds'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+            total = sum(result['deleted'].values())
+            rate = total / result['seconds'] if result['seconds'] else 0
+            breakdown = ', '.join(f'{count} {label}' for label, count in sorted(result['deleted'].items()))
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {task.name}: {total} rows deleted{f" ({breakdown})" if breakdown else ""} in '
+                f'{result["batches"]} batches, {result["seconds"]:.1f}s ({rate:,.0f} rows/s)'
+            ))
+            if result['archive']:
+                self.stdout.write(f'  archived to {result["archive"]}')
+            if not result['finished']:
+                self.stdout.write(f'  stopped after {options["max_seconds"]:g}s; stale rows remain')
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.addresses import collapse_duplicates
+from shop.models import Address
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute address fingerprints and delete duplicate addresses, keeping the '
+        'oldest of each. Run after changing the fingerprint normalization or after '
+        'importing addresses without fingerprints.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2_000,
+                            help='Addresses per transaction, rounded up to whole users')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        started = time.perf_counter()
+        total = Address.objects.count()
+        updated, deleted = collapse_duplicates(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Addresses: {total} scanned, {updated} fingerprints updated, {deleted} duplicates deleted '
+            f'in {elapsed:.1f}s ({rate:,.0f} rows/s)'
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete users that share an email address, keeping the oldest account of each '
+        '(by date joined). Their carts, wishlists, addresses and profiles go with them.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the accounts that would be deleted without deleting them')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        emails = (
+            User.objects.exclude(email='').values('email').annotate(n=Count('pk')).filter(n__gt=1)
+            .values('email')
+        )
+        duplicates = (
+            User.objects.filter(email__in=emails).order_by('email', 'date_joined', 'pk')
+            .values_list('pk', 'email', 'username', 'date_joined')
+        )
+        doomed = []
+        current = None
+        for pk, email, username, date_joined in duplicates.iterator():
+            keep = email != current
+            if keep:
+                current = email
+                self.stdout.write(f'{email}:')
+            else:
+                doomed.append(pk)
+            self.stdout.write(f'  [{"KEEP" if keep else "DELETE"}] ID: {pk}, username: {username}, joined: {date_joined}')
+
+        if doomed and not options['dry_run']:
+            User.objects.filter(pk__in=doomed).delete()
+        elapsed = time.perf_counter() - started
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(f'✓ Users: {len(doomed)} duplicates {verb} in {elapsed:.1f}s'))
@@ -0,0 +1,143 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from shop.models import Category, Product, UserProfile
+
+
+CATEGORIES = [
+    'Floor Tiles',
+    'Vitrified Tiles',
+    'Wall Tiles',
+    'Mosaic Tiles',
+    'Bathroom Tiles',
+    'Kitchen Tiles',
+    'Living Room Tiles',
+    'Outdoor Tiles',
+    'Parking Tiles',
+    'Stone and Brick Cladding',
+    'Ceramic Tiles',
+    'Tile Accessories',
+]
+
+# (name, description, price, category)
+PRODUCTS = [
+    ('Premium Ceramic Floor Tile',
+     'High-quality ceramic floor tile with a glossy finish. Perfect for modern living spaces.',
+     '49.99', 'Floor Tiles'),
+    ('Classic Vitrified Tile',
+     'Durable vitrified tile ideal for kitchens and bathrooms. Water-resistant and easy to clean.',
+     '59.99', 'Vitrified Tiles'),
+    ('Elegant Wall Tile',
+     'Modern design wall tile for bathroom and kitchen backsplashes. Available in multiple colors.',
+     '39.99', 'Wall Tiles'),
+    ('Mosaic Decorative Tile',
+     'Beautiful mosaic tiles for accent walls and artistic installations.',
+     '69.99', 'Mosaic Tiles'),
+    ('Bathroom Floor Tile',
+     'Slip-resistant bathroom floor tile with superior grip and durability.',
+     '54.99', 'Bathroom Tiles'),
+    ('Kitchen Backsplash Tile',
+     'Stylish kitchen backsplash tile that complements modern kitchen designs.',
+     '44.99', 'Kitchen Tiles'),
+    ('Living Room Feature Tile',
+     'Premium feature tile for accent walls in living spaces.',
+     '74.99', 'Living Room Tiles'),
+    ('Outdoor Patio Tile',
+     'Weather-resistant outdoor tile perfect for patios and decks.',
+     '79.99', 'Outdoor Tiles'),
+    ('Parking Area Tile',
+     'Heavy-duty tile designed for parking areas and commercial spaces.',
+     '89.99', 'Parking Tiles'),
+    ('Stone Look Tile',
+     'Realistic stone look tile from our premium stone cladding collection.',
+     '99.99', 'Stone and Brick Cladding'),
+    ('Marble Effect Ceramic',
+     'Beautiful marble effect ceramic tile for elegant interiors.',
+     '64.99', 'Ceramic Tiles'),
+    ('Tile Grout - White',
+     'Premium white grout for tile installation and repairs.',
+     '24.99', 'Tile Accessories'),
+    ('Terracotta Tile',
+     'Rustic terracotta tile with authentic aged appearance.',
+     '84.99', 'Floor Tiles'),
+    ('Porcelain Tile',
+     'Premium porcelain tile for both indoor and outdoor applications.',
+     '94.99', 'Ceramic Tiles'),
+    ('Hexagonal Mosaic',
+     'Trendy hexagonal mosaic tile for modern interior designs.',
+     '74.99', 'Mosaic Tiles'),
+]
+
+# Local development credentials only
+ADMIN = {'username': 'admin', 'email': 'admin@test.com', 'password': 'admin123'}
+DEMO_USER = {
+    'username': 'kazi', 'email': 'kazi@example.com', 'password': 'kazi123',
+    'first_name': 'Kazi', 'last_name': 'Mahbub',
+}
+DEMO_PROFILE = {'gender': 'M', 'phone_number': '1234567890', 'country_code': '+90'}
+
+PARTS = ('categories', 'products', 'users')
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the small demo catalog and the local admin and demo accounts. Rows that '
+        'already exist are left alone. For a large benchmark dataset use seed_shop.'
+    )
+    # Maintenance command: skip the system checks (and the URLconf, views and
+    # Pillow they import); migrate and check run them at deploy time
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('parts', nargs='*',
+                            help=f'What to create, of {", ".join(PARTS)} (default: all, in that order)')
+
+    def handle(self, *args, **options):
+        parts = options['parts'] or PARTS
+        unknown = set(parts) - set(PARTS)
+        if unknown:
+            raise CommandError(f'Unknown parts: {", ".join(sorted(unknown))}. Choose from {", ".join(PARTS)}.')
+        started = time.perf_counter()
+        for part in PARTS:
+            if part in parts:
+                getattr(self, f'create_{part}')()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✓ Demo data ({", ".join(parts)}) in {elapsed:.1f}s'))
+
+    def create_categories(self):
+        for name in CATEGORIES:
+            _, created = Category.objects.get_or_create(name=name, defaults={'slug': slugify(name)})
+            self.stdout.write(f'{"✓ Created" if created else "- Already exists"}: {name}')
+        self.stdout.write(f'Categories in database: {Category.objects.count()}')
+
+    def create_products(self):
+        categories = dict(Category.objects.filter(name__in={p[3] for p in PRODUCTS}).values_list('name', 'pk'))
+        missing = {p[3] for p in PRODUCTS} - set(categories)
+        if missing:
+            raise CommandError(f'Missing categories: {", ".join(sorted(missing))}. Run "demo_data categories" first.')
+        for name, description, price, category in PRODUCTS:
+            product, created = Product.objects.get_or_create(
+                name=name,
+                defaults={'description': description, 'price': Decimal(price), 'category_id': categories[category]},
+            )
+            self.stdout.write(f'✓ Created: {name} (${product.price})' if created else f'- Already exists: {name}')
+        self.stdout.write(f'Products in database: {Product.objects.count()}')
+
+    def create_users(self):
+        if User.objects.filter(username=ADMIN['username']).exists():
+            self.stdout.write(f'- Superuser already exists: {ADMIN["username"]}')
+        else:
+            user = User.objects.create_superuser(ADMIN['username'], ADMIN['email'], ADMIN['password'])
+            UserProfile.objects.create(user=user)
+            self.stdout.write(f'✓ Superuser created: {ADMIN["username"]} / {ADMIN["password"]} (/admin/)')
+
+        if User.objects.filter(username=DEMO_USER['username']).exists():
+            self.stdout.write(f'- Demo user already exists: {DEMO_USER["username"]}')
+        else:
+            user = User.objects.create_user(**DEMO_USER)
+            UserProfile.objects.create(user=user, **DEMO_PROFILE)
+            self.stdout.write(f'✓ Demo user created: {DEMO_USER["username"]} / {DEMO_USER["password"]} (/profile/)')
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from shop.benchmarks import load
+from shop.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Send concurrent HTTP requests to a running server (e.g. gunicorn -c gunicorn.conf.py) '
+        'and report throughput and latency percentiles.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Base URL of the running server')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[8],
+                            help='Concurrent clients; several values run one after another')
+        parser.add_argument('--duration', type=float, default=20,
+                            help='Seconds per concurrency level')
+        parser.add_argument('--paths', nargs='+', default=None,
+                            help='Paths requested in turn (default: home, a listing, a category, a product)')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        self.stdout.write(f'{options["url"]}: {" ".join(paths)}')
+        self.stdout.write(
+            f'{"clients":>8} {"requests":>9} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}  statuses'
+        )
+        for concurrency in options['concurrency']:
+            result = load.run(options['url'], paths, concurrency, options['duration'])
+            statuses = ', '.join(f'{status}: {count}' for status, count in sorted(result['statuses'].items(), key=str))
+            self.stdout.write(
+                f'{concurrency:>8} {result["requests"]:>9} {result["throughput_rps"]:>8.1f} '
+                f'{result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f}  {statuses}'
+            )
+
+    def default_paths(self):
+        product_id = Product.objects.order_by('pk').values_list('pk', flat=True).first()
+        category_slug = Category.objects.order_by('pk').values_list('slug', flat=True).first()
+        if product_id is None:
+            raise CommandError('No products found. Run "manage.py seed_shop" first.')
+        return [
+            reverse('home'),
+            reverse('products_list'),
+            f'{reverse("products_list")}?category={category_slug}',
+            reverse('product_detail', args=[product_id]),
+        ]
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import facets
+from shop.catalog import CATALOG, bump
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the category and price facets shown on the product list. Run after '
+        'changing SHOP_PRICE_BUCKETS or after bulk product changes that send no signals.'
+    )
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = facets.rebuild()
+        # Drops every process's cached facet table and cached listing pages
+        bump(CATALOG)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✓ Facets: {rows} rows in {elapsed:.1f}s'))
@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils.text import slugify
+
+from shop import facets, seeding
+from shop.catalog import bump_all
+from shop.models import Product, Category, Cart, CartItem, Address, UserProfile, Wishlist, WishlistItem, address_fingerprint
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large, deterministic catalog and customer base for benchmarking. '
+        f'Seeded users share the password "{seeding.SEED_PASSWORD}".'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=500)
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=200_000)
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed; the same seed always produces the same dataset')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes used to generate rows (inserts stay in the main process)')
+        parser.add_argument('--chunk-size', type=int, default=10_000,
+                            help='Rows generated per worker task and inserted per transaction')
+        parser.add_argument('--batch-size', type=int, default=2_000,
+                            help='Rows per INSERT statement')
+        parser.add_argument('--cart-ratio', type=float, default=0.3,
+                            help='Fraction of users that get a cart')
+        parser.add_argument('--wishlist-ratio', type=float, default=0.25,
+                            help='Fraction of users that get a wishlist')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously seeded users and categories first')
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.chunk_size = options['chunk_size']
+        self.batch_size = options['batch_size']
+        self.workers = max(1, options['workers'])
+
+        names = seeding.category_names(options['categories'], self.seed)
+        if options['clear']:
+            self.clear(names)
+
+        # Worker processes never touch the database, but make sure no open
+        # connection is inherited across fork.
+        connections.close_all()
+        self.pool = self.make_pool()
+        try:
+            category_ids = self.seed_categories(names)
+            self.seed_products(options['products'], category_ids)
+            user_ids = self.seed_users(options['users'])
+            self.seed_activity(user_ids, options['cart_ratio'], options['wishlist_ratio'])
+            # bulk_create sends no signals, so recount facets and invalidate
+            # cached catalog pages here
+            facets.rebuild()
+            bump_all()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+
+    def make_pool(self):
+        if self.workers == 1:
+            return None
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        return context.Pool(self.workers)
+
+    def generate(self, func, tasks):
+        """Run a generator over chunk tasks, preserving chunk order"""
+        if self.pool is None:
+            return map(func, tasks)
+        return self.pool.imap(func, tasks)
+
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {label}: {count} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)'
+        ))
+
+    def clear(self, names):
+        started = time.perf_counter()
+        users, _ = User.objects.filter(username__startswith=seeding.SEED_USERNAME_PREFIX).delete()
+        categories, _ = Category.objects.filter(name__in=names).delete()
+        self.report('Cleared previous seed', users + categories, started)
+
+    def seed_categories(self, names):
+        started = time.perf_counter()
+        Category.objects.bulk_create(
+            [Category(name=name, slug=slugify(name)) for name in names],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        ids_by_name = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        self.report('Categories', len(names), started)
+        return [ids_by_name[name] for name in names]
+
+    def seed_products(self, count, category_ids):
+        if not count or not category_ids:
+            return
+        started = time.perf_counter()
+        tasks = [
+            (self.seed, chunk, start, stop, len(category_ids))
+            for chunk, start, stop in seeding.chunk_ranges(count, self.chunk_size)
+        ]
+        created = 0
+        for rows in self.generate(seeding.product_rows, tasks):
+            with transaction.atomic():
+                Product.objects.bulk_create([
+                    Product(
+                        name=name,
+                        description=description,
+                        price=price,
+                        category_id=category_ids[category_index],
+                        image='products/placeholder.jpg',
+                    )
+                    for name, description, price, category_index in rows
+                ], batch_size=self.batch_size)
+            created += len(rows)
+        self.report('Products', created, started)
+
+    def seed_users(self, count):
+        if not count:
+            return []
+        started = time.perf_counter()
+        # Hashing once and sharing the result keeps 200k users cheap to create
+        password = make_password(seeding.SEED_PASSWORD)
+        tasks = [
+            (self.seed, chunk, start, stop)
+            for chunk, start, stop in seeding.chunk_ranges(count, self.chunk_size)
+        ]
+        user_ids = []
+        last_pk = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        for rows in self.generate(seeding.user_rows, tasks):
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(
+                        username=username,
+                        email=email,
+                        first_name=first_name,
+                        last_name=last_name,
+                        password=password,
+                    )
+                    for username, email, first_name, last_name, _ in rows
+                ], batch_size=self.batch_size)
+                chunk_ids = list(
+                    User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)
+                )
+                UserProfile.objects.bulk_create([
+                    UserProfile(
+                        user_id=user_id,
+                        gender=gender,
+                        phone_number=phone_number,
+                        country_code=country_code,
+                    )
+                    for user_id, (*_, (gender, phone_number, country_code)) in zip(chunk_ids, rows)
+                ], batch_size=self.batch_size)
+            last_pk = chunk_ids[-1]
+            user_ids.extend(chunk_ids)
+        self.report('Users with profiles', len(user_ids), started)
+        return user_ids
+
+    def seed_activity(self, user_ids, cart_ratio, wishlist_ratio):
+        if not user_ids:
+            return
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+        started = time.perf_counter()
+        tasks = [
+            (self.seed, chunk, start, stop, len(product_ids), cart_ratio, wishlist_ratio, 8, 12)
+            for chunk, start, stop in seeding.chunk_ranges(len(user_ids), self.chunk_size)
+        ]
+        created = 0
+        for rows in self.generate(seeding.activity_rows, tasks):
+            with transaction.atomic():
+                created += self.insert_activity(rows, user_ids, product_ids)
+        self.report('Addresses, carts and wishlists', created, started)
+
+    def insert_activity(self, rows, user_ids, product_ids):
+        first_user = user_ids[rows[0][0]]
+        last_user = user_ids[rows[-1][0]]
+
+        addresses = [
+            Address(
+                user_id=user_ids[user_index],
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                address=street,
+                address2=address2,
+                city=city,
+                state=state,
+                postal_code=postal_code,
+                country=country,
+                phone=phone,
+                fingerprint=address_fingerprint({
+                    'first_name': first_name, 'last_name': last_name, 'address': street,
+                    'address2': address2, 'city': city, 'state': state,
+                    'postal_code': postal_code, 'country': country, 'phone': phone,
+                }),
+            )
+            for user_index, user_addresses, _, _ in rows
+            for (first_name, last_name, email, street, address2,
+                 city, state, postal_code, country, phone) in user_addresses
+        ]
+        Address.objects.bulk_create(addresses, batch_size=self.batch_size)
+
+        Cart.objects.bulk_create(
+            [Cart(user_id=user_ids[user_index]) for user_index, _, lines, _ in rows if lines],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        cart_ids = dict(
+            Cart.objects.filter(user_id__gte=first_user, user_id__lte=last_user)
+            .values_list('user_id', 'id')
+        )
+        cart_items = [
+            CartItem(cart_id=cart_ids[user_ids[user_index]],
+                     product_id=product_ids[product_index],
+                     quantity=quantity)
+            for user_index, _, lines, _ in rows
+            for product_index, quantity in lines
+        ]
+        CartItem.objects.bulk_create(cart_items, batch_size=self.batch_size, ignore_conflicts=True)
+
+        Wishlist.objects.bulk_create(
+            [Wishlist(user_id=user_ids[user_index]) for user_index, _, _, products in rows if products],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        wishlist_ids = dict(
+            Wishlist.objects.filter(user_id__gte=first_user, user_id__lte=last_user)
+            .values_list('user_id', 'id')
+        )
+        wishlist_items = [
+            WishlistItem(wishlist_id=wishlist_ids[user_ids[user_index]],
+                         product_id=product_ids[product_index])
+            for user_index, _, _, products in rows
+            for product_index in products
+        ]
+        WishlistItem.objects.bulk_create(wishlist_items, batch_size=self.batch_size, ignore_conflicts=True)
+
+        return len(addresses) + len(cart_ids) + len(cart_items) + len(wishlist_ids) + len(wishlist_items)
@@ -0,0 +1,281 @@
+"""
+Low-overhead counters and histograms exposed in Prometheus text format.
+
+Each process keeps its values in memory and, when ``SHOP_METRICS['DIR']`` is
+set, periodically writes them to ``<DIR>/<pid>.json`` (one writer per file,
+replaced atomically). The ``/metrics`` endpoint sums every file in the
+directory, so all gunicorn workers are reported together. When a worker
+exits, the gunicorn master folds its counters into ``retired.json``
+(see ``retire``), so recycled workers do not leave a file each.
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+
+
+RETIRED = 'retired.json'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _config():
+    return getattr(settings, 'SHOP_METRICS', {})
+
+
+def enabled():
+    return bool(_config().get('ENABLED'))
+
+
+def _label_key(labels):
+    return ','.join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        if not enabled():
+            return
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+    def dump(self):
+        return dict(self.values)
+
+    @staticmethod
+    def merge(total, values):
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{{{key}}} {value}' if key else f'{self.name} {value}'
+
+
+class Gauge(Counter):
+    """Current value, optionally split by labels; label by pid for per-process values"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not enabled():
+            return
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = value
+        _maybe_flush()
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds by convention)"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.values = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        if not enabled():
+            return
+        key = _label_key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+        _maybe_flush()
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def dump(self):
+        return {key: {'buckets': list(state['buckets']), 'sum': state['sum'], 'count': state['count']}
+                for key, state in self.values.items()}
+
+    @staticmethod
+    def merge(total, values):
+        for key, state in values.items():
+            current = total.setdefault(key, {'buckets': [0] * len(state['buckets']), 'sum': 0.0, 'count': 0})
+            current['buckets'] = [a + b for a, b in zip(current['buckets'], state['buckets'])]
+            current['sum'] += state['sum']
+            current['count'] += state['count']
+
+    def render(self, values):
+        for key, state in sorted(values.items()):
+            prefix = f'{key},' if key else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {state["count"]}'
+            suffix = f'{{{key}}}' if key else ''
+            yield f'{self.name}_sum{suffix} {state["sum"]}'
+            yield f'{self.name}_count{suffix} {state["count"]}'
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+def _snapshot():
+    with _lock:
+        return {metric.name: metric.dump() for metric in _registry}
+
+
+def flush():
+    """Write this process's values to the shared directory, if configured"""
+    global _last_flush
+    directory = _config().get('DIR')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp_path, path)
+    _last_flush = time.monotonic()
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= _config().get('FLUSH_INTERVAL', 5):
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(lambda: enabled() and flush())
+
+
+def retire(pid):
+    """
+    Fold the counters and histograms of the exited process ``pid`` into
+    ``retired.json`` and delete its file. Gauges describe live processes and
+    are dropped. Must only run in one process, the gunicorn master.
+    """
+    directory = _config().get('DIR')
+    if not directory:
+        return
+    path = os.path.join(directory, f'{pid}.json')
+    retired_path = os.path.join(directory, RETIRED)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    try:
+        with open(retired_path) as f:
+            retired = json.load(f)
+    except (OSError, ValueError):
+        retired = {}
+    for metric in _registry:
+        if metric.kind != 'gauge' and metric.name in data:
+            metric.merge(retired.setdefault(metric.name, {}), data[metric.name])
+    tmp_path = f'{retired_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(retired, f)
+    os.replace(tmp_path, retired_path)
+    os.remove(path)
+
+
+def collect():
+    """Merge the values of every process into ``{metric name: values}``"""
+    directory = _config().get('DIR')
+    if not directory:
+        return _snapshot()
+    flush()
+    totals = {metric.name: {} for metric in _registry}
+    merge = {metric.name: metric.merge for metric in _registry}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, values in data.items():
+            if name in totals:
+                merge[name](totals[name], values)
+    return totals
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format"""
+    values = collect()
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.render(values.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def authorized(request):
+    """Accept ``Authorization: Bearer <SHOP_METRICS['TOKEN']>`` or a staff session"""
+    token = _config().get('TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer '):
+        return hmac.compare_digest(header[len('Bearer '):], token)
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def timed(histogram, **labels):
+    """Decorator observing the wall time of a view in ``histogram``"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not enabled():
+                return view_func(request, *args, **kwargs)
+            with histogram.time(method=request.method, **labels):
+                return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+CART_ADDS = Counter('shop_cart_adds_total', 'Products added to a cart.')
+CART_MERGE_SECONDS = Histogram('shop_cart_merge_seconds', 'Time to merge a session cart into a user cart.')
+CHECKOUT_SECONDS = Histogram('shop_checkout_seconds', 'Payment view latency.')
+SEARCH_SECONDS = Histogram('shop_search_seconds', 'Product listing latency for search queries.')
+LOGINS = Counter('shop_logins_total', 'Login attempts by result.')
+LOGIN_SECONDS = Histogram('shop_login_seconds', 'Login view latency.')
+CACHE_REQUESTS = Counter('shop_cache_requests_total', 'Cache lookups by result.')
+RATELIMITED = Counter('shop_ratelimited_total', 'Requests rejected by a rate limit, by scope.')
+WORKER_STARTED = Gauge('shop_worker_start_time_seconds', 'Unix time each gunicorn worker started, by pid.')
+WORKER_WARMUP_SECONDS = Gauge('shop_worker_warmup_seconds', 'Time each gunicorn worker spent warming caches, by pid.')
+WORKER_REQUESTS = Gauge('shop_worker_requests', 'Requests served by each gunicorn worker, by pid.')
+WORKER_MAX_RSS = Gauge('shop_worker_max_rss_bytes', 'Peak resident memory of each gunicorn worker, by pid.')
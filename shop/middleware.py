@@ -0,0 +1,170 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from shop import metrics
+
+
+logger = logging.getLogger('shop.instrumentation')
+
+_current_stats = contextvars.ContextVar('shop_request_stats', default=None)
+_MISSING = object()
+
+
+class RequestStats:
+    """Counters collected while one sampled request is processed"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = {}
+        self.query_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def record_query(self, sql, duration):
+        self.db_time += duration
+        self.query_count += 1
+        self.queries[sql] = self.queries.get(sql, 0) + 1
+
+    def duplicates(self, threshold):
+        """Statements executed at least ``threshold`` times, most repeated first"""
+        repeated = [(count, sql) for sql, count in self.queries.items() if count >= threshold]
+        return [{'sql': sql, 'count': count} for count, sql in sorted(repeated, reverse=True)]
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - started)
+
+
+def instrument_cache():
+    """Count hits and misses on every cache backend class in use"""
+    from django.core.cache import caches
+
+    for alias in settings.CACHES:
+        backend_class = type(caches[alias])
+        if getattr(backend_class, '_shop_instrumented', False):
+            continue
+        original_get = backend_class.get
+
+        def get(self, key, default=None, version=None, _original=original_get):
+            value = _original(self, key, _MISSING, version)
+            hit = value is not _MISSING
+            stats = _current_stats.get()
+            if stats is not None:
+                if hit:
+                    stats.cache_hits += 1
+                else:
+                    stats.cache_misses += 1
+            metrics.CACHE_REQUESTS.inc(result='hit' if hit else 'miss')
+            return default if value is _MISSING else value
+
+        backend_class.get = get
+        backend_class._shop_instrumented = True
+
+
+def _instrument_templates():
+    """Time the outermost Template.render call of each request"""
+    from django.template.base import Template
+
+    if getattr(Template, '_shop_instrumented', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        stats = _current_stats.get()
+        if stats is None:
+            return original_render(self, context)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+    Template.render = render
+    Template._shop_instrumented = True
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Record wall time, DB time, query count, repeated queries, cache hits and
+    template render time for a sample of requests.
+
+    Enabled through ``settings.SHOP_INSTRUMENTATION['ENABLED']``; when it is
+    off Django drops the middleware entirely. Sampled responses get a
+    ``Server-Timing`` header and one JSON log line on ``shop.instrumentation``.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'SHOP_INSTRUMENTATION', {})
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config.get('SAMPLE_RATE', 1.0)
+        self.server_timing = config.get('SERVER_TIMING', True)
+        self.duplicate_threshold = config.get('DUPLICATE_THRESHOLD', 3)
+        instrument_cache()
+        _instrument_templates()
+
+    def __call__(self, request):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_query_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+
+        total = time.perf_counter() - stats.started
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total * 1000:.1f}',
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries"',
+                f'tpl;dur={stats.template_time * 1000:.1f}',
+                f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses"',
+            ])
+        self.log(request, response, stats, total)
+        return response
+
+    def log(self, request, response, stats, total):
+        match = getattr(request, 'resolver_match', None)
+        duplicates = stats.duplicates(self.duplicate_threshold)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(stats.db_time * 1000, 2),
+            'queries': stats.query_count,
+            'duplicate_queries': duplicates,
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+            'template_ms': round(stats.template_time * 1000, 2),
+        }
+        level = logging.WARNING if duplicates else logging.INFO
+        logger.log(level, json.dumps(record))
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:30
+
+from django.db import migrations
+
+
+INDEX_NAME = 'shop_auth_user_email_lower'
+
+
+def create_email_index(apps, schema_editor):
+    # auth_user belongs to django.contrib.auth, so the functional index used by
+    # shop.backends.EmailOrUsernameBackend is created with raw SQL.
+    if schema_editor.connection.vendor == 'mysql':
+        sql = f'CREATE INDEX {INDEX_NAME} ON auth_user ((LOWER(email)))'
+    else:
+        sql = f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON auth_user (LOWER(email))'
+    schema_editor.execute(sql)
+
+
+def drop_email_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        sql = f'DROP INDEX {INDEX_NAME} ON auth_user'
+    else:
+        sql = f'DROP INDEX IF EXISTS {INDEX_NAME}'
+    schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_remove_orderitem_order_remove_orderitem_product_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
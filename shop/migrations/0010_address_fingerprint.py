@@ -0,0 +1,72 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:10
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of shop.models.ADDRESS_FINGERPRINT_FIELDS and
+# address_fingerprint() as they were when this migration was written
+FINGERPRINT_FIELDS = (
+    'first_name', 'last_name', 'address', 'address2', 'city', 'postal_code', 'state', 'country', 'phone',
+)
+
+
+def fingerprint(address):
+    normalized = '\x1f'.join(
+        ' '.join(str(getattr(address, field) or '').split()).casefold()
+        for field in FINGERPRINT_FIELDS
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    # Fill in fingerprints and delete duplicates, keeping the oldest of each.
+    # The unique index does not exist yet, so rows are updated directly.
+    Address = apps.get_model('shop', 'Address')
+    addresses = Address.objects.using(schema_editor.connection.alias)
+
+    def flush(to_update, to_delete):
+        addresses.filter(pk__in=to_delete).delete()
+        addresses.bulk_update(to_update, ['fingerprint'])
+
+    to_update = []
+    to_delete = []
+    user_id = None
+    seen = set()
+    rows = addresses.order_by('user_id', 'pk').only('pk', 'user_id', *FINGERPRINT_FIELDS)
+    for address in rows.iterator(chunk_size=2000):
+        if address.user_id != user_id:
+            if len(to_update) + len(to_delete) >= 2000:
+                flush(to_update, to_delete)
+                to_update, to_delete = [], []
+            user_id = address.user_id
+            seen = set()
+        address.fingerprint = fingerprint(address)
+        if address.fingerprint in seen:
+            to_delete.append(address.pk)
+        else:
+            seen.add(address.fingerprint)
+            to_update.append(address)
+    flush(to_update, to_delete)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_auth_user_email_lower_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='fingerprint',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(fields=('user', 'fingerprint'), name='shop_address_user_fingerprint'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_facets(apps, schema_editor):
+    # A frozen copy of shop.facets.rebuild() as it was when this migration was written
+    ProductFacet = apps.get_model('shop', 'ProductFacet')
+    Product = apps.get_model('shop', 'Product')
+    using = schema_editor.connection.alias
+    bounds = tuple(getattr(settings, 'SHOP_PRICE_BUCKETS', (0, 25, 50, 100, 250, 500, 1000)))
+    bucket = models.Case(
+        *(models.When(price__lt=bound, then=models.Value(number)) for number, bound in enumerate(bounds[1:])),
+        default=models.Value(len(bounds) - 1),
+    )
+    rows = (
+        Product.objects.using(using).order_by()
+        .annotate(bucket=bucket)
+        .values_list('category_id', 'bucket')
+        .annotate(count=models.Count('pk'))
+    )
+    ProductFacet.objects.using(using).bulk_create(
+        [ProductFacet(category_id=category_id, price_bucket=number, count=count) for category_id, number, count in rows],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'price_bucket'), name='shop_facet_category_bucket')],
+            },
+        ),
+        migrations.RunPython(build_facets, migrations.RunPython.noop),
+    ]
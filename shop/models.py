@@ -1,3 +1,5 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -33,11 +35,62 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Category neighbours by primary key (shop.recommendations)
+            models.Index(fields=['category', 'id'], name='shop_product_category_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ProductFacet(models.Model):
+    """Number of products per category and price bucket (see shop.facets)"""
+    # The (category, price_bucket) constraint doubles as the category index
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', db_index=False)
+    price_bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'price_bucket'], name='shop_facet_category_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id}/{self.price_bucket}: {self.count}"
+
+
+class ProductRecommendation(models.Model):
+    """Precomputed top-N similar products (see shop.recommendations)"""
+    # The (product, rank) constraint doubles as the lookup index
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations', db_index=False)
+    rank = models.PositiveSmallIntegerField()
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='shop_recommendation_product_rank'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} for product {self.product_id}: {self.recommended_id}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Change counters for catalog pages, used as HTTP validators.
+    Bumped by shop.signals whenever products or categories change.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+
 class Customer(models.Model):
     """Customer model linked to Django User"""
     user = models.OneToOneField(
@@ -114,6 +167,21 @@ class CartItem(models.Model):
         return self.product.price * self.quantity
 
 
+# Fields that make two addresses of the same user duplicates (email is not one)
+ADDRESS_FINGERPRINT_FIELDS = (
+    'first_name', 'last_name', 'address', 'address2', 'city', 'postal_code', 'state', 'country', 'phone',
+)
+
+
+def address_fingerprint(values):
+    """SHA-256 of the fingerprint fields in ``values``, ignoring case and whitespace"""
+    normalized = '\x1f'.join(
+        ' '.join(str(values.get(field) or '').split()).casefold()
+        for field in ADDRESS_FINGERPRINT_FIELDS
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
 class Address(models.Model):
     """Store user delivery addresses"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='addresses')
@@ -127,16 +195,31 @@ class Address(models.Model):
     postal_code = models.CharField(max_length=20)
     country = models.CharField(max_length=100)
     phone = models.CharField(max_length=20)
+    # address_fingerprint() of ADDRESS_FINGERPRINT_FIELDS; unique per user
+    fingerprint = models.CharField(max_length=64, editable=False, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Addresses'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'fingerprint'], name='shop_address_user_fingerprint'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.address}, {self.city}"
 
+    def get_fingerprint(self):
+        return address_fingerprint({field: getattr(self, field) for field in ADDRESS_FINGERPRINT_FIELDS})
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.get_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(ADDRESS_FINGERPRINT_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'fingerprint'}
+        super().save(*args, **kwargs)
+
 
 class UserProfile(models.Model):
     """Extended user profile model for storing additional user information"""
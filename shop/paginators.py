@@ -0,0 +1,55 @@
+"""
+Paginators for tables too large to count on every page view.
+"""
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def _config():
+    return getattr(settings, 'SHOP_ADMIN', {})
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL, take the row count from planner statistics instead of
+    ``COUNT(*)``, which reads the whole table or index:
+
+    * unfiltered querysets use ``pg_class.reltuples`` (kept current by
+      autovacuum and ANALYZE)
+    * filtered querysets use the row estimate of ``EXPLAIN``
+
+    Estimates below ``SHOP_ADMIN['EXACT_COUNT_BELOW']`` are replaced by an
+    exact count, so small tables and narrow filters still show true totals.
+    Other databases always count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[getattr(queryset, 'db', 'default')]
+        if connection.vendor != 'postgresql' or not hasattr(queryset, 'query'):
+            return super().count
+        estimate = self._estimate(queryset, connection)
+        if estimate is None or estimate < _config().get('EXACT_COUNT_BELOW', 10_000):
+            return super().count
+        return estimate
+
+    @staticmethod
+    def _estimate(queryset, connection):
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                # -1 (PostgreSQL 14+) or 0: never analyzed
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                               [connection.ops.quote_name(queryset.model._meta.db_table)])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] > 0 else None
+            sql, params = queryset.order_by().values('pk').query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
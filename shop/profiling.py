@@ -0,0 +1,238 @@
+"""
+On-demand and background profiling for production hot paths.
+
+Staff users can profile a single request by adding ``?__profile=<mode>`` or
+an ``X-Shop-Profile: <mode>`` header:
+
+* ``cprofile`` (or ``1``) - deterministic cProfile, saved as a ``.prof`` file
+* ``stats`` - cProfile, returning the top functions as plain text
+* ``sample`` - statistical stack sampling, saved as folded stacks
+
+The background sampler periodically captures the stacks of every thread that
+is serving a request and writes folded stacks (``frame;frame;frame count``)
+that ``flamegraph.pl`` and speedscope read directly. It stops itself after
+``SAMPLER_DURATION`` seconds and backs off when sampling costs more than
+``MAX_OVERHEAD`` of wall time.
+"""
+import atexit
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+
+logger = logging.getLogger('shop.profiling')
+
+MODES = {'1': 'cprofile', 'cprofile': 'cprofile', 'stats': 'stats', 'sample': 'sample'}
+
+
+def _config():
+    return getattr(settings, 'SHOP_PROFILING', {})
+
+
+def fold(frame):
+    """Return the stack ending at ``frame`` as ``outer;...;inner``"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Sample the stacks of the threads listed in ``thread_ids``"""
+
+    def __init__(self, thread_ids, interval=0.01, duration=None, max_stacks=10000,
+                 max_overhead=0.02, output=None, flush_interval=60):
+        super().__init__(name='shop-stack-sampler', daemon=True)
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.duration = duration
+        self.max_stacks = max_stacks
+        self.max_overhead = max_overhead
+        self.output = output
+        self.flush_interval = flush_interval
+        self.stacks = Counter()
+        self.dropped = 0
+        self.samples = 0
+        self.overhead = 0.0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def close(self):
+        """Stop sampling and write whatever was collected"""
+        self.stop()
+        self.join(timeout=1)
+        if self.output:
+            self.write(self.output)
+
+    def run(self):
+        started = time.perf_counter()
+        last_flush = started
+        while not self._stop_event.wait(self.interval):
+            tick = time.perf_counter()
+            self.sample()
+            now = time.perf_counter()
+            self.overhead += now - tick
+            # Sampling too expensive: halve the sampling rate
+            if self.overhead > (now - started) * self.max_overhead:
+                self.interval = min(self.interval * 2, 1.0)
+            if self.output and now - last_flush >= self.flush_interval:
+                self.write(self.output)
+                last_flush = now
+            if self.duration and now - started >= self.duration:
+                break
+        if self.output:
+            self.write(self.output)
+            logger.info('Stack sampler stopped: %d samples, %.3fs overhead, written to %s',
+                        self.samples, self.overhead, self.output)
+
+    def sample(self):
+        frames = sys._current_frames()
+        for thread_id in list(self.thread_ids):
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = fold(frame)
+            if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                self.stacks[stack] += 1
+                self.samples += 1
+            else:
+                self.dropped += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def write(self, path):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.folded())
+        os.replace(tmp_path, path)
+
+
+class ProfilingMiddleware:
+    """
+    Profile individual requests for staff users and, optionally, run the
+    background stack sampler. Must come after ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        config = _config()
+        self.on_demand = config.get('ENABLED', False)
+        self.background = config.get('SAMPLER', False)
+        if not (self.on_demand or self.background):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = str(config.get('DIR', 'profiles'))
+        self.interval = max(config.get('SAMPLE_INTERVAL', 0.01), 0.001)
+        self.duration = config.get('SAMPLER_DURATION', 300)
+        self.max_stacks = config.get('MAX_STACKS', 10000)
+        self.max_overhead = config.get('MAX_OVERHEAD', 0.02)
+        # One cProfile at a time per process keeps overhead bounded
+        self.profile_lock = threading.Lock()
+        self.active_threads = set()
+        self.sampler = None
+        self.sampler_pid = None
+
+    def __call__(self, request):
+        if self.background:
+            self.ensure_sampler()
+
+        mode = None
+        if self.on_demand:
+            flag = request.GET.get('__profile') or request.headers.get('X-Shop-Profile')
+            mode = MODES.get(flag) if flag else None
+        if mode and request.user.is_authenticated and request.user.is_staff:
+            return self.profile(request, mode)
+
+        if not self.background:
+            return self.get_response(request)
+        thread_id = threading.get_ident()
+        self.active_threads.add(thread_id)
+        try:
+            return self.get_response(request)
+        finally:
+            self.active_threads.discard(thread_id)
+
+    def ensure_sampler(self):
+        """Start one sampler per process (gunicorn forks after import)"""
+        if self.sampler_pid == os.getpid():
+            return
+        self.sampler_pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        output = os.path.join(self.directory, f'sampled-{os.getpid()}-{int(time.time())}.folded')
+        self.sampler = StackSampler(
+            self.active_threads,
+            interval=self.interval,
+            duration=self.duration,
+            max_stacks=self.max_stacks,
+            max_overhead=self.max_overhead,
+            output=output,
+        )
+        self.sampler.start()
+        # Workers recycled before SAMPLER_DURATION still keep their samples
+        atexit.register(self.sampler.close)
+
+    def output_path(self, request, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        return os.path.join(self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{view}-{os.getpid()}.{extension}')
+
+    def profile(self, request, mode):
+        if not self.profile_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Shop-Profile'] = 'busy'
+            return response
+        try:
+            if mode == 'sample':
+                return self.sample_request(request)
+            return self.cprofile_request(request, mode)
+        finally:
+            self.profile_lock.release()
+
+    def cprofile_request(self, request, mode):
+        # Imported on first use: most processes never profile a request
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        if mode == 'stats':
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(60)
+            return HttpResponse(out.getvalue(), content_type='text/plain; charset=utf-8')
+
+        path = self.output_path(request, 'prof')
+        profiler.dump_stats(path)
+        response['X-Shop-Profile'] = os.path.basename(path)
+        return response
+
+    def sample_request(self, request):
+        sampler = StackSampler({threading.get_ident()}, interval=self.interval,
+                               max_stacks=self.max_stacks, max_overhead=self.max_overhead)
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+            sampler.join()
+        path = self.output_path(request, 'folded')
+        sampler.write(path)
+        response['X-Shop-Profile'] = os.path.basename(path)
+        return response
@@ -0,0 +1,126 @@
+"""
+Cache-backed rate limiting for expensive or abusable views.
+
+Each scope uses a sliding window approximated from two fixed windows: the
+current window's count plus the previous window's count weighted by how much
+of it still overlaps. Counters live in the shared cache (``cache.add`` +
+``cache.incr``, both atomic on Redis and Memcached), so no database rows are
+written and throttled requests are rejected before any session, user or
+password work happens.
+"""
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+
+
+logger = logging.getLogger('shop.ratelimit')
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _config():
+    return getattr(settings, 'SHOP_RATELIMIT', {})
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> ``(10, 60)``; ``'100/5m'`` -> ``(100, 300)``"""
+    count, period = rate.split('/')
+    multiplier = int(period[:-1] or 1)
+    return int(count), multiplier * UNITS[period[-1]]
+
+
+def client_ip(request):
+    """
+    Client address, taken from ``X-Forwarded-For`` only when
+    ``SHOP_RATELIMIT['PROXY_COUNT']`` trusted proxies sit in front of us
+    """
+    proxies = _config().get('PROXY_COUNT', 0)
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def post_field(name):
+    """Key requests by a normalized POST field, e.g. the submitted account"""
+    return lambda request: request.POST.get(name, '').strip().lower()
+
+
+def hit(scope, identity, limit, period):
+    """
+    Count one request for ``identity`` in ``scope``.
+
+    Return the number of seconds to wait when the limit is exceeded,
+    otherwise 0.
+    """
+    cache = caches[_config().get('CACHE', 'default')]
+    now = time.time()
+    window = int(now // period)
+    digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+    current_key = f'rl:{scope}:{digest}:{window}'
+    previous_key = f'rl:{scope}:{digest}:{window - 1}'
+
+    cache.add(current_key, 0, timeout=period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(current_key, 1, timeout=period * 2)
+        current = 1
+    previous = cache.get(previous_key, 0)
+
+    elapsed = (now % period) / period
+    if previous * (1 - elapsed) + current <= limit:
+        return 0
+    return max(1, math.ceil(period - now % period))
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests. Please try again later.'
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = JsonResponse({'success': False, 'message': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, rate, key=client_ip, methods=('POST',)):
+    """
+    Reject requests to the decorated view with a 429 once ``key(request)``
+    exceeds ``rate`` (``'<count>/<period>'``) within ``scope``.
+
+    ``settings.SHOP_RATELIMIT['RATES'][scope]`` overrides ``rate``. Only
+    ``methods`` are counted (``None`` counts every method). Put this
+    decorator outermost so throttled requests skip all other work.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            config = _config()
+            if not config.get('ENABLED', True) or (methods and request.method not in methods):
+                return view_func(request, *args, **kwargs)
+            identity = key(request)
+            if identity:
+                limit, period = parse_rate(config.get('RATES', {}).get(scope, rate))
+                try:
+                    retry_after = hit(scope, identity, limit, period)
+                except Exception:
+                    # Fail open: a cache outage must not take the shop down
+                    logger.warning('Rate limit check failed for %s', scope, exc_info=True)
+                    retry_after = 0
+                if retry_after:
+                    metrics.RATELIMITED.inc(scope=scope)
+                    return too_many_requests(request, retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
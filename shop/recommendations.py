@@ -0,0 +1,208 @@
+"""
+Item-to-item recommendations from cart and wishlist co-occurrence.
+
+Every user's cart and wishlist form one basket. Two products are similar
+when they often share a basket, scored by cosine similarity:
+``shared baskets / sqrt(baskets(a) * baskets(b))``. ``compute`` stores the
+top-N neighbours of each product in ``ProductRecommendation``, and
+``related_products`` serves them with one indexed lookup, filling up with
+category neighbours when a product has too few.
+
+NumPy and SciPy are optional. With them, similarities are computed as sparse
+matrix products, fast enough for a million products; without them a
+pure-Python version of the same computation is used.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import chain, islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import RECOMMENDATIONS, bump
+from .models import CartItem, CatalogVersion, Product, ProductRecommendation, WishlistItem
+
+# numpy and scipy.sparse, imported on first use by _have_numpy(): web
+# workers only read stored recommendations and should not load them
+np = sparse = None
+_numpy_checked = False
+
+
+TOP_N = 12
+# Columns of the co-occurrence matrix computed per sparse product
+MATRIX_CHUNK = 4096
+
+
+def basket_pairs():
+    """``(user_id, product_id)`` for every cart and wishlist line"""
+    return chain(
+        CartItem.objects.values_list('cart__user_id', 'product_id').order_by().iterator(chunk_size=10_000),
+        WishlistItem.objects.values_list('wishlist__user_id', 'product_id').order_by().iterator(chunk_size=10_000),
+    )
+
+
+def changed_products(since):
+    """Products in the baskets of users whose cart or wishlist gained lines since ``since``"""
+    users = set(CartItem.objects.filter(updated_at__gt=since).values_list('cart__user_id', flat=True).distinct())
+    users.update(WishlistItem.objects.filter(added_at__gt=since).values_list('wishlist__user_id', flat=True).distinct())
+    products = set()
+    for start in range(0, len(users), 1000):
+        batch = list(users)[start:start + 1000]
+        products.update(CartItem.objects.filter(cart__user_id__in=batch).values_list('product_id', flat=True))
+        products.update(WishlistItem.objects.filter(wishlist__user_id__in=batch).values_list('product_id', flat=True))
+    return products
+
+
+def neighbours(pairs, targets, top=TOP_N, min_support=1):
+    """
+    Yield ``(product_id, [(recommended_id, score), ...])`` for each target,
+    best first. Products sharing fewer than ``min_support`` baskets are
+    never recommended.
+    """
+    if _have_numpy():
+        return _neighbours_sparse(pairs, targets, top, min_support)
+    return _neighbours_python(pairs, targets, top, min_support)
+
+
+def _have_numpy():
+    global np, sparse, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy as np
+            from scipy import sparse
+        except ImportError:
+            np = sparse = None
+    return np is not None
+
+
+def _neighbours_python(pairs, targets, top, min_support):
+    baskets = defaultdict(set)
+    holders = defaultdict(list)
+    for user_id, product_id in pairs:
+        if product_id not in baskets[user_id]:
+            baskets[user_id].add(product_id)
+            holders[product_id].append(user_id)
+    for product_id in targets:
+        users = holders.get(product_id, ())
+        shared = Counter()
+        for user_id in users:
+            shared.update(baskets[user_id])
+        shared.pop(product_id, None)
+        # Ties go to the lowest product id, as in the sparse version
+        best = heapq.nlargest(top, (
+            (count / math.sqrt(len(users) * len(holders[other])), -other)
+            for other, count in shared.items() if count >= min_support
+        ))
+        yield product_id, [(-other, score) for score, other in best]
+
+
+def _neighbours_sparse(pairs, targets, top, min_support):
+    lines = np.fromiter(chain.from_iterable(pairs), dtype=np.int64).reshape(-1, 2)
+    if not len(lines):
+        for product_id in targets:
+            yield product_id, []
+        return
+    user_ids, user_index = np.unique(lines[:, 0], return_inverse=True)
+    product_ids, product_index = np.unique(lines[:, 1], return_inverse=True)
+    # Users x products; a product in both cart and wishlist counts once
+    baskets = sparse.csr_matrix(
+        (np.ones(len(lines), dtype=np.float32), (user_index, product_index)),
+        shape=(len(user_ids), len(product_ids)),
+    )
+    baskets.sum_duplicates()
+    baskets.data[:] = 1
+    support = np.asarray(baskets.sum(axis=0)).ravel()
+    by_product = baskets.T.tocsr()
+    by_column = baskets.tocsc()
+
+    targets = np.asarray(sorted(targets), dtype=np.int64)
+    positions = np.searchsorted(product_ids, targets)
+    known = (positions < len(product_ids)) & (product_ids[np.minimum(positions, len(product_ids) - 1)] == targets)
+    for product_id in targets[~known]:
+        yield int(product_id), []
+    columns = positions[known]
+
+    for start in range(0, len(columns), MATRIX_CHUNK):
+        chunk = columns[start:start + MATRIX_CHUNK]
+        # Products x chunk: baskets shared with each chunk product
+        shared = (by_product @ by_column[:, chunk]).tocsc()
+        for k, column in enumerate(chunk):
+            rows = shared.indices[shared.indptr[k]:shared.indptr[k + 1]]
+            counts = shared.data[shared.indptr[k]:shared.indptr[k + 1]]
+            keep = (rows != column) & (counts >= min_support)
+            rows, counts = rows[keep], counts[keep]
+            scores = counts / np.sqrt(support[rows] * support[column])
+            if len(scores) > top:
+                # Everything tied with the top-th score, so ties can go to the lowest id
+                best = np.flatnonzero(scores >= np.partition(scores, len(scores) - top)[len(scores) - top])
+            else:
+                best = np.arange(len(scores))
+            # rows follow product_ids, which are sorted
+            best = best[np.lexsort((rows[best], -scores[best]))][:top]
+            yield int(product_ids[column]), list(zip(product_ids[rows[best]].tolist(), scores[best].tolist()))
+
+
+def store(results, batch_size=1000):
+    """Replace the stored neighbours of each product in ``results``; return the number of products"""
+    stored = 0
+    results = iter(results)
+    while batch := list(islice(results, batch_size)):
+        with transaction.atomic():
+            ProductRecommendation.objects.filter(product_id__in=[product_id for product_id, _ in batch]).delete()
+            ProductRecommendation.objects.bulk_create([
+                ProductRecommendation(product_id=product_id, rank=rank, recommended_id=other, score=score)
+                for product_id, similar in batch
+                for rank, (other, score) in enumerate(similar)
+            ], batch_size=batch_size * 4)
+        stored += len(batch)
+    return stored
+
+
+def compute(full=False, top=TOP_N, min_support=1, batch_size=1000):
+    """
+    Recompute recommendations and return the number of products updated.
+
+    Incremental runs only recompute products in baskets that gained lines
+    since the previous run. Removals and the drift of other products'
+    scores are picked up by the next full run.
+    """
+    started = timezone.now()
+    previous = CatalogVersion.objects.filter(key=RECOMMENDATIONS).values_list('updated_at', flat=True).first()
+    if full or previous is None:
+        targets = set(Product.objects.values_list('pk', flat=True).iterator(chunk_size=10_000))
+    else:
+        targets = changed_products(previous)
+    if not targets:
+        return 0
+    updated = store(neighbours(basket_pairs(), targets, top, min_support), batch_size)
+    # Lines added while this run was reading are picked up by the next one
+    bump(RECOMMENDATIONS, at=started)
+    return updated
+
+
+def category_neighbours(product, count, exclude=()):
+    """Products after ``product`` in its category by primary key, wrapping around"""
+    found = []
+    for pk_filter in ({'pk__gt': product.pk}, {'pk__lt': product.pk}):
+        found += (
+            Product.objects.filter(category_id=product.category_id, **pk_filter)
+            .exclude(pk__in=exclude)
+            .order_by('pk')[:count - len(found)]
+        )
+        if len(found) >= count:
+            break
+    return found
+
+
+def related_products(product, count=3):
+    """Precomputed recommendations for ``product``, topped up with category neighbours"""
+    related = [
+        recommendation.recommended
+        for recommendation in ProductRecommendation.objects.filter(product=product)
+        .select_related('recommended').order_by('rank')[:count]
+    ]
+    if len(related) < count:
+        related += category_neighbours(product, count - len(related), {product.pk, *(p.pk for p in related)})
+    return related
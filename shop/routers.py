@@ -0,0 +1,117 @@
+"""
+Catalog reads from read replicas.
+
+Every ``REPLICA*_DATABASE_URL`` variable adds a replica (see settings).
+Reads of the catalog models (products, categories, their facets,
+recommendations and version counters) go to a replica picked once per
+request; every other read, and every write, goes to ``default``.
+
+Replicas lag behind the primary, so catalog reads go to ``default`` instead:
+
+* in a thread that has written, for the rest of its request (or for good,
+  outside requests, e.g. in management commands)
+* inside a transaction on ``default``, which must see its own changes
+* for ``PIN_SECONDS`` after a request that wrote: ReplicaPinningMiddleware
+  sets a short-lived cookie, so users see their own changes on the next pages
+
+Version counters are read from the same database as the data they describe,
+so a page is never cached under a version newer than its rows.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+CATALOG_MODELS = frozenset({
+    'shop.category', 'shop.product', 'shop.productfacet', 'shop.productrecommendation', 'shop.catalogversion',
+})
+# Writes that do not pin: sessions are always read from default
+UNPINNED_MODELS = frozenset({'sessions.session'})
+
+_state = threading.local()
+
+
+def _config():
+    return getattr(settings, 'SHOP_REPLICAS', {})
+
+
+def replicas():
+    return _config().get('DATABASES', ())
+
+
+def pin_cookie():
+    return _config().get('COOKIE', 'shop_primary')
+
+
+def start_request(pinned=False):
+    """Reset this thread's routing state at the start of a request"""
+    _state.pinned = pinned
+    _state.wrote = False
+    _state.replica = None
+
+
+def wrote():
+    """Whether this thread has written since its request started"""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in CATALOG_MODELS or getattr(_state, 'pinned', False):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        replica = getattr(_state, 'replica', None)
+        if replica is None:
+            aliases = replicas()
+            if not aliases:
+                return None
+            # One replica per request, so a page does not mix two replication lags
+            replica = _state.replica = random.choice(aliases)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Also asked for reads that must see the primary (get_or_create,
+        # select_for_update), which then pin as well
+        if model._meta.label_lower not in UNPINNED_MODELS:
+            _state.pinned = _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return False if db in replicas() else None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Send a user's catalog reads to the primary for ``PIN_SECONDS`` after a
+    request of theirs wrote to it. Must come before any middleware that
+    reads the catalog.
+    """
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie = pin_cookie()
+        self.seconds = _config().get('PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        start_request(pinned=self.cookie in request.COOKIES)
+        response = self.get_response(request)
+        if wrote():
+            response.set_cookie(
+                self.cookie, '1', max_age=self.seconds, secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,219 @@
+"""
+Deterministic synthetic data generators used by the ``seed_shop`` command.
+
+Everything in this module is plain Python (no ORM imports) so the generators
+can run inside multiprocessing workers. Each chunk of rows is produced from
+its own ``random.Random`` seeded with ``(seed, kind, chunk)``, which keeps the
+output identical regardless of how many workers are used.
+"""
+import random
+from decimal import Decimal
+
+
+SEED_USERNAME_PREFIX = 'seed_'
+SEED_PASSWORD = 'seedpass123'
+
+FINISHES = [
+    'Glossy', 'Matte', 'Polished', 'Honed', 'Textured', 'Satin', 'Rustic',
+    'Brushed', 'Tumbled', 'Lappato', 'Structured', 'Anti-Slip', 'Crackle',
+    'Metallic', 'Handmade', 'Glazed', 'Unglazed', 'Sandblasted', 'Embossed',
+    'Vintage',
+]
+MATERIALS = [
+    'Ceramic', 'Porcelain', 'Vitrified', 'Marble', 'Granite', 'Slate',
+    'Travertine', 'Terracotta', 'Limestone', 'Quartz', 'Glass', 'Mosaic',
+    'Cement', 'Terrazzo', 'Onyx', 'Sandstone', 'Basalt', 'Quarry',
+    'Encaustic', 'Zellige', 'Wood-Look', 'Stone-Look', 'Brick', 'Concrete-Look',
+    'Metal', 'Pebble', 'Mother of Pearl', 'Agglomerate', 'Clay', 'Cotto',
+]
+USES = [
+    'Floor', 'Wall', 'Bathroom', 'Kitchen', 'Backsplash', 'Outdoor', 'Patio',
+    'Pool', 'Parking', 'Living Room', 'Shower', 'Fireplace', 'Stair',
+    'Facade', 'Terrace',
+]
+COLOURS = [
+    'White', 'Ivory', 'Beige', 'Sand', 'Grey', 'Charcoal', 'Black', 'Blue',
+    'Teal', 'Sage', 'Olive', 'Terracotta', 'Rust', 'Walnut', 'Oak', 'Cream',
+    'Carrara', 'Calacatta', 'Emperador', 'Nero Marquina',
+]
+SIZES = [
+    '10x10', '15x15', '20x20', '30x30', '30x60', '45x45', '60x60', '60x120',
+    '80x80', '7.5x15', '10x30', '20x120', '100x100', '120x120',
+]
+DESCRIPTION_SENTENCES = [
+    'Crafted from {material_lower} with a {finish_lower} surface that resists everyday wear.',
+    'Ideal for {use_lower} installations in both residential and commercial projects.',
+    'The {colour_lower} tone pairs well with natural wood, brushed metal and neutral grout.',
+    'Rectified edges allow tight {size} layouts with minimal grout lines.',
+    'Frost resistant and easy to clean with a pH neutral detergent.',
+    'Each batch is shade-graded so large areas keep a consistent look.',
+    'Low water absorption makes it suitable for wet areas and underfloor heating.',
+    'Supplied in boxes covering roughly {coverage} square metres.',
+    'Slip rating {slip} makes it a safe choice for barefoot areas.',
+    'Subtle veining gives every tile a slightly different character.',
+    'Matching skirting, step nosing and decor pieces are available separately.',
+    'Recommended adhesive and grout are listed in the installation guide.',
+]
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael',
+    'Linda', 'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan',
+    'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen', 'Ahmed',
+    'Fatima', 'Mehmet', 'Ayse', 'Kazi', 'Nusrat', 'Wei', 'Mei', 'Arjun',
+    'Priya', 'Lucas', 'Sofia', 'Mateo', 'Valentina', 'Noah', 'Emma',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+    'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Wilson',
+    'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee',
+    'Yilmaz', 'Kaya', 'Demir', 'Rahman', 'Hossain', 'Chen', 'Wang', 'Patel',
+    'Sharma', 'Silva', 'Santos', 'Muller', 'Schmidt', 'Rossi', 'Dubois',
+]
+CITIES = [
+    ('New York', 'NY', 'United States'), ('Austin', 'TX', 'United States'),
+    ('Seattle', 'WA', 'United States'), ('Chicago', 'IL', 'United States'),
+    ('Toronto', 'ON', 'Canada'), ('London', 'Greater London', 'United Kingdom'),
+    ('Manchester', 'Greater Manchester', 'United Kingdom'),
+    ('Istanbul', 'Istanbul', 'Turkey'), ('Ankara', 'Ankara', 'Turkey'),
+    ('Dhaka', 'Dhaka', 'Bangladesh'), ('Berlin', 'Berlin', 'Germany'),
+    ('Madrid', 'Madrid', 'Spain'), ('Milan', 'Lombardy', 'Italy'),
+    ('Sydney', 'NSW', 'Australia'),
+]
+STREETS = [
+    'Main St', 'Oak Ave', 'Maple Rd', 'Park Lane', 'High Street', 'Station Rd',
+    'Church St', 'Mill Lane', 'Cedar Blvd', 'Elm St', 'Lakeview Dr',
+    'Sunset Blvd', 'Riverside Way', 'Hillcrest Rd',
+]
+GENDERS = ['M', 'F', 'O', None]
+
+
+def chunk_rng(seed, kind, chunk):
+    """Return a random generator dedicated to one chunk of one table"""
+    return random.Random(f'{seed}:{kind}:{chunk}')
+
+
+def category_names(count, seed):
+    """Return ``count`` unique, deterministic category names"""
+    rng = chunk_rng(seed, 'category', 0)
+    combos = [
+        f'{material} {use} Tiles'
+        for material in MATERIALS
+        for use in USES
+    ]
+    rng.shuffle(combos)
+    if count <= len(combos):
+        return combos[:count]
+    # Beyond the natural combinations fall back to numbered collections
+    extra = [f'{combos[i % len(combos)]} Collection {i // len(combos) + 1}'
+             for i in range(count - len(combos))]
+    return combos + extra
+
+
+def product_rows(args):
+    """
+    Generate product rows for one chunk.
+
+    ``args`` is ``(seed, chunk, start, stop, category_count)`` and the result
+    is a list of ``(name, description, price, category_index)`` tuples.
+    """
+    seed, chunk, start, stop, category_count = args
+    rng = chunk_rng(seed, 'product', chunk)
+    rows = []
+    for _ in range(start, stop):
+        finish = rng.choice(FINISHES)
+        material = rng.choice(MATERIALS)
+        use = rng.choice(USES)
+        colour = rng.choice(COLOURS)
+        size = rng.choice(SIZES)
+        name = f'{finish} {colour} {material} {use} Tile {size}'
+        sentences = rng.sample(DESCRIPTION_SENTENCES, rng.randint(2, 4))
+        description = ' '.join(sentences).format(
+            material_lower=material.lower(),
+            finish_lower=finish.lower(),
+            use_lower=use.lower(),
+            colour_lower=colour.lower(),
+            size=size,
+            coverage=rng.choice(['0.72', '1.08', '1.44', '1.62']),
+            slip=rng.choice(['R9', 'R10', 'R11', 'R12']),
+        )
+        price = Decimal(rng.randint(999, 24999)) / 100
+        rows.append((name, description, price, rng.randrange(category_count)))
+    return rows
+
+
+def user_rows(args):
+    """
+    Generate user rows for one chunk.
+
+    ``args`` is ``(seed, chunk, start, stop)`` and the result is a list of
+    ``(username, email, first_name, last_name, profile)`` tuples where
+    ``profile`` is ``(gender, phone_number, country_code)``.
+    """
+    seed, chunk, start, stop = args
+    rng = chunk_rng(seed, 'user', chunk)
+    rows = []
+    for n in range(start, stop):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        username = f'{SEED_USERNAME_PREFIX}{first_name.lower()}{n}'
+        email = f'{first_name.lower()}.{last_name.lower()}{n}@example.com'
+        profile = (
+            rng.choice(GENDERS),
+            f'{rng.randint(2000000000, 9999999999)}',
+            rng.choice(['+1', '+44', '+90', '+880', '+49']),
+        )
+        rows.append((username, email, first_name, last_name, profile))
+    return rows
+
+
+def activity_rows(args):
+    """
+    Generate addresses, cart lines and wishlist lines for one chunk of users.
+
+    ``args`` is ``(seed, chunk, start, stop, product_count, cart_ratio,
+    wishlist_ratio, max_cart_lines, max_wishlist_lines)``. Users and products
+    are referenced by their index in the seeded sequence; the caller maps
+    indexes to primary keys. The result is a list of
+    ``(user_index, addresses, cart_lines, wishlist_products)`` tuples.
+    """
+    (seed, chunk, start, stop, product_count, cart_ratio, wishlist_ratio,
+     max_cart_lines, max_wishlist_lines) = args
+    rng = chunk_rng(seed, 'activity', chunk)
+    rows = []
+    for user_index in range(start, stop):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        addresses = []
+        for _ in range(rng.choice([0, 1, 1, 1, 2, 3])):
+            city, state, country = rng.choice(CITIES)
+            addresses.append((
+                first_name,
+                last_name,
+                f'{first_name.lower()}.{last_name.lower()}{user_index}@example.com',
+                f'{rng.randint(1, 9999)} {rng.choice(STREETS)}',
+                rng.choice(['', '', f'Apt {rng.randint(1, 400)}']),
+                city,
+                state,
+                f'{rng.randint(10000, 99999)}',
+                country,
+                f'{rng.randint(2000000000, 9999999999)}',
+            ))
+
+        cart_lines = []
+        if product_count and rng.random() < cart_ratio:
+            products = rng.sample(range(product_count),
+                                  min(product_count, rng.randint(1, max_cart_lines)))
+            cart_lines = [(p, rng.randint(1, 12)) for p in products]
+
+        wishlist_products = []
+        if product_count and rng.random() < wishlist_ratio:
+            wishlist_products = rng.sample(range(product_count),
+                                           min(product_count, rng.randint(1, max_wishlist_lines)))
+
+        rows.append((user_index, addresses, cart_lines, wishlist_products))
+    return rows
+
+
+def chunk_ranges(total, chunk_size):
+    """Yield ``(chunk, start, stop)`` triples covering ``range(total)``"""
+    for chunk, start in enumerate(range(0, total, chunk_size)):
+        yield chunk, start, min(start + chunk_size, total)
@@ -0,0 +1,74 @@
+"""Keep catalog version counters (shop.catalog) and facet counts (shop.facets) in step with the data"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import facets
+from .catalog import CATALOG, CATEGORIES, bump_on_commit, category_key
+from .models import Category, Product
+
+
+_state = threading.local()
+
+
+@contextmanager
+def muted():
+    """
+    Skip the per-row receivers below in this thread, for bulk operations
+    that recount facets and bump versions once themselves (shop.bulk)
+    """
+    previous = getattr(_state, 'muted', False)
+    _state.muted = True
+    try:
+        yield
+    finally:
+        _state.muted = previous
+
+
+def _muted():
+    return getattr(_state, 'muted', False)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """A product moved to another category or price bucket changes both"""
+    instance._previous = None
+    if raw or instance._state.adding or _muted():
+        return
+    instance._previous = Product.objects.filter(pk=instance.pk).values_list('category_id', 'price').first()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    if _muted():
+        return
+    keys = {CATALOG, category_key(instance.category_id)}
+    previous = getattr(instance, '_previous', None)
+    if created:
+        facets.adjust(instance.category_id, instance.price, 1)
+    elif previous is not None:
+        previous_category_id, previous_price = previous
+        keys.add(category_key(previous_category_id))
+        if (previous_category_id, facets.bucket_for(previous_price)) != (
+                instance.category_id, facets.bucket_for(instance.price)):
+            facets.adjust(previous_category_id, previous_price, -1)
+            facets.adjust(instance.category_id, instance.price, 1)
+    bump_on_commit(*keys)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    if _muted():
+        return
+    facets.adjust(instance.category_id, instance.price, -1)
+    bump_on_commit(CATALOG, category_key(instance.category_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    if _muted():
+        return
+    bump_on_commit(CATALOG, CATEGORIES, category_key(instance.pk))
@@ -11,8 +11,74 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Initialize hero slider
     initializeHeroSlider();
+
+    // Initialize search suggestions
+    initializeSearchAutocomplete();
 });
 
+/**
+ * Show search suggestions below inputs with a data-autocomplete-url attribute
+ */
+function initializeSearchAutocomplete() {
+    document.querySelectorAll('input[data-autocomplete-url]').forEach((input) => {
+        const menu = document.createElement('div');
+        menu.className = 'list-group position-absolute w-100 shadow-sm d-none';
+        menu.style.top = '100%';
+        menu.style.zIndex = 1000;
+        input.parentElement.classList.add('position-relative');
+        input.parentElement.appendChild(menu);
+        input.setAttribute('autocomplete', 'off');
+
+        let timer;
+        let controller;
+
+        /**
+         * Render suggestion links, categories first
+         */
+        function render(data) {
+            const items = data.categories.map((category) => ({url: category.url, label: category.name, hint: 'Category'}))
+                .concat(data.products.map((product) => ({url: product.url, label: product.name, hint: ''})));
+            menu.replaceChildren(...items.map((item) => {
+                const link = document.createElement('a');
+                link.className = 'list-group-item list-group-item-action';
+                link.href = item.url;
+                link.textContent = item.label;
+                if (item.hint) {
+                    const hint = document.createElement('small');
+                    hint.className = 'text-muted ms-2';
+                    hint.textContent = item.hint;
+                    link.appendChild(hint);
+                }
+                return link;
+            }));
+            menu.classList.toggle('d-none', items.length === 0);
+        }
+
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (!query) {
+                menu.classList.add('d-none');
+                return;
+            }
+            // Wait for a pause in typing and drop responses to older keystrokes
+            timer = setTimeout(() => {
+                if (controller) controller.abort();
+                controller = new AbortController();
+                fetch(input.dataset.autocompleteUrl + '?' + new URLSearchParams({q: query}), {signal: controller.signal})
+                    .then((response) => response.json())
+                    .then(render)
+                    .catch(() => {});
+            }, 100);
+        });
+
+        input.addEventListener('blur', () => {
+            // Let clicks on a suggestion land first
+            setTimeout(() => menu.classList.add('d-none'), 150);
+        });
+    });
+}
+
 /**
  * Initialize hero image slider with navigation and auto-rotation
  */
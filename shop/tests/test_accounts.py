@@ -0,0 +1,206 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop import accounts, backends
+from shop.models import Address, Category, Product, UserProfile, Wishlist, WishlistItem
+
+
+class AllocateUsernameTests(TestCase):
+    def users(self, *names):
+        User.objects.bulk_create([User(username=name) for name in names])
+
+    def test_free_base(self):
+        self.assertEqual(accounts.allocate_username('info'), 'info')
+
+    def test_next_number_after_highest(self):
+        self.users('info', 'info1', 'info7', 'info3')
+        self.assertEqual(accounts.allocate_username('info'), 'info8')
+
+    def test_numbered_names_without_base(self):
+        self.users('info2')
+        self.assertEqual(accounts.allocate_username('info'), 'info3')
+
+    def test_other_suffixes_ignored(self):
+        self.users('info', 'infodesk', 'info_2', 'info2b', 'xinfo9')
+        self.assertEqual(accounts.allocate_username('info'), 'info1')
+
+    def test_regex_characters_in_base(self):
+        self.users('a.b', 'aXb5')
+        self.assertEqual(accounts.allocate_username('a.b'), 'a.b1')
+
+    def test_suffix_too_long_to_count_is_ignored(self):
+        self.users('info', 'info12345678901')
+        self.assertEqual(accounts.allocate_username('info'), 'info1')
+
+    def test_overflow_falls_back_to_random_suffix(self):
+        self.users('info', 'info999999999')
+        username = accounts.allocate_username('info')
+        self.assertRegex(username, r'^info_[0-9a-f]{8}$')
+        self.assertFalse(User.objects.filter(username=username).exists())
+
+
+class CreateCustomerTests(TestCase):
+    def test_creates_user_and_profile(self):
+        user = accounts.create_customer('Info@Example.COM', 'pass12345', first_name='In', last_name='Fo')
+        self.assertEqual(user.username, 'Info')
+        self.assertEqual(user.email, 'Info@example.com')
+        self.assertTrue(user.check_password('pass12345'))
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_after_numbering_overflow(self):
+        User.objects.bulk_create([User(username='info'), User(username='info999999999')])
+        user = accounts.create_customer('info@example.com', 'pass12345')
+        self.assertRegex(user.username, r'^info_[0-9a-f]{8}$')
+
+    def test_retry_offered_the_same_name_goes_random(self):
+        # A name the lookup cannot see past, e.g. taken between the lookup and the insert every time
+        User.objects.create(username='info5')
+        with mock.patch.object(accounts, 'allocate_username', return_value='info5'):
+            user = accounts.create_customer('info@example.com', 'pass12345')
+        self.assertRegex(user.username, r'^info_[0-9a-f]{8}$')
+        self.assertEqual(User.objects.filter(username__startswith='info').count(), 2)
+
+
+@override_settings(SHOP_PBKDF2_ITERATIONS=1000)
+class EmailOrUsernameBackendTests(TestCase):
+    def setUp(self):
+        self.backend = backends.EmailOrUsernameBackend()
+
+    def user(self, username, email, password='pass12345'):
+        user = User(username=username, email=email)
+        user.set_password(password)
+        user.save()
+        return user
+
+    def test_email_is_case_insensitive_username_is_exact(self):
+        user = self.user('ann', 'Ann@Example.com')
+        self.assertEqual(self.backend.authenticate(None, username='ann@example.COM', password='pass12345'), user)
+        self.assertEqual(self.backend.authenticate(None, username='ann', password='pass12345'), user)
+        self.assertIsNone(self.backend.authenticate(None, username='Ann', password='pass12345'))
+        self.assertIsNone(self.backend.authenticate(None, username='ann', password='wrong'))
+
+    def test_oldest_account_wins_shared_email(self):
+        oldest = self.user('ann', 'ann@example.com')
+        self.user('ann2', 'ANN@example.com')
+        self.assertEqual(self.backend.authenticate(None, username='Ann@example.com', password='pass12345'), oldest)
+
+    def test_missing_user_still_hashes(self):
+        with mock.patch.object(User, 'set_password') as set_password:
+            self.assertIsNone(self.backend.authenticate(None, username='nobody@example.com', password='pass12345'))
+        set_password.assert_called_once_with('pass12345')
+
+    def test_rehash_after_work_factor_change(self):
+        user = self.user('ann', 'ann@example.com')
+        self.assertIn('$1000$', user.password)
+        with self.settings(SHOP_PBKDF2_ITERATIONS=1200):
+            self.assertTrue(backends.needs_rehash(user.password))
+            self.backend.authenticate(None, username='ann', password='pass12345')
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$1200$'))
+            self.assertFalse(backends.needs_rehash(user.password))
+
+    async def test_async_rehash_after_work_factor_change(self):
+        user = await sync_to_async(self.user)('ann', 'ann@example.com')
+        with self.settings(SHOP_PBKDF2_ITERATIONS=1200):
+            self.assertEqual(await self.backend.aauthenticate(None, username='ann', password='pass12345'), user)
+        await user.arefresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1200$'))
+
+    async def test_async_hashing_runs_in_the_bounded_pool(self):
+        user = await sync_to_async(self.user)('ann', 'ann@example.com')
+        threads = []
+
+        def recording(function):
+            def wrapper(*args):
+                threads.append(threading.current_thread().name)
+                return function(*args)
+            return wrapper
+
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shop-password-hash')
+        self.addCleanup(pool.shutdown)
+        with mock.patch.object(backends, '_hash_pool', pool), \
+                mock.patch('shop.backends.check_password', recording(check_password)), \
+                mock.patch.object(User, 'set_password', recording(User.set_password)):
+            self.assertEqual(await self.backend.aauthenticate(None, username='ann', password='pass12345'), user)
+            # The dummy hash for a missing account runs in the pool too
+            self.assertIsNone(await self.backend.aauthenticate(None, username='nobody', password='pass12345'))
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('shop-password-hash') for name in threads))
+
+    @override_settings(SHOP_AUTH_HASH_THREADS=2)
+    def test_hash_pool_size(self):
+        with mock.patch.object(backends, '_hash_pool', None):
+            pool = backends.hash_pool()
+            self.addCleanup(pool.shutdown)
+            self.assertIs(backends.hash_pool(), pool)
+            self.assertEqual(pool._max_workers, 2)
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ann', email='ann@example.com')
+        self.profile = UserProfile.objects.create(user=self.user)
+        category = Category.objects.create(name='Tiles', slug='tiles')
+        wishlist = Wishlist.objects.create(user=self.user)
+        for number in range(accounts.PROFILE_WISHLIST_PREVIEW + 2):
+            product = Product.objects.create(name=f'Tile {number}', description='', price=Decimal('10'),
+                                             category=category)
+            WishlistItem.objects.create(wishlist=wishlist, product=product)
+        for city in ('London', 'Leeds'):
+            Address.objects.create(user=self.user, first_name='Ann', last_name='Lee', email='ann@example.com',
+                                   address='1 High St', city=city, state='', postal_code='L1', country='UK',
+                                   phone='1')
+
+    def test_load_profile_queries(self):
+        with self.assertNumQueries(4):
+            context = accounts.load_profile(self.user)
+        self.assertEqual(len(context['addresses']), 2)
+        self.assertEqual(len(context['wishlist_items']), accounts.PROFILE_WISHLIST_PREVIEW)
+        self.assertEqual(context['wishlist_count'], accounts.PROFILE_WISHLIST_PREVIEW + 2)
+
+    def test_update_profile_writes_changed_columns(self):
+        data = {'first_name': 'Ann', 'last_name': '', 'email': 'ann@example.com', 'phone_number': '555',
+                'country_code': '+1'}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(accounts.update_profile(self.user, self.profile, data, {}))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        user_update, profile_update = updates
+        self.assertIn('"first_name"', user_update)
+        self.assertNotIn('"email"', user_update)
+        self.assertIn('"phone_number"', profile_update)
+        self.assertNotIn('"country_code"', profile_update)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.phone_number, '555')
+
+        with self.assertNumQueries(0):
+            self.assertFalse(accounts.update_profile(self.user, self.profile, data, {}))
+
+    def test_profile_not_modified(self):
+        self.client.force_login(self.user)
+        url = reverse('profile')
+        etag = self.client.get(url, secure=True)['ETag']
+        response = self.client.get(url, secure=True, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        Address.objects.filter(city='Leeds').delete()
+        response = self.client.get(url, secure=True, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # The categories nav is part of the page
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Grout', slug='grout')
+        response = self.client.get(url, secure=True, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,141 @@
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from shop import addresses
+from shop.models import ADDRESS_FINGERPRINT_FIELDS, Address, address_fingerprint
+
+
+HOME = {
+    'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', 'address': '12 St James Sq',
+    'address2': '', 'city': 'London', 'state': 'London', 'postal_code': 'SW1Y 4JH', 'country': 'UK',
+    'phone': '0207 123 4567',
+}
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_ignores_case_whitespace_and_email(self):
+        messy = {**HOME, 'first_name': ' ADA ', 'address': '12  St\tJames sq', 'email': 'other@example.com'}
+        self.assertEqual(address_fingerprint(messy), address_fingerprint(HOME))
+
+    def test_blank_and_missing_fields_match(self):
+        self.assertEqual(address_fingerprint({**HOME, 'address2': None}), address_fingerprint(HOME))
+
+    def test_any_fingerprint_field_changes_it(self):
+        for field in ADDRESS_FINGERPRINT_FIELDS:
+            with self.subTest(field=field):
+                self.assertNotEqual(address_fingerprint({**HOME, field: 'x'}), address_fingerprint(HOME))
+
+    def test_migration_copy_matches(self):
+        migration = import_module('shop.migrations.0010_address_fingerprint')
+        self.assertEqual(migration.FINGERPRINT_FIELDS, ADDRESS_FINGERPRINT_FIELDS)
+        self.assertEqual(migration.fingerprint(Address(**HOME)), address_fingerprint(HOME))
+
+
+class AddressBookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ada')
+
+    def test_add_returns_existing_duplicate(self):
+        address_id, created = addresses.add_address(self.user, HOME)
+        self.assertTrue(created)
+        self.assertEqual(addresses.add_address(self.user, {**HOME, 'city': 'LONDON '}), (address_id, False))
+        self.assertEqual(Address.objects.count(), 1)
+
+    def test_same_address_for_another_user(self):
+        addresses.add_address(self.user, HOME)
+        _, created = addresses.add_address(User.objects.create(username='charles'), HOME)
+        self.assertTrue(created)
+
+    def test_save_merges_into_duplicate(self):
+        kept, _ = addresses.add_address(self.user, HOME)
+        other, _ = addresses.add_address(self.user, {**HOME, 'address': '1 Other Road'})
+        edited = Address.objects.get(pk=other)
+        edited.address = '12 st james sq'
+        self.assertEqual(addresses.save_address(edited), kept)
+        self.assertEqual(list(Address.objects.values_list('pk', flat=True)), [kept])
+
+    def test_save_without_duplicate_updates_fingerprint(self):
+        address_id, _ = addresses.add_address(self.user, HOME)
+        address = Address.objects.get(pk=address_id)
+        address.city = 'Bath'
+        self.assertEqual(addresses.save_address(address), address_id)
+        self.assertEqual(Address.objects.get(pk=address_id).fingerprint, address_fingerprint({**HOME, 'city': 'Bath'}))
+
+
+class AddressAdminTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ada')
+        self.client.force_login(User.objects.create(username='ops', is_staff=True, is_superuser=True))
+
+    def test_edit_into_duplicate_merges(self):
+        kept, _ = addresses.add_address(self.user, HOME)
+        other, _ = addresses.add_address(self.user, {**HOME, 'address': '1 Other Road'})
+        url = reverse('admin:shop_address_change', args=[other])
+        response = self.client.post(url, {**HOME, 'address': '12 st james sq', '_continue': 'Save'}, secure=True)
+        self.assertRedirects(response, reverse('admin:shop_address_change', args=[kept]), fetch_redirect_response=False)
+        self.assertEqual(list(Address.objects.values_list('pk', flat=True)), [kept])
+
+    def test_edit(self):
+        address_id, _ = addresses.add_address(self.user, HOME)
+        url = reverse('admin:shop_address_change', args=[address_id])
+        response = self.client.post(url, {**HOME, 'city': 'Bath'}, secure=True)
+        self.assertRedirects(response, reverse('admin:shop_address_changelist'), fetch_redirect_response=False)
+        self.assertEqual(Address.objects.get(pk=address_id).city, 'Bath')
+
+
+class CollapseDuplicatesTests(TestCase):
+    def create(self, user, **overrides):
+        # bulk_create skips save(), like an import with fingerprints of its own
+        self.imported += 1
+        address = Address(user=user, fingerprint=f'imported-{self.imported}', **{**HOME, **overrides})
+        return Address.objects.bulk_create([address])[0].pk
+
+    def setUp(self):
+        self.users = User.objects.bulk_create([User(username=f'user{n}') for n in range(3)])
+        self.imported = 0
+
+    def test_keeps_oldest_of_each_and_fills_fingerprints(self):
+        first, second, third = self.users
+        kept = [self.create(first), self.create(first, city='Bath'), self.create(second), self.create(third)]
+        self.create(first, city=' bath')
+        self.create(first, first_name='ADA')
+        self.create(third)
+
+        self.assertEqual(addresses.collapse_duplicates(batch_size=2), (4, 3))
+        self.assertEqual(sorted(Address.objects.values_list('pk', flat=True)), kept)
+        for address in Address.objects.all():
+            self.assertEqual(address.fingerprint, address.get_fingerprint())
+        self.assertEqual(addresses.collapse_duplicates(), (0, 0))
+
+    def test_one_transaction_per_batch(self):
+        for user in self.users:
+            self.create(user)
+            self.create(user)
+        # Batches of two addresses hold exactly one user each, plus the empty last one
+        with self.assertNumQueries(3 * 7 + 4):
+            self.assertEqual(addresses.collapse_duplicates(batch_size=2), (3, 3))
+
+    def test_swapped_fingerprints_do_not_collide(self):
+        user = self.users[0]
+        home = Address.objects.create(user=user, **HOME)
+        work = Address.objects.create(user=user, **{**HOME, 'address': '1 Other Road'})
+        # Stored fingerprints swapped, as after a normalization change
+        Address.objects.filter(pk=home.pk).update(fingerprint='~')
+        Address.objects.filter(pk=work.pk).update(fingerprint=home.fingerprint)
+        Address.objects.filter(pk=home.pk).update(fingerprint=work.fingerprint)
+        self.assertEqual(addresses.collapse_duplicates(), (2, 0))
+
+    def test_migration_backfill(self):
+        first, second, _ = self.users
+        kept = [self.create(first), self.create(second)]
+        self.create(first, phone='0207  123 4567')
+        migration = import_module('shop.migrations.0010_address_fingerprint')
+        migration.backfill_fingerprints(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(sorted(Address.objects.values_list('pk', flat=True)), kept)
+        self.assertEqual(set(Address.objects.values_list('fingerprint', flat=True)), {address_fingerprint(HOME)})
@@ -0,0 +1,86 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from shop.models import Cart, CartItem, Category, Product, Wishlist, WishlistItem
+from shop.paginators import EstimatedCountPaginator
+
+
+class AnnotatedChangelistTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Tiles', slug='tiles')
+        products = [Product.objects.create(name=f'Tile {price}', description='', price=Decimal(price),
+                                           category=category) for price in ('10.50', '3.25', '99.99')]
+        for number, lines in enumerate(([(0, 2), (1, 3), (2, 1)], [(0, 1)], [])):
+            user = User.objects.create(username=f'user{number}')
+            cart = Cart.objects.create(user=user)
+            wishlist = Wishlist.objects.create(user=user)
+            for index, quantity in lines:
+                CartItem.objects.create(cart=cart, product=products[index], quantity=quantity)
+                WishlistItem.objects.create(wishlist=wishlist, product=products[index])
+        self.staff = User.objects.create(username='ops', is_staff=True, is_superuser=True)
+
+    def changelist(self, model):
+        request = RequestFactory().get('/')
+        request.user = self.staff
+        return admin.site._registry[model], admin.site._registry[model].get_queryset(request)
+
+    def test_cart_totals_match_per_row_methods(self):
+        model_admin, carts = self.changelist(Cart)
+        for cart in carts:
+            with self.subTest(cart=cart.pk):
+                self.assertEqual(model_admin.get_total_items(cart), cart.get_total_items())
+                self.assertEqual(model_admin.get_total_price(cart), f'${cart.get_total_price():.2f}')
+        self.assertEqual(sorted(cart.total_items for cart in carts), [0, 1, 6])
+
+    def test_wishlist_counts_match(self):
+        model_admin, wishlists = self.changelist(Wishlist)
+        for wishlist in wishlists:
+            with self.subTest(wishlist=wishlist.pk):
+                self.assertEqual(model_admin.get_items_count(wishlist), wishlist.items.count())
+
+    def test_changelists_sort_by_annotations(self):
+        self.client.force_login(self.staff)
+        for model, column in ((Cart, 'get_total_price'), (Wishlist, 'get_items_count')):
+            model_admin = admin.site._registry[model]
+            # Column numbers count the action checkbox
+            order = model_admin.list_display.index(column) + 1
+            with self.subTest(model=model.__name__):
+                response = self.client.get(reverse(f'admin:shop_{model._meta.model_name}_changelist'),
+                                           {'o': f'-{order}'}, secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([row.user.username for row in response.context['cl'].result_list],
+                                 ['user0', 'user1', 'user2'])
+
+
+@override_settings(SHOP_ADMIN={'EXACT_COUNT_BELOW': 100})
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(username=f'user{number}') for number in range(5)])
+        self.users = User.objects.order_by('pk')
+
+    def count(self, estimate, vendor='postgresql'):
+        with mock.patch.object(connection, 'vendor', vendor), \
+                mock.patch.object(EstimatedCountPaginator, '_estimate', return_value=estimate) as estimated:
+            return EstimatedCountPaginator(self.users, 2).count, estimated.called
+
+    def test_estimate_above_threshold(self):
+        self.assertEqual(self.count(250), (250, True))
+
+    def test_exact_below_threshold(self):
+        self.assertEqual(self.count(99), (5, True))
+
+    def test_exact_without_statistics(self):
+        self.assertEqual(self.count(None), (5, True))
+
+    def test_other_databases_count_exactly(self):
+        self.assertEqual(self.count(250, vendor='sqlite'), (5, False))
+
+    def test_lists_count_exactly(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(EstimatedCountPaginator(list(range(7)), 2).count, 7)
@@ -0,0 +1,102 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop import autocomplete
+from shop.models import Cart, CartItem, Category, Product
+
+
+def brute_force(texts, prefixes, limit):
+    matches = [
+        position for position, text in enumerate(texts)
+        if all(any(word.startswith(prefix) for word in autocomplete.words(text)) for prefix in prefixes)
+    ]
+    return matches[:limit]
+
+
+class WordsTests(SimpleTestCase):
+    def test_normalizes_case_accents_and_punctuation(self):
+        self.assertEqual(autocomplete.words('Crème Wood-Look  TILE'), ['creme', 'wood', 'look', 'tile'])
+
+    def test_keeps_dotted_numbers_together(self):
+        self.assertEqual(autocomplete.words('Tile 60x60 1.5cm'), ['tile', '60x60', '1.5cm'])
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def test_results_in_rank_order(self):
+        index = autocomplete.PrefixIndex(['Oak floor', 'Marble tile', 'Oak tile', 'Slate tile'])
+        self.assertEqual(index.search(['til'], 10), [1, 2, 3])
+        self.assertEqual(index.search(['til'], 2), [1, 2])
+        self.assertEqual(index.search(['oa', 'ti'], 10), [2])
+
+    def test_prefix_matches_only_at_word_starts(self):
+        index = autocomplete.PrefixIndex(['Tile', 'Reptile'])
+        self.assertEqual(index.search(['tile'], 10), [0])
+        self.assertEqual(index.search(['ile'], 10), [])
+
+    def test_empty_query_limit_and_misses(self):
+        index = autocomplete.PrefixIndex(['Tile'])
+        self.assertEqual(index.search([], 10), [])
+        self.assertEqual(index.search(['tile'], 0), [])
+        self.assertEqual(index.search(['zz'], 10), [])
+        self.assertEqual(index.search(['tile', 'zz'], 10), [])
+
+    def test_matches_brute_force(self):
+        # Enough texts that multi-word queries go past the scanned head into
+        # the intersection and text-check paths
+        rng = random.Random(7)
+        vocabulary = ['oak', 'oat', 'marble', 'matte', 'slate', 'tile', 'tiled', 'grey', 'green', 'gloss',
+                      'floor', 'wall', 'white', 'wood', 'x' * 3]
+        common = ['tile'] * 20
+        texts = [' '.join(rng.sample(vocabulary + common, rng.randint(1, 5))) for _ in range(2000)]
+        index = autocomplete.PrefixIndex(texts)
+        queries = [['t'], ['oa'], ['ma', 'gr'], ['tile', 'white'], ['t', 'w', 'g'], ['gloss', 'oat', 'slate'],
+                   ['xxx', 'tile'], ['tile', 'tile'], ['f', 'w']]
+        for prefixes in queries:
+            for limit in (1, 8, 100, 2000):
+                with self.subTest(prefixes=prefixes, limit=limit):
+                    self.assertEqual(index.search(prefixes, limit), brute_force(texts, prefixes, limit))
+
+
+@override_settings(SHOP_AUTOCOMPLETE={'LIMIT': 8, 'MAX_LIMIT': 20, 'CATEGORY_LIMIT': 3, 'MIN_LENGTH': 1,
+                                      'CHECK_INTERVAL': 0, 'MAX_AGE': 3600, 'HTTP_MAX_AGE': 60})
+class SuggestTests(TestCase):
+    def setUp(self):
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.tiles = Category.objects.create(name='Wall Tiles', slug='wall-tiles')
+        self.floors = Category.objects.create(name='Floor Tiles', slug='floor-tiles')
+        self.plain = self.product('White Wall Tile', self.tiles)
+        self.popular = self.product('White Floor Tile', self.floors)
+        cart = Cart.objects.create(user=User.objects.create(username='ada'))
+        CartItem.objects.create(cart=cart, product=self.popular)
+
+    def product(self, name, category):
+        return Product.objects.create(name=name, description='', price=Decimal('10'), category=category)
+
+    def test_popular_products_and_categories_first(self):
+        products, _ = autocomplete.suggest('white til')
+        self.assertEqual(products, [(self.popular.pk, 'White Floor Tile'), (self.plain.pk, 'White Wall Tile')])
+        self.assertEqual(autocomplete.suggest('til')[1], [('floor-tiles', 'Floor Tiles'), ('wall-tiles', 'Wall Tiles')])
+
+    def test_limits(self):
+        self.assertEqual(len(autocomplete.suggest('tile', limit=1)[0]), 1)
+        self.assertEqual(autocomplete.suggest('  '), ([], []))
+
+    def test_rebuilt_when_catalog_changes(self):
+        autocomplete.suggest('tile')
+        with self.assertNumQueries(1):
+            autocomplete.suggest('tile')
+        # The catalog version is bumped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.product('Wall Tile Grey', self.tiles)
+        self.assertIn((added.pk, 'Wall Tile Grey'), autocomplete.suggest('grey')[0])
+
+    def test_view(self):
+        response = self.client.get(reverse('product_autocomplete'), {'q': 'floor'}, secure=True)
+        self.assertEqual(response.json()['products'][0]['url'], reverse('product_detail', args=[self.popular.pk]))
+        self.assertEqual(response.json()['categories'][0]['slug'], 'floor-tiles')
+        self.assertIn('max-age=60', response['Cache-Control'])
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import unittest
+from unittest import mock
+
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import SimpleTestCase
+
+from shop.benchmarks import Scenario
+from shop.benchmarks import runner, startup
+
+
+def result(**overrides):
+    values = {
+        'route': 'home', 'queries': 3, 'query_budget': 4, 'status': 200, 'expected_status': 200,
+        'location': None, 'expected_location': None, 'status_changes': 0, 'p95_ms': 10.0,
+    }
+    values.update(overrides)
+    return values
+
+
+class OutcomeTests(SimpleTestCase):
+    def test_redirect_target_resolved_from_context(self):
+        scenario = Scenario('logout', 'logout', '/logout/', 4, status=302, location=lambda ctx: ctx['next'])
+        outcome = runner.outcome(scenario, HttpResponseRedirect('/'), {'next': '/'})
+        self.assertEqual(outcome, {'status': 302, 'expected_status': 302, 'location': '/', 'expected_location': '/'})
+
+    def test_location_ignored_unless_redirect(self):
+        response = HttpResponse()
+        response['Location'] = '/elsewhere/'
+        outcome = runner.outcome(Scenario('home', 'home', '/', 4), response, {})
+        self.assertIsNone(outcome['location'])
+
+
+class CheckTests(SimpleTestCase):
+    def test_passing_report(self):
+        self.assertEqual(runner.check({'results': {'home': result()}}), [])
+
+    def test_unexpected_status_fails(self):
+        failures = runner.check({'results': {'cart': result(status=302, location='/login/')}})
+        self.assertEqual(failures, ['cart: status 302, expected 200 (redirect to /login/)'])
+
+    def test_wrong_redirect_target_fails(self):
+        report = {'results': {'logout': result(status=302, expected_status=302, location='/login/',
+                                               expected_location='/')}}
+        self.assertEqual(runner.check(report), ['logout: redirected to /login/, expected /'])
+
+    def test_status_changing_between_runs_fails(self):
+        failures = runner.check({'results': {'home': result(status_changes=2)}})
+        self.assertEqual(failures, ['home: 2 timed runs answered other than 200'])
+
+    def test_query_budget_and_regression(self):
+        report = {'results': {'home': result(queries=5, p95_ms=20.0)}}
+        baseline = {'results': {'home': result(p95_ms=10.0)}}
+        self.assertEqual(runner.check(report, baseline), [
+            'home: 5 queries exceeds budget of 4',
+            'home: p95_ms regressed from 10.00ms to 20.00ms',
+        ])
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       5000 | django.db
+import time:      3000 |       3000 |     PIL.Image
+"""
+
+
+class StartupTests(SimpleTestCase):
+    def scenario(self, **overrides):
+        return startup.Scenario(**{'name': 'command', 'description': '', 'argv': ['manage.py', 'check'],
+                                   'budget_ms': 500, 'forbidden': ('PIL', 'shop.views'), **overrides})
+
+    def test_parse_importtime(self):
+        self.assertEqual(startup.parse_importtime(IMPORTTIME), [
+            ('_io', 120, 120, 1), ('django.db', 2000, 5000, 0), ('PIL.Image', 3000, 3000, 2),
+        ])
+
+    def test_forbidden_imports_fail(self):
+        process = subprocess.CompletedProcess([], 0, stdout='', stderr=IMPORTTIME)
+        with mock.patch('shop.benchmarks.startup._spawn', return_value=process):
+            result = startup.measure(self.scenario(), runs=1)
+        self.assertEqual(result['forbidden'], ['PIL'])
+        self.assertEqual(startup.check({'command': result}), ['command: imports PIL'])
+
+    def test_budget_fails(self):
+        result = {'median_ms': 620.0, 'budget_ms': 500, 'forbidden': []}
+        self.assertEqual(startup.check({'command': result}), ['command: 620ms over its 500ms budget'])
+
+    def test_failed_process_raises(self):
+        process = subprocess.CompletedProcess([], 1, stdout='', stderr='Traceback')
+        with mock.patch('shop.benchmarks.startup._spawn', return_value=process), \
+                self.assertRaisesMessage(RuntimeError, 'command exited with 1: Traceback'):
+            startup.measure(self.scenario(), runs=1)
+
+    @unittest.skipIf(os.environ.get('SHOP_SKIP_SLOW_TESTS'), 'SHOP_SKIP_SLOW_TESTS is set')
+    def test_command_scenario(self):
+        # Starts real processes (about two seconds)
+        scenario = next(scenario for scenario in startup.SCENARIOS if scenario.name == 'command')
+        result = startup.measure(scenario, runs=3)
+        self.assertEqual(startup.check({scenario.name: result}), [])
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from shop import bulk, facets
+from shop.catalog import CATALOG
+from shop.models import Cart, CartItem, CatalogVersion, Category, Product, ProductFacet
+
+
+class BulkTestCase(TestCase):
+    def setUp(self):
+        facets._cache = None
+        self.tiles = Category.objects.create(name='Tiles', slug='tiles')
+        self.grout = Category.objects.create(name='Grout', slug='grout')
+
+    def product(self, price, category=None):
+        return Product.objects.create(name='Tile', description='', price=Decimal(price),
+                                      category=category or self.tiles)
+
+    def prices(self):
+        return list(Product.objects.order_by('pk').values_list('price', flat=True))
+
+    def catalog_version(self):
+        return CatalogVersion.objects.filter(key=CATALOG).values_list('version', flat=True).first()
+
+
+class BatchesTests(BulkTestCase):
+    def test_ascending_batches_of_keys(self):
+        pks = [self.product('1').pk for _ in range(5)]
+        self.assertEqual(list(bulk.batches(Product.objects.all(), 2)), [pks[0:2], pks[2:4], pks[4:]])
+
+    def test_rows_leaving_the_queryset_do_not_shift_later_batches(self):
+        pks = [self.product('1').pk for _ in range(4)]
+        seen = []
+        for batch in bulk.batches(Product.objects.filter(price__lt=5), 2):
+            seen += batch
+            Product.objects.filter(pk__in=batch).update(price=10)
+        self.assertEqual(seen, pks)
+
+
+class AdjustPricesTests(BulkTestCase):
+    def test_fractional_percent(self):
+        self.product('183.93')
+        self.assertEqual(bulk.adjust_prices(Product.objects.all(), percent=Decimal('12.75')), 1)
+        self.assertEqual(self.prices(), [Decimal('207.38')])
+
+    def test_percent_then_amount_rounded_once(self):
+        self.product('10.00')
+        self.product('0.99')
+        bulk.adjust_prices(Product.objects.all(), percent=Decimal('-15.5'), amount=Decimal('0.10'))
+        # 8.45 + 0.10; 0.83655 + 0.10 rounds to 0.94
+        self.assertEqual(self.prices(), [Decimal('8.55'), Decimal('0.94')])
+
+    def test_never_below_zero(self):
+        self.product('3.00')
+        bulk.adjust_prices(Product.objects.all(), amount=Decimal('-5.00'))
+        self.assertEqual(self.prices(), [Decimal('0.00')])
+
+    def test_only_selected_products_in_batches(self):
+        selected = [self.product('10.00') for _ in range(3)]
+        self.product('10.00')
+        self.assertEqual(bulk.adjust_prices(Product.objects.filter(pk__in=[p.pk for p in selected]), percent=10,
+                                            batch_size=2), 3)
+        self.assertEqual(self.prices(), [Decimal('11.00')] * 3 + [Decimal('10.00')])
+
+    def test_facets_and_catalog_version_updated_once(self):
+        self.product('20.00')
+        version = self.catalog_version()
+        bulk.adjust_prices(Product.objects.all(), percent=100)
+        self.assertEqual(list(ProductFacet.objects.values_list('price_bucket', 'count')), [(1, 1)])
+        self.assertEqual(self.catalog_version(), (version or 0) + 1)
+
+
+class MoveAndDeleteTests(BulkTestCase):
+    def test_move_to_category(self):
+        products = [self.product('10.00') for _ in range(3)]
+        self.assertEqual(bulk.move_to_category(Product.objects.filter(pk__in=[p.pk for p in products[:2]]),
+                                               self.grout, batch_size=1), 2)
+        self.assertEqual(dict(ProductFacet.objects.values_list('category_id', 'count')),
+                         {self.tiles.pk: 1, self.grout.pk: 2})
+
+    def test_delete_products_with_cart_lines(self):
+        product = self.product('10.00')
+        self.product('10.00')
+        cart = Cart.objects.create(user=User.objects.create(username='ada'))
+        CartItem.objects.create(cart=cart, product=product)
+        self.assertEqual(bulk.delete_products(Product.objects.filter(pk=product.pk)), 1)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(list(ProductFacet.objects.values_list('count', flat=True)), [1])
+
+    def test_delete_categories(self):
+        for _ in range(3):
+            self.product('10.00')
+        self.product('10.00', self.grout)
+        self.assertEqual(bulk.delete_categories(Category.objects.filter(pk=self.tiles.pk), batch_size=2), (1, 3))
+        self.assertEqual(list(Category.objects.all()), [self.grout])
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_cascade_summary(self):
+        product = self.product('10.00')
+        self.product('10.00', self.grout)
+        cart = Cart.objects.create(user=User.objects.create(username='ada'))
+        CartItem.objects.create(cart=cart, product=product)
+        summary = dict(bulk.cascade_summary(Category.objects.filter(pk=self.tiles.pk)))
+        self.assertEqual(summary['Categories'], 1)
+        self.assertEqual(summary['products'], 1)
+        self.assertEqual(summary['cart items'], 1)
+
+
+class AdminActionTests(BulkTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create(username='ops', is_staff=True, is_superuser=True))
+
+    def test_adjust_prices_action(self):
+        product = self.product('183.93')
+        url = reverse('admin:shop_product_changelist')
+        data = {'action': 'adjust_prices', admin.helpers.ACTION_CHECKBOX_NAME: [product.pk], 'select_across': 0}
+        form = self.client.post(url, data, secure=True)
+        self.assertContains(form, 'Adjust the prices of 1 products.')
+        response = self.client.post(url, {**data, 'apply': 'yes', 'percent': '12.75'}, secure=True)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(self.prices(), [Decimal('207.38')])
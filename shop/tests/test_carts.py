@@ -0,0 +1,124 @@
+import random
+from decimal import Decimal
+
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop import carts
+from shop.models import Category, Product
+
+
+def cart_settings(storage):
+    return override_settings(SHOP_CARTS={'STORAGE': storage, 'COOKIE': 'shop_cart'})
+
+
+class EncodingTests(SimpleTestCase):
+    def test_round_trip(self):
+        rng = random.Random(3)
+        for size in (1, 2, 50, 500):
+            cart = {rng.randrange(1, 2 ** 40): rng.randrange(1, 1000) for _ in range(size)}
+            with self.subTest(size=size):
+                self.assertEqual(carts.decode(carts.encode(cart)), cart)
+
+    def test_compact_and_url_safe(self):
+        value = carts.encode({3: 1, 130: 2, 20_000: 300})
+        self.assertRegex(value, r'^1\.[A-Za-z0-9_-]+$')
+        # gaps 3, 127, 19870 and quantities 1, 2, 300: 1 + 1 + 1 + 1 + 3 + 2 bytes
+        self.assertEqual(len(value), len('1.') + 12)
+
+    def test_empty_lines_dropped(self):
+        self.assertEqual(carts.encode({}), '')
+        self.assertEqual(carts.encode({5: 0, 6: -1}), '')
+        self.assertEqual(carts.decode(carts.encode({5: 0, 7: 2})), {7: 2})
+        self.assertEqual(carts.decode(''), {})
+        self.assertEqual(carts.decode(None), {})
+
+    def test_legacy_json_object(self):
+        self.assertEqual(carts.decode({'12': 3, '7': '1'}), {12: 3, 7: 1})
+
+    def test_unreadable_values_are_discarded(self):
+        truncated = carts.encode({300: 1})[:-1]
+        for value in ('2.AQE', 'nodot', truncated, '1.AQ', {'x': 1}, 42):
+            with self.subTest(value=value), self.assertLogs('shop.carts', 'WARNING'):
+                self.assertEqual(carts.decode(value), {})
+
+
+class StorageTests(SimpleTestCase):
+    def request(self, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        request.session = SessionStore()
+        return request
+
+    def respond(self, request):
+        return carts.CartCookieMiddleware(lambda request: HttpResponse())(request)
+
+    @cart_settings('session')
+    def test_session_storage(self):
+        request = self.request()
+        carts.save(request, {4: 2})
+        self.assertEqual(request.session[carts.SESSION_KEY], carts.encode({4: 2}))
+        carts.save(request, {})
+        self.assertNotIn(carts.SESSION_KEY, request.session)
+
+    @cart_settings('session')
+    def test_load_decodes_once_per_request(self):
+        request = self.request()
+        request.session[carts.SESSION_KEY] = {'4': 2}
+        self.assertIs(carts.load(request), carts.load(request))
+        self.assertEqual(carts.load(request), {4: 2})
+
+    @cart_settings('cookie')
+    def test_cookie_storage(self):
+        request = self.request()
+        request.session[carts.SESSION_KEY] = {'4': 2}
+        cart = carts.load(request)
+        cart[9] = 1
+        carts.save(request, cart)
+        # The legacy session copy moves to the cookie
+        self.assertNotIn(carts.SESSION_KEY, request.session)
+        response = self.respond(request)
+        self.assertEqual(response.headers['Vary'], 'Cookie')
+
+        cookie = response.cookies['shop_cart']
+        self.assertTrue(cookie['httponly'])
+        next_request = self.request({'shop_cart': cookie.value})
+        self.assertEqual(carts.load(next_request), {4: 2, 9: 1})
+
+    @cart_settings('cookie')
+    def test_tampered_cookie_is_ignored(self):
+        request = self.request({'shop_cart': carts.encode({4: 2}) + ':forged'})
+        self.assertEqual(carts.load(request), {})
+
+    @cart_settings('cookie')
+    def test_large_cart_falls_back_to_session(self):
+        request = self.request({'shop_cart': 'old'})
+        cart = {product_id: 99 for product_id in range(1, 200_000, 97)}
+        carts.save(request, cart)
+        self.assertEqual(carts.decode(request.session[carts.SESSION_KEY]), cart)
+        response = self.respond(request)
+        # Deleted, so the next request reads the session copy
+        self.assertEqual(response.cookies['shop_cart'].value, '')
+
+    @cart_settings('cookie')
+    def test_emptied_cart_deletes_cookie(self):
+        request = self.request({'shop_cart': 'old'})
+        carts.save(request, {})
+        self.assertEqual(self.respond(request).cookies['shop_cart']['max-age'], 0)
+
+    @cart_settings('session')
+    def test_middleware_not_used_with_session_storage(self):
+        with self.assertRaises(carts.MiddlewareNotUsed):
+            carts.CartCookieMiddleware(lambda request: HttpResponse())
+
+
+@cart_settings('cookie')
+class CookieCartViewTests(TestCase):
+    def test_anonymous_cart_in_cookie(self):
+        category = Category.objects.create(name='Tiles', slug='tiles')
+        product = Product.objects.create(name='Tile', description='', price=Decimal('10'), category=category)
+        response = self.client.post(reverse('add_to_cart', args=[product.pk]), {'quantity': 2}, secure=True)
+        self.assertIn('shop_cart', response.cookies)
+        self.assertEqual(self.client.get(reverse('cart'), secure=True).context['session_total_price'], Decimal('20'))
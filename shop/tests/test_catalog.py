@@ -0,0 +1,197 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import catalog, signals
+from shop.models import CatalogVersion, Category, Product, ProductRecommendation
+
+
+def versions():
+    return dict(CatalogVersion.objects.values_list('key', 'version'))
+
+
+class BumpTests(TestCase):
+    def setUp(self):
+        # Left over from data created by earlier tests, whose transactions never commit
+        catalog._pending.keys = set()
+
+    def test_creates_missing_counters(self):
+        at = timezone.now() - timedelta(hours=1)
+        catalog.bump(catalog.CATALOG, at=at)
+        catalog.bump(catalog.CATALOG, catalog.CATEGORIES)
+        self.assertEqual(versions(), {catalog.CATALOG: 2, catalog.CATEGORIES: 1})
+        self.assertGreater(CatalogVersion.objects.get(key=catalog.CATALOG).updated_at, at)
+
+    def test_bump_on_commit_merges_keys(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            catalog.bump_on_commit(catalog.CATALOG, 'category:1')
+            catalog.bump_on_commit(catalog.CATALOG, 'category:2')
+            self.assertEqual(versions(), {})
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(versions(), {catalog.CATALOG: 1, 'category:1': 1, 'category:2': 1})
+
+    def test_bump_all(self):
+        catalog.bump('category:1')
+        catalog.bump_all()
+        self.assertEqual(versions(), {'category:1': 2, catalog.CATALOG: 1, catalog.CATEGORIES: 1})
+
+
+class SignalTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tiles = Category.objects.create(name='Tiles', slug='tiles')
+            self.grout = Category.objects.create(name='Grout', slug='grout')
+
+    def change(self, function):
+        before = versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            function()
+        after = versions()
+        return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+    def product(self, category):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(name='Tile', description='', price=Decimal('10'), category=category)
+
+    def test_product_saved(self):
+        product = self.product(self.tiles)
+        self.assertEqual(self.change(lambda: Product.objects.get(pk=product.pk).save()),
+                         {catalog.CATALOG: 1, catalog.category_key(self.tiles.pk): 1})
+
+    def test_product_moved_bumps_both_categories(self):
+        product = self.product(self.tiles)
+        product.category = self.grout
+        self.assertEqual(self.change(product.save), {
+            catalog.CATALOG: 1, catalog.category_key(self.tiles.pk): 1, catalog.category_key(self.grout.pk): 1,
+        })
+
+    def test_category_saved(self):
+        self.assertEqual(self.change(self.tiles.save),
+                         {catalog.CATALOG: 1, catalog.CATEGORIES: 1, catalog.category_key(self.tiles.pk): 1})
+
+    def test_one_bump_per_transaction(self):
+        for _ in range(3):
+            self.product(self.tiles)
+        key = catalog.category_key(self.tiles.pk)
+        # The category and its three products are deleted together
+        self.assertEqual(self.change(self.tiles.delete), {catalog.CATALOG: 1, catalog.CATEGORIES: 1, key: 1})
+
+    def test_muted(self):
+        def save():
+            with signals.muted():
+                self.product(self.tiles)
+                self.tiles.save()
+        self.assertEqual(self.change(save), {})
+
+
+@override_settings(SHOP_HTTP_CACHE={'SHARED_MAX_AGE': 60})
+class CatalogPageTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tiles = Category.objects.create(name='Tiles', slug='tiles')
+            self.grout = Category.objects.create(name='Grout', slug='grout')
+            self.tile = Product.objects.create(name='Tile', description='', price=Decimal('10'), category=self.tiles)
+            self.sealer = Product.objects.create(name='Sealer', description='', price=Decimal('5'),
+                                                 category=self.grout)
+
+    def get(self, url, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(url, secure=True, headers=headers)
+
+    def assertChanged(self, url, etag, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_not_modified(self):
+        for url in (reverse('home'), reverse('products_list'), reverse('product_detail', args=[self.tile.pk])):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                not_modified = self.get(url, response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+
+    def test_product_change(self):
+        url = reverse('product_detail', args=[self.tile.pk])
+        etag = self.get(url)['ETag']
+        self.tile.price = Decimal('12')
+        etag = self.assertChanged(url, etag, self.tile.save)
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+    def test_category_change(self):
+        url = reverse('home')
+        etag = self.get(url)['ETag']
+        self.tiles.name = 'Wall tiles'
+        self.assertChanged(url, etag, self.tiles.save)
+
+    def test_other_category_change(self):
+        # Every page lists the categories in its navigation
+        url = reverse('product_detail', args=[self.tile.pk])
+        etag = self.get(url)['ETag']
+        self.grout.name = 'Tile grout'
+        self.assertChanged(url, etag, self.grout.save)
+
+    def test_recommended_product_change(self):
+        # Recommendations cross categories
+        ProductRecommendation.objects.create(product=self.tile, rank=0, recommended=self.sealer, score=1)
+        url = reverse('product_detail', args=[self.tile.pk])
+        etag = self.get(url)['ETag']
+        self.sealer.name = 'Grout sealer'
+        self.assertChanged(url, etag, self.sealer.save)
+        self.assertContains(self.get(url), 'Grout sealer')
+
+    def test_cache_control(self):
+        url = reverse('home')
+        response = self.get(url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, s-maxage=60')
+        self.client.force_login(User.objects.create(username='ann'))
+        signed_in = self.get(url, response['ETag'])
+        # The cart badge and CSRF token make the page per user
+        self.assertEqual(signed_in.status_code, 200)
+        self.assertEqual(signed_in['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.get(url, signed_in['ETag'])['Cache-Control'], 'private, no-cache')
+
+    def test_missing_object_is_not_validated(self):
+        response = self.get(reverse('product_detail', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class CatalogPageDecoratorTests(TestCase):
+    def setUp(self):
+        catalog.bump(catalog.CATALOG)
+        self.view = catalog.catalog_page(lambda request: catalog.validators(request, catalog.CATALOG))(
+            lambda request: HttpResponse('page'))
+
+    def request(self, method='get', **headers):
+        request = getattr(RequestFactory(), method)('/', headers=headers)
+        request.user = AnonymousUser()
+        request._messages = CookieStorage(request)
+        return request
+
+    def test_skipped_with_pending_messages(self):
+        etag = self.view(self.request())['ETag']
+        self.assertEqual(self.view(self.request(If_None_Match=etag)).status_code, 304)
+        request = self.request(If_None_Match=etag)
+        messages.success(request, 'Added to cart')
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_post_is_not_validated(self):
+        etag = self.view(self.request())['ETag']
+        response = self.view(self.request('post', If_None_Match=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from shop import cleanup
+from shop.models import Cart, CartItem, Category, Product, Wishlist, WishlistItem
+
+
+class CleanupTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        category = Category.objects.create(name='Tiles', slug='tiles')
+        self.product = Product.objects.create(name='Tile', description='', price=Decimal('10'), category=category)
+        self.users = 0
+
+    def user(self):
+        self.users += 1
+        return User.objects.create(username=f'user{self.users}')
+
+    def cart(self, days_old, line_days_old=None):
+        cart = Cart.objects.create(user=self.user())
+        Cart.objects.filter(pk=cart.pk).update(updated_at=self.now - timedelta(days=days_old))
+        if line_days_old is not None:
+            item = CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+            CartItem.objects.filter(pk=item.pk).update(updated_at=self.now - timedelta(days=line_days_old))
+        return cart.pk
+
+    def wishlist(self, hours_old, items=0):
+        wishlist = Wishlist.objects.create(user=self.user())
+        Wishlist.objects.filter(pk=wishlist.pk).update(created_at=self.now - timedelta(hours=hours_old))
+        for _ in range(items):
+            WishlistItem.objects.create(wishlist=wishlist, product=self.product)
+        return wishlist.pk
+
+    def task(self, name):
+        return next(task for task in cleanup.tasks() if task.name == name)
+
+    def test_stale_carts(self):
+        stale = [self.cart(100), self.cart(100, line_days_old=95)]
+        self.cart(100, line_days_old=3)  # A recent line keeps it
+        self.cart(10)
+        self.assertEqual(sorted(self.task('carts').stale(self.now).values_list('pk', flat=True)), stale)
+
+    def test_stale_wishlists(self):
+        stale = self.wishlist(48)
+        self.wishlist(1)
+        self.wishlist(48, items=1)
+        self.assertEqual(list(self.task('wishlists').stale(self.now).values_list('pk', flat=True)), [stale])
+
+    def test_collect_in_batches(self):
+        stale = [self.cart(100, line_days_old=100) for _ in range(5)]
+        kept = self.cart(1)
+        progress = []
+        result = cleanup.collect(self.task('carts'), now=self.now, batch_size=2,
+                                 progress=lambda deleted, elapsed: progress.append(dict(deleted)))
+        self.assertEqual(result['deleted'], {'shop.Cart': 5, 'shop.CartItem': 5})
+        self.assertEqual(result['batches'], 3)
+        self.assertTrue(result['finished'])
+        self.assertIsNone(result['archive'])
+        self.assertEqual([counts['shop.Cart'] for counts in progress], [2, 4, 5])
+        self.assertEqual(list(Cart.objects.values_list('pk', flat=True)), [kept])
+        self.assertFalse(Cart.objects.filter(pk__in=stale).exists())
+
+    def test_rows_active_again_after_locking_are_kept(self):
+        active, stale = self.cart(100), self.cart(100)
+        task = self.task('carts')
+        find_stale = task.stale
+        calls = []
+
+        def touched_after_locking(now):
+            calls.append(now)
+            if len(calls) == 2:
+                # A request adds a line between the locking read and the delete
+                CartItem.objects.create(cart_id=active, product=self.product, quantity=1)
+            return find_stale(now)
+
+        task.stale = touched_after_locking
+        result = cleanup.collect(task, now=self.now, batch_size=2)
+        self.assertEqual(result['deleted'], {'shop.Cart': 1})
+        self.assertEqual((result['batches'], result['finished']), (1, True))
+        self.assertEqual(list(Cart.objects.values_list('pk', flat=True)), [active])
+        self.assertFalse(Cart.objects.filter(pk=stale).exists())
+
+    def test_max_seconds_stops_after_a_batch(self):
+        for _ in range(3):
+            self.cart(100)
+        result = cleanup.collect(self.task('carts'), now=self.now, batch_size=1, max_seconds=0)
+        self.assertEqual((result['batches'], result['finished']), (1, False))
+        self.assertEqual(Cart.objects.count(), 2)
+        # The next run carries on
+        self.assertTrue(cleanup.collect(self.task('carts'), now=self.now, batch_size=1)['finished'])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_archive_written_before_delete(self):
+        cart = self.cart(100, line_days_old=100)
+        with tempfile.TemporaryDirectory() as directory:
+            result = cleanup.collect(self.task('carts'), now=self.now, archive_dir=directory)
+            self.assertEqual(os.path.dirname(result['archive']), directory)
+            with gzip.open(result['archive'], 'rt', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([row['id'] for row in rows], [cart])
+        self.assertEqual([(item['product_id'], item['quantity']) for item in rows[0]['items']],
+                         [(self.product.pk, 2)])
+
+    def test_nothing_stale_writes_no_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = cleanup.collect(self.task('wishlists'), now=self.now, archive_dir=directory)
+            self.assertEqual(os.listdir(directory), [])
+        self.assertEqual((result['batches'], result['archive'], result['finished']), (0, None, True))
+
+    def test_expired_sessions_are_never_archived(self):
+        Session.objects.create(session_key='expired', session_data='', expire_date=self.now - timedelta(days=1))
+        Session.objects.create(session_key='current', session_data='', expire_date=self.now + timedelta(days=1))
+        with tempfile.TemporaryDirectory() as directory:
+            result = cleanup.collect(self.task('sessions'), now=self.now, archive_dir=directory)
+        self.assertIsNone(result['archive'])
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['current'])
+
+    def test_command_dry_run(self):
+        self.cart(365)
+        out = StringIO()
+        call_command('cleanup_shop', '--dry-run', '--only', 'carts', stdout=out)
+        self.assertIn('carts: 1 stale rows would be deleted', out.getvalue())
+        self.assertEqual(Cart.objects.count(), 1)
@@ -0,0 +1,133 @@
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from shop import facets
+from shop.models import Category, Product, ProductFacet
+
+
+class BucketTests(SimpleTestCase):
+    def test_bucket_for(self):
+        self.assertEqual(facets.bucket_for(Decimal('0.00')), 0)
+        self.assertEqual(facets.bucket_for(Decimal('24.99')), 0)
+        self.assertEqual(facets.bucket_for(Decimal('25.00')), 1)
+        self.assertEqual(facets.bucket_for(Decimal('5000')), len(facets.bucket_bounds()) - 1)
+
+    def test_parse_buckets_drops_invalid_values(self):
+        self.assertEqual(facets.parse_buckets(['3', '1', '1', '', '-1', 'x', '99']), [1, 3])
+
+    def test_parse_buckets_drops_non_ascii_digits(self):
+        self.assertEqual(facets.parse_buckets(['²', '１', '٣', '2']), [2])
+
+    def test_ranges_and_labels(self):
+        self.assertEqual(facets.bucket_range(1), (25, 50))
+        self.assertEqual(facets.bucket_label(1), '25 – 50')
+        self.assertEqual(facets.bucket_label(len(facets.bucket_bounds()) - 1), '1000+')
+
+
+class FacetTestCase(TestCase):
+    def setUp(self):
+        facets._cache = None
+        self.tiles = Category.objects.create(name='Tiles', slug='tiles')
+        self.grout = Category.objects.create(name='Grout', slug='grout')
+
+    def product(self, category, price):
+        return Product.objects.create(name='Tile', description='', price=Decimal(price), category=category)
+
+    def counts(self):
+        return dict(((facet.category_id, facet.price_bucket), facet.count) for facet in ProductFacet.objects.all())
+
+
+class FacetCountTests(FacetTestCase):
+    def test_signals_keep_counts_current(self):
+        cheap = self.product(self.tiles, '10')
+        self.product(self.tiles, '12')
+        self.product(self.grout, '30')
+        self.assertEqual(self.counts(), {(self.tiles.pk, 0): 2, (self.grout.pk, 1): 1})
+
+        cheap.price = Decimal('300')
+        cheap.save()
+        self.product(self.grout, '30').delete()
+        self.assertEqual(self.counts(), {(self.tiles.pk, 0): 1, (self.tiles.pk, 4): 1, (self.grout.pk, 1): 1})
+
+    def test_rebuild_matches_signals(self):
+        for category, price in ((self.tiles, '10'), (self.tiles, '60'), (self.grout, '60'), (self.grout, '2000')):
+            self.product(category, price)
+        expected = self.counts()
+        ProductFacet.objects.all().delete()
+        self.assertEqual(facets.rebuild(), 4)
+        self.assertEqual(self.counts(), expected)
+
+    def test_migration_matches_rebuild(self):
+        for category, price in ((self.tiles, '10'), (self.tiles, '11'), (self.grout, '600')):
+            self.product(category, price)
+        expected = self.counts()
+        ProductFacet.objects.all().delete()
+        migration = import_module('shop.migrations.0013_productfacet')
+        migration.build_facets(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.counts(), expected)
+
+    def test_summary_ignores_each_facets_own_selection(self):
+        self.product(self.tiles, '10')
+        self.product(self.tiles, '60')
+        self.product(self.grout, '60')
+        total, category_counts, bucket_counts = facets.summarize([self.tiles.pk], [2])
+        self.assertEqual(total, 1)
+        # Categories are counted within the price selection, prices within the category selection
+        self.assertEqual(dict(category_counts), {self.tiles.pk: 1, self.grout.pk: 1})
+        self.assertEqual(dict(bucket_counts), {0: 1, 2: 1})
+
+    def test_counts_reload_when_catalog_changes(self):
+        self.product(self.tiles, '10')
+        self.assertEqual(facets.summarize()[0], 1)
+        self.product(self.tiles, '10')
+        self.assertEqual(facets.summarize()[0], 2)
+
+
+class FacetViewTests(FacetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product(self.tiles, '10')
+        self.product(self.grout, '60')
+
+    def get(self, name, query):
+        return self.client.get(reverse(name), query, secure=True)
+
+    def test_empty_category_is_ignored(self):
+        for query in ({'category': ''}, {'category': '', 'search': 'tile'}, {'category': ['', 'tiles']}):
+            with self.subTest(query=query):
+                self.assertEqual(self.get('products_list', query).status_code, 200)
+        response = self.get('product_facets', {'category': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 2)
+
+    def test_unknown_category_is_not_found(self):
+        self.assertEqual(self.get('products_list', {'category': ['tiles', 'nope']}).status_code, 404)
+        self.assertEqual(self.get('product_facets', {'category': 'nope'}).status_code, 404)
+
+    def test_non_ascii_price_is_ignored(self):
+        for name in ('products_list', 'product_facets'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name, {'price': '²'}).status_code, 200)
+        self.client.force_login(User.objects.create(username='ops', is_staff=True, is_superuser=True))
+        response = self.client.get(reverse('admin:shop_product_changelist'), {'price_bucket': '²'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_filters_by_categories_and_prices(self):
+        response = self.get('products_list', {'category': ['tiles', 'grout'], 'price': '2'})
+        self.assertEqual([product.category_id for product in response.context['products']], [self.grout.pk])
+
+    def test_facets_json(self):
+        data = self.get('product_facets', {'category': 'tiles'}).json()
+        self.assertEqual(data['total'], 1)
+        by_slug = {category['slug']: category for category in data['categories']}
+        self.assertTrue(by_slug['tiles']['selected'])
+        self.assertEqual(by_slug['grout']['count'], 1)
+        self.assertIn('category=tiles&category=grout', by_slug['grout']['url'])
+        self.assertEqual([price['count'] for price in data['prices']][:3], [1, 0, 0])
@@ -0,0 +1,109 @@
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import SimpleTemplateResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import path
+
+from shop import fastpath
+
+
+def plain(request):
+    return HttpResponse('plain')
+
+
+def template(request):
+    return SimpleTemplateResponse(engines['django'].from_string('rendered'))
+
+
+def who(request):
+    return HttpResponse(request.user.username)
+
+
+def unlisted(request):
+    return HttpResponse('not fast')
+
+
+urlpatterns = [
+    path('plain/', plain, name='plain'),
+    path('template/', template, name='template'),
+    path('who/', who, name='who'),
+    path('unlisted/', unlisted, name='unlisted'),
+]
+
+
+def fastpath_settings(**overrides):
+    return override_settings(ROOT_URLCONF=__name__, SHOP_FASTPATH={
+        'ENABLED': True, 'ROUTES': ['plain', 'template', 'who'], 'NOT_FOUND': [r'^favicon\.ico$', r'^wp-'],
+        'NOT_FOUND_MAX_AGE': 600, **overrides,
+    })
+
+
+@fastpath_settings()
+class FastPathMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.passed = []
+        self.factory = RequestFactory()
+
+    def middleware(self):
+        def get_response(request):
+            self.passed.append(request.path)
+            return HttpResponse('slow path')
+        return fastpath.FastPathMiddleware(get_response)
+
+    def test_listed_route_skips_later_middleware(self):
+        for method in ('get', 'head'):
+            with self.subTest(method=method):
+                response = self.middleware()(getattr(self.factory, method)('/plain/'))
+                self.assertEqual(response.content, b'plain')
+        self.assertEqual(self.passed, [])
+
+    def test_template_responses_are_rendered(self):
+        response = self.middleware()(self.factory.get('/template/'))
+        self.assertEqual(response.content, b'rendered')
+        self.assertEqual(self.passed, [])
+
+    def test_session_and_user_fail_loudly(self):
+        request = self.factory.get('/who/')
+        with self.assertRaisesMessage(ImproperlyConfigured, "request.user is not available in 'who'"):
+            self.middleware()(request)
+        with self.assertRaisesMessage(ImproperlyConfigured, 'request.session'):
+            request.session.get('cart')
+
+    def test_not_found_patterns(self):
+        for path_info in ('/favicon.ico', '/wp-login.php'):
+            with self.subTest(path=path_info):
+                response = self.middleware()(self.factory.get(path_info))
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+        self.assertEqual(self.passed, [])
+
+    def test_other_routes_take_the_normal_path(self):
+        for path_info in ('/unlisted/', '/plain', '/missing/', '/favicon.ico.bak'):
+            self.middleware()(self.factory.get(path_info))
+        self.assertEqual(self.passed, ['/unlisted/', '/plain', '/missing/', '/favicon.ico.bak'])
+
+    def test_post_takes_the_normal_path(self):
+        self.middleware()(self.factory.post('/plain/'))
+        self.assertEqual(self.passed, ['/plain/'])
+
+    @fastpath_settings(ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware()
+
+
+@fastpath_settings()
+class FastPathStackTests(SimpleTestCase):
+    def test_no_session_or_csrf_cookies(self):
+        response = self.client.get('/plain/', secure=True)
+        self.assertEqual(response.content, b'plain')
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(response.cookies)
+
+    def test_append_slash_still_redirects(self):
+        response = self.client.get('/plain', secure=True)
+        self.assertRedirects(response, '/plain/', status_code=301, fetch_redirect_response=False)
+
+    def test_security_middleware_still_runs(self):
+        self.assertEqual(self.client.get('/plain/', secure=True)['X-Content-Type-Options'], 'nosniff')
@@ -0,0 +1,94 @@
+import csv
+import gzip
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import feeds
+from shop.models import Category, Product
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(SHOP_FEEDS={'DIR': self.directory.name, 'BASE_URL': 'https://shop.example/',
+                                                 'CHUNK_SIZE': 10, 'CURRENCY': 'INR', 'HTTP_MAX_AGE': 3600})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.category = Category.objects.create(name='Tiles', slug='tiles')
+        for pk in (1, 9, 10, 25):
+            self.product(pk)
+
+    def product(self, pk):
+        return Product.objects.create(pk=pk, name=f'Tile {pk}', description='A & B', price=Decimal('12.50'),
+                                      category=self.category)
+
+    def read(self, filename):
+        # gzip.open reads every member of a concatenated file
+        with gzip.open(os.path.join(self.directory.name, filename), 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def read_index(self):
+        with open(os.path.join(self.directory.name, feeds.SITEMAP_INDEX)) as f:
+            return f.read()
+
+    def test_chunk_signatures_use_integer_chunks(self):
+        signatures = feeds.chunk_signatures(10)
+        self.assertEqual(sorted(signatures), ['0', '1', '2'])
+        self.assertEqual([signatures[chunk][0] for chunk in ('0', '1', '2')], [2, 1, 1])
+
+    def test_generate_writes_every_chunk(self):
+        result = feeds.generate()
+        self.assertEqual(result, {'chunks': 3, 'regenerated': 3, 'products': 4})
+        rows = list(csv.reader(io.StringIO(self.read('products.csv.gz'))))
+        self.assertEqual(rows[0], list(feeds.FEED_COLUMNS))
+        self.assertEqual([row[0] for row in rows[1:]], ['1', '9', '10', '25'])
+        self.assertEqual(rows[1][3], 'https://shop.example/product/1/')
+        xml = self.read('products.xml.gz')
+        self.assertTrue(xml.startswith('<?xml') and xml.endswith('</rss>\n'))
+        self.assertEqual(xml.count('<item>'), 4)
+        self.assertIn('<description>A &amp; B</description>', xml)
+        self.assertIn('sitemap-products-2.xml.gz', self.read_index())
+        self.assertEqual(self.read('sitemap-products-0.xml.gz').count('<url>'), 2)
+
+    def test_rerun_rewrites_only_changed_chunks(self):
+        feeds.generate()
+        self.assertEqual(feeds.generate()['regenerated'], 0)
+        Product.objects.filter(pk=25).update(updated_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(feeds.generate(), {'chunks': 3, 'regenerated': 1, 'products': 1})
+        self.assertEqual(feeds.generate(full=True)['regenerated'], 3)
+
+    def test_emptied_chunk_is_removed(self):
+        feeds.generate()
+        Product.objects.filter(pk=10).delete()
+        self.assertEqual(feeds.generate()['chunks'], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'sitemap-products-1.xml.gz')))
+        self.assertNotIn('sitemap-products-1.xml.gz', self.read_index())
+        self.assertEqual(self.read('products.xml.gz').count('<item>'), 3)
+
+    def test_changed_base_url_rewrites_everything(self):
+        feeds.generate()
+        self.assertEqual(feeds.generate(base_url='https://other.example')['regenerated'], 3)
+        self.assertIn('https://other.example/product/25/', self.read('products.csv.gz'))
+
+    def test_base_url_required(self):
+        with override_settings(SHOP_FEEDS={'DIR': self.directory.name, 'CHUNK_SIZE': 10}), \
+                self.assertRaises(feeds.BaseURLMissing):
+            feeds.generate()
+
+    def test_serve_with_revalidation(self):
+        url = reverse('product_feed', args=['products.csv.gz'])
+        self.assertEqual(self.client.get(url, secure=True).status_code, 404)
+        feeds.generate()
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        revalidated = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']}, secure=True)
+        self.assertEqual(revalidated.status_code, 304)
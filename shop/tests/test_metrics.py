@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop import metrics
+
+
+def metrics_settings(**overrides):
+    return override_settings(SHOP_METRICS={'ENABLED': True, 'DIR': '', 'TOKEN': 'secret', **overrides})
+
+
+class HistogramTests(SimpleTestCase):
+    def test_merge_adds_buckets_sums_and_counts(self):
+        total = {}
+        metrics.Histogram.merge(total, {'method="GET"': {'buckets': [1, 2, 0], 'sum': 0.5, 'count': 3}})
+        metrics.Histogram.merge(total, {
+            'method="GET"': {'buckets': [0, 1, 4], 'sum': 1.5, 'count': 5},
+            'method="POST"': {'buckets': [1, 0, 0], 'sum': 0.01, 'count': 1},
+        })
+        self.assertEqual(total, {
+            'method="GET"': {'buckets': [1, 3, 4], 'sum': 2.0, 'count': 8},
+            'method="POST"': {'buckets': [1, 0, 0], 'sum': 0.01, 'count': 1},
+        })
+
+    def test_merge_does_not_alias_the_first_values(self):
+        first = {'': {'buckets': [1, 0], 'sum': 0.1, 'count': 1}}
+        total = {}
+        metrics.Histogram.merge(total, first)
+        metrics.Histogram.merge(total, first)
+        self.assertEqual(first[''], {'buckets': [1, 0], 'sum': 0.1, 'count': 1})
+        self.assertEqual(total['']['buckets'], [2, 0])
+
+    def test_render_is_cumulative(self):
+        histogram = metrics.Histogram.__new__(metrics.Histogram)
+        histogram.name, histogram.buckets = 'latency_seconds', (0.1, 1.0)
+        lines = list(histogram.render({'': {'buckets': [2, 1], 'sum': 1.2, 'count': 4}}))
+        self.assertEqual(lines, [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1.0"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_sum 1.2',
+            'latency_seconds_count 4',
+        ])
+
+
+class RetireTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory.name, name), 'w') as f:
+            json.dump(data, f)
+
+    def read(self, name):
+        with open(os.path.join(self.directory.name, name)) as f:
+            return json.load(f)
+
+    def test_folds_counters_and_histograms_and_drops_gauges(self):
+        self.write(metrics.RETIRED, {
+            metrics.CART_ADDS.name: {'': 5},
+            metrics.LOGIN_SECONDS.name: {'': {'buckets': [1] + [0] * 10, 'sum': 0.001, 'count': 1}},
+        })
+        self.write('4242.json', {
+            metrics.CART_ADDS.name: {'': 2},
+            metrics.LOGIN_SECONDS.name: {'': {'buckets': [0, 1] + [0] * 9, 'sum': 0.008, 'count': 1}},
+            metrics.WORKER_REQUESTS.name: {'pid="4242"': 900},
+        })
+        with metrics_settings(DIR=self.directory.name):
+            metrics.retire(4242)
+
+        retired = self.read(metrics.RETIRED)
+        self.assertEqual(retired[metrics.CART_ADDS.name], {'': 7})
+        self.assertEqual(retired[metrics.LOGIN_SECONDS.name]['']['buckets'][:2], [1, 1])
+        self.assertEqual(retired[metrics.LOGIN_SECONDS.name]['']['count'], 2)
+        self.assertNotIn(metrics.WORKER_REQUESTS.name, retired)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, '4242.json')))
+
+    def test_unknown_pid_is_ignored(self):
+        with metrics_settings(DIR=self.directory.name):
+            metrics.retire(4243)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_collect_sums_live_and_retired_processes(self):
+        self.write(metrics.RETIRED, {metrics.CART_ADDS.name: {'': 5}})
+        self.write('1.json', {metrics.CART_ADDS.name: {'': 2}})
+        self.write('2.json', {metrics.CART_ADDS.name: {'': 3}})
+        with metrics_settings(DIR=self.directory.name):
+            total = metrics.collect()
+        # Includes this process, which may have counted adds of its own
+        self.assertEqual(total[metrics.CART_ADDS.name].get(''), 10 + metrics.CART_ADDS.values.get('', 0))
+
+
+class MetricsViewTests(TestCase):
+    def test_not_found_when_disabled(self):
+        with override_settings(SHOP_METRICS={'ENABLED': False, 'TOKEN': 'secret'}):
+            response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'},
+                                       secure=True)
+        self.assertEqual(response.status_code, 404)
+
+    @metrics_settings()
+    def test_bearer_token(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE shop_cart_adds_total counter', response.content.decode())
+
+    @metrics_settings()
+    def test_wrong_token_is_forbidden(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'}, secure=True)
+        self.assertEqual(response.status_code, 403)
+
+    @metrics_settings(TOKEN='')
+    def test_empty_token_never_matches(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '}, secure=True)
+        self.assertEqual(response.status_code, 403)
+
+    @metrics_settings()
+    def test_staff_session(self):
+        self.client.force_login(User.objects.create(username='ops', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 200)
+
+    @metrics_settings()
+    def test_other_users_are_forbidden(self):
+        self.client.force_login(User.objects.create(username='shopper'))
+        self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 403)
@@ -0,0 +1,95 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from shop.middleware import RequestInstrumentationMiddleware, RequestStats
+
+
+def instrumentation_settings(**overrides):
+    return override_settings(SHOP_INSTRUMENTATION={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True,
+                                                   'DUPLICATE_THRESHOLD': 3, **overrides})
+
+
+def view(request, lookups=1):
+    for _ in range(lookups):
+        User.objects.filter(pk=1).exists()
+    caches['default'].set('instrumentation-hit', 1)
+    caches['default'].get('instrumentation-hit')
+    caches['default'].get('instrumentation-miss')
+    return HttpResponse(engines['django'].from_string('{{ value }}').render({'value': 'ok'}))
+
+
+class RequestStatsTests(SimpleTestCase):
+    def test_duplicates_at_threshold_most_repeated_first(self):
+        stats = RequestStats()
+        for sql, count in (('a', 2), ('b', 3), ('c', 5)):
+            for _ in range(count):
+                stats.record_query(sql, 0.001)
+        self.assertEqual(stats.query_count, 10)
+        self.assertEqual(stats.duplicates(3), [{'sql': 'c', 'count': 5}, {'sql': 'b', 'count': 3}])
+
+
+@instrumentation_settings()
+class RequestInstrumentationMiddlewareTests(TestCase):
+    def request(self, lookups=1, path='/products/'):
+        middleware = RequestInstrumentationMiddleware(lambda request: view(request, lookups))
+        with self.assertLogs('shop.instrumentation', 'INFO') as logs:
+            response = middleware(RequestFactory().get(path))
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0]
+
+    def test_server_timing(self):
+        response, _ = self.request(lookups=2)
+        total, db, tpl, cache = response['Server-Timing'].split(', ')
+        self.assertRegex(total, r'^total;dur=\d+\.\d$')
+        self.assertRegex(db, r'^db;dur=\d+\.\d;desc="2 queries"$')
+        self.assertRegex(tpl, r'^tpl;dur=\d+\.\d$')
+        self.assertEqual(cache, 'cache;desc="1 hits 1 misses"')
+
+    def test_structured_log_line(self):
+        _, record = self.request()
+        logged = json.loads(record.getMessage())
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(
+            {key: logged[key] for key in ('method', 'path', 'view', 'status', 'queries', 'duplicate_queries',
+                                          'cache_hits', 'cache_misses')},
+            {'method': 'GET', 'path': '/products/', 'view': None, 'status': 200, 'queries': 1,
+             'duplicate_queries': [], 'cache_hits': 1, 'cache_misses': 1},
+        )
+        self.assertEqual(set(logged) - {'method', 'path', 'view', 'status', 'queries', 'duplicate_queries',
+                                        'cache_hits', 'cache_misses'},
+                         {'total_ms', 'db_ms', 'template_ms'})
+
+    def test_duplicate_queries_flagged_at_threshold(self):
+        _, record = self.request(lookups=2)
+        self.assertEqual(record.levelname, 'INFO')
+        _, record = self.request(lookups=3)
+        self.assertEqual(record.levelname, 'WARNING')
+        duplicates = json.loads(record.getMessage())['duplicate_queries']
+        self.assertEqual([duplicate['count'] for duplicate in duplicates], [3])
+        self.assertIn('auth_user', duplicates[0]['sql'])
+
+    @instrumentation_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        response, _ = self.request()
+        self.assertNotIn('Server-Timing', response)
+
+    @instrumentation_settings(SAMPLE_RATE=0.25)
+    def test_sampling(self):
+        middleware = RequestInstrumentationMiddleware(lambda request: HttpResponse())
+        with mock.patch('shop.middleware.random.random', return_value=0.25):
+            self.assertNotIn('Server-Timing', middleware(RequestFactory().get('/')))
+        with mock.patch('shop.middleware.random.random', return_value=0.24), \
+                self.assertLogs('shop.instrumentation', 'INFO'):
+            self.assertIn('Server-Timing', middleware(RequestFactory().get('/')))
+
+    @instrumentation_settings(ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestInstrumentationMiddleware(lambda request: HttpResponse())
@@ -0,0 +1,124 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from shop import profiling
+
+
+def profiling_settings(directory, **overrides):
+    return override_settings(SHOP_PROFILING={'ENABLED': True, 'SAMPLER': False, 'DIR': directory,
+                                             'SAMPLE_INTERVAL': 0.001, **overrides})
+
+
+def outer():
+    return inner()
+
+
+def inner():
+    return profiling.fold(sys._getframe())
+
+
+def blocked(event):
+    event.wait()
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def request(self, user, path='/', **headers):
+        with profiling_settings(self.directory):
+            middleware = profiling.ProfilingMiddleware(lambda request: HttpResponse('page'))
+        request = RequestFactory().get(path, headers=headers)
+        request.user = user
+        return middleware(request)
+
+    def test_anonymous_and_non_staff_are_not_profiled(self):
+        for user in (AnonymousUser(), User(username='customer')):
+            for mode in ('1', 'stats', 'sample'):
+                with self.subTest(user=user, mode=mode):
+                    for response in (self.request(user, f'/?__profile={mode}'),
+                                     self.request(user, X_Shop_Profile=mode)):
+                        self.assertEqual(response.content, b'page')
+                        self.assertNotIn('X-Shop-Profile', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_staff_stats(self):
+        response = self.request(User(username='staff', is_staff=True), X_Shop_Profile='stats')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn(b'function calls', response.content)
+
+    def test_staff_cprofile_and_sample_are_saved(self):
+        for mode, extension in (('cprofile', '.prof'), ('sample', '.folded')):
+            with self.subTest(mode=mode):
+                response = self.request(User(username='staff', is_staff=True), f'/?__profile={mode}')
+                self.assertEqual(response.content, b'page')
+                self.assertTrue(response['X-Shop-Profile'].endswith(f'-unresolved-{os.getpid()}{extension}'))
+                self.assertTrue(os.path.exists(os.path.join(self.directory, response['X-Shop-Profile'])))
+
+    def test_unknown_mode_is_ignored(self):
+        response = self.request(User(username='staff', is_staff=True), '/?__profile=everything')
+        self.assertNotIn('X-Shop-Profile', response)
+
+    def test_disabled(self):
+        with profiling_settings(self.directory, ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: HttpResponse())
+
+
+class StackSamplerTests(SimpleTestCase):
+    def test_fold(self):
+        self.assertTrue(outer().endswith(f'{__name__}:outer;{__name__}:inner'))
+
+    def test_folded_stacks(self):
+        event = threading.Event()
+        thread = threading.Thread(target=blocked, args=(event,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(event.set)
+        sampler = profiling.StackSampler({thread.ident, -1})
+        sampler.sample()
+        sampler.sample()
+        sampler.stacks['other'] += 1
+
+        lines = sampler.folded().splitlines()
+        self.assertEqual(len(lines), 2)
+        # flamegraph.pl format, most frequent stack first
+        self.assertRegex(lines[0], rf'^\S*;{re.escape(__name__)}:blocked;\S+ 2$')
+        self.assertEqual(lines[1], 'other 1')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sampled.folded')
+            sampler.write(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), sampler.folded())
+            self.assertEqual(os.listdir(directory), ['sampled.folded'])
+
+    def test_max_stacks(self):
+        sampler = profiling.StackSampler({threading.get_ident()}, max_stacks=1)
+        sampler.stacks = Counter({'other': 1})
+        sampler.sample()
+        self.assertEqual((sampler.samples, sampler.dropped), (0, 1))
+
+    def test_backs_off_when_over_budget(self):
+        sampler = profiling.StackSampler({threading.get_ident()}, interval=0.001, duration=0.05, max_overhead=0)
+        sampler.start()
+        sampler.join(timeout=5)
+        self.assertFalse(sampler.is_alive())
+        self.assertGreater(sampler.samples, 0)
+        self.assertGreaterEqual(sampler.interval, 0.002)
+        self.assertLessEqual(sampler.interval, 1.0)
+
+    def test_stops_after_duration(self):
+        sampler = profiling.StackSampler(set(), interval=0.001, duration=0.01)
+        sampler.start()
+        sampler.join(timeout=5)
+        self.assertFalse(sampler.is_alive())
@@ -0,0 +1,147 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from shop import ratelimit
+
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit-tests'}}
+
+
+def limiter_settings(**overrides):
+    return override_settings(SHOP_RATELIMIT={'ENABLED': True, 'CACHE': 'default', 'PROXY_COUNT': 0, 'RATES': {},
+                                             **overrides})
+
+
+class ParseRateTests(SimpleTestCase):
+    def test_rates(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('100/5m'), (100, 300))
+        self.assertEqual(ratelimit.parse_rate('3/h'), (3, 3600))
+        self.assertEqual(ratelimit.parse_rate('0/s'), (0, 1))
+
+
+class ClientIPTests(SimpleTestCase):
+    def request(self, forwarded=None):
+        headers = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded is not None else {}
+        return RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **headers)
+
+    @limiter_settings(PROXY_COUNT=0)
+    def test_without_proxies_forwarded_header_is_ignored(self):
+        self.assertEqual(ratelimit.client_ip(self.request('203.0.113.9')), '10.0.0.1')
+
+    @limiter_settings(PROXY_COUNT=1)
+    def test_one_proxy_uses_the_address_it_appended(self):
+        self.assertEqual(ratelimit.client_ip(self.request('203.0.113.9')), '203.0.113.9')
+
+    @limiter_settings(PROXY_COUNT=1)
+    def test_spoofed_entries_are_ignored(self):
+        # The client sent "1.2.3.4"; the proxy appended the real address
+        self.assertEqual(ratelimit.client_ip(self.request('1.2.3.4, 203.0.113.9')), '203.0.113.9')
+
+    @limiter_settings(PROXY_COUNT=2)
+    def test_two_proxies(self):
+        self.assertEqual(ratelimit.client_ip(self.request('1.2.3.4, 203.0.113.9, 198.51.100.7')), '203.0.113.9')
+
+    @limiter_settings(PROXY_COUNT=2)
+    def test_fewer_entries_than_proxies_falls_back(self):
+        self.assertEqual(ratelimit.client_ip(self.request('203.0.113.9')), '10.0.0.1')
+
+    @limiter_settings(PROXY_COUNT=1)
+    def test_missing_or_blank_header_falls_back(self):
+        self.assertEqual(ratelimit.client_ip(self.request()), '10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(self.request(' , ')), '10.0.0.1')
+
+
+@override_settings(CACHES=CACHES)
+@limiter_settings()
+class HitTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def hits(self, count, at, identity='1.2.3.4', limit=3, period=60, scope='test'):
+        with mock.patch('shop.ratelimit.time.time', return_value=at):
+            return [ratelimit.hit(scope, identity, limit, period) for _ in range(count)]
+
+    def test_allows_up_to_the_limit(self):
+        self.assertEqual(self.hits(3, at=6000.0), [0, 0, 0])
+
+    def test_over_the_limit_waits_until_the_window_ends(self):
+        self.assertEqual(self.hits(4, at=6015.0), [0, 0, 0, 45])
+
+    def test_retry_after_is_at_least_one_second(self):
+        self.assertEqual(self.hits(4, at=6059.9)[-1], 1)
+
+    def test_previous_window_counts_by_its_overlap(self):
+        self.hits(3, at=6030.0)
+        # Halfway into the next window, 3 * 0.5 = 1.5 of the old requests still count
+        self.assertEqual(self.hits(1, at=6090.0), [0])
+        self.assertEqual(self.hits(1, at=6090.0), [30])
+
+    def test_previous_window_fully_expires(self):
+        self.hits(3, at=6030.0)
+        self.assertEqual(self.hits(3, at=6179.0), [0, 0, 0])
+
+    def test_identities_and_scopes_are_separate(self):
+        self.hits(3, at=6000.0)
+        self.assertEqual(self.hits(1, at=6000.0, identity='5.6.7.8'), [0])
+        self.assertEqual(self.hits(1, at=6000.0, scope='other'), [0])
+        self.assertEqual(self.hits(1, at=6000.0), [60])
+
+    def test_zero_limit_rejects_everything(self):
+        self.assertEqual(self.hits(1, at=6000.0, limit=0), [60])
+
+    def test_counter_evicted_between_add_and_incr(self):
+        cache = caches['default']
+        with mock.patch.object(cache, 'incr', side_effect=ValueError), \
+                mock.patch('shop.ratelimit.caches', {'default': cache}):
+            self.assertEqual(self.hits(1, at=6000.0), [0])
+        self.assertEqual(self.hits(2, at=6000.0), [0, 0])
+        self.assertEqual(self.hits(1, at=6000.0), [60])
+
+
+@override_settings(CACHES=CACHES)
+class DecoratorTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.view = ratelimit.ratelimit('login-ip', '2/m')(lambda request: HttpResponse('ok'))
+        self.factory = RequestFactory()
+
+    def post(self, **headers):
+        return self.view(self.factory.post('/login/', REMOTE_ADDR='10.0.0.1', **headers))
+
+    @limiter_settings()
+    def test_rejects_with_429_and_retry_after(self):
+        self.assertEqual([self.post().status_code for _ in range(3)], [200, 200, 429])
+        response = self.post(HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    @limiter_settings()
+    def test_only_counts_listed_methods(self):
+        for _ in range(5):
+            self.assertEqual(self.view(self.factory.get('/login/', REMOTE_ADDR='10.0.0.1')).status_code, 200)
+        self.assertEqual(self.post().status_code, 200)
+
+    @limiter_settings(RATES={'login-ip': '1/m'})
+    def test_configured_rate_overrides_default(self):
+        self.assertEqual([self.post().status_code for _ in range(2)], [200, 429])
+
+    @limiter_settings(ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual({self.post().status_code for _ in range(5)}, {200})
+
+    @limiter_settings()
+    def test_empty_key_is_not_limited(self):
+        view = ratelimit.ratelimit('login-account', '0/m', key=ratelimit.post_field('username'))(
+            lambda request: HttpResponse('ok'))
+        self.assertEqual(view(self.factory.post('/login/', {'username': '  '})).status_code, 200)
+        self.assertEqual(view(self.factory.post('/login/', {'username': ' Bob '})).status_code, 429)
+
+    @limiter_settings()
+    def test_cache_failure_fails_open(self):
+        with mock.patch('shop.ratelimit.hit', side_effect=ConnectionError), self.assertLogs('shop.ratelimit'):
+            self.assertEqual(self.post().status_code, 200)
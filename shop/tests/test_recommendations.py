@@ -0,0 +1,108 @@
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from shop import recommendations
+from shop.models import Cart, CartItem, Category, Product, ProductRecommendation, Wishlist, WishlistItem
+
+
+# user -> products. Product 1 shares two baskets with 2 and one each with 3, 4 and 5
+# (which is in more baskets than 3 and 4)
+BASKETS = {1: [1, 2, 3], 2: [1, 2], 3: [1, 4], 4: [2], 5: [1, 5], 6: [5, 6]}
+PAIRS = [(user_id, product_id) for user_id, products in BASKETS.items() for product_id in products]
+
+
+def pure_python():
+    return mock.patch.multiple(recommendations, np=None, sparse=None, _numpy_checked=True)
+
+
+class NeighbourTests(SimpleTestCase):
+    def neighbours(self, targets, **kwargs):
+        with pure_python():
+            return dict(recommendations.neighbours(iter(PAIRS), targets, **kwargs))
+
+    def test_top_n(self):
+        self.assertEqual(self.neighbours({1}, top=4)[1], [(2, 2 / 12 ** 0.5), (3, 0.5), (4, 0.5), (5, 1 / 8 ** 0.5)])
+        # 3 and 4 tie for second place: the lower id wins
+        self.assertEqual(self.neighbours({1}, top=2)[1], [(2, 2 / 12 ** 0.5), (3, 0.5)])
+
+    def test_min_support(self):
+        self.assertEqual(self.neighbours({1}, min_support=2)[1], [(2, 2 / 12 ** 0.5)])
+
+    def test_unknown_product(self):
+        self.assertEqual(self.neighbours({1, 99}, top=1), {1: [(2, 2 / 12 ** 0.5)], 99: []})
+
+    def test_duplicate_lines_count_once(self):
+        with pure_python():
+            found = dict(recommendations.neighbours(iter(PAIRS + [(2, 2), (2, 1)]), {1}, top=1))
+        self.assertEqual(found, {1: [(2, 2 / 12 ** 0.5)]})
+
+
+class ComputeTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Tiles', slug='tiles')
+        for pk in range(1, 7):
+            Product.objects.create(pk=pk, name=f'Tile {pk}', description='', price=Decimal('10'), category=category)
+        for user_id, products in BASKETS.items():
+            user = User.objects.create(pk=user_id, username=f'user{user_id}')
+            # Split each basket between the cart and the wishlist
+            cart = Cart.objects.create(user=user)
+            wishlist = Wishlist.objects.create(user=user)
+            for position, product_id in enumerate(products):
+                if position % 2:
+                    WishlistItem.objects.create(wishlist=wishlist, product_id=product_id)
+                else:
+                    CartItem.objects.create(cart=cart, product_id=product_id, quantity=1)
+
+    def stored(self):
+        return {
+            product_id: [(recommended_id, round(score, 5)) for recommended_id, score in ProductRecommendation.objects
+                         .filter(product_id=product_id).order_by('rank').values_list('recommended_id', 'score')]
+            for product_id in range(1, 7)
+        }
+
+    def test_compute_stores_top_n(self):
+        with pure_python():
+            self.assertEqual(recommendations.compute(full=True, top=2), 6)
+        stored = self.stored()
+        self.assertEqual([other for other, _ in stored[1]], [2, 3])
+        self.assertEqual([other for other, _ in stored[6]], [5])
+
+    @skipUnless(recommendations._have_numpy(), 'requires numpy and scipy')
+    def test_sparse_matches_pure_python(self):
+        for top in (1, 2, 12):
+            with self.subTest(top=top):
+                recommendations.compute(full=True, top=top)
+                sparse = self.stored()
+                with pure_python():
+                    recommendations.compute(full=True, top=top)
+                self.assertEqual(self.stored(), sparse)
+
+
+class RelatedProductsTests(TestCase):
+    def setUp(self):
+        self.tiles = Category.objects.create(name='Tiles', slug='tiles')
+        grout = Category.objects.create(name='Grout', slug='grout')
+        self.products = [self.product(self.tiles) for _ in range(4)]
+        self.sealer = self.product(grout)
+
+    def product(self, category):
+        return Product.objects.create(name='Tile', description='', price=Decimal('10'), category=category)
+
+    def test_recommendations_first(self):
+        first, second, *_ = self.products
+        ProductRecommendation.objects.create(product=second, rank=0, recommended=self.sealer, score=0.9)
+        ProductRecommendation.objects.create(product=second, rank=1, recommended=first, score=0.5)
+        with self.assertNumQueries(1):
+            self.assertEqual(recommendations.related_products(second, 2), [self.sealer, first])
+
+    def test_topped_up_from_category(self):
+        first, second, third, fourth = self.products
+        ProductRecommendation.objects.create(product=third, rank=0, recommended=self.sealer, score=0.9)
+        # After the product by primary key, wrapping around to the start
+        self.assertEqual(recommendations.related_products(third, 3), [self.sealer, fourth, first])
+        ProductRecommendation.objects.create(product=third, rank=1, recommended=fourth, score=0.5)
+        self.assertEqual(recommendations.related_products(third, 3), [self.sealer, fourth, first])
+        self.assertEqual(recommendations.related_products(first, 3), [second, third, fourth])
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from shop import routers
+from shop.models import Cart, CatalogVersion, Product
+
+
+def replica_settings(*aliases):
+    return override_settings(SHOP_REPLICAS={'DATABASES': list(aliases), 'PIN_SECONDS': 5, 'COOKIE': 'shop_primary'})
+
+
+@replica_settings('replica', 'replica_2')
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers.start_request()
+        self.addCleanup(routers.start_request)
+
+    def test_catalog_reads_use_one_replica_per_request(self):
+        replica = self.router.db_for_read(Product)
+        self.assertIn(replica, ('replica', 'replica_2'))
+        self.assertEqual({self.router.db_for_read(model) for model in (Product, CatalogVersion)}, {replica})
+
+    def test_other_models_read_from_default(self):
+        self.assertIsNone(self.router.db_for_read(Cart))
+
+    def test_write_pins_the_rest_of_the_request(self):
+        self.assertEqual(self.router.db_for_write(Cart), 'default')
+        self.assertTrue(routers.wrote())
+        self.assertIsNone(self.router.db_for_read(Product))
+        routers.start_request()
+        self.assertIsNotNone(self.router.db_for_read(Product))
+
+    def test_session_writes_do_not_pin(self):
+        self.router.db_for_write(Session)
+        self.assertFalse(routers.wrote())
+        self.assertIsNotNone(self.router.db_for_read(Product))
+
+    def test_pinned_request(self):
+        routers.start_request(pinned=True)
+        self.assertIsNone(self.router.db_for_read(Product))
+        self.assertFalse(routers.wrote())
+
+    def test_transactions_read_from_default(self):
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertIsNone(self.router.db_for_read(Product))
+
+    @replica_settings()
+    def test_without_replicas(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_relations_and_migrations(self):
+        product, other = Product(), Product()
+        product._state.db, other._state.db = 'replica', 'default'
+        self.assertTrue(self.router.allow_relation(product, other))
+        other._state.db = 'elsewhere'
+        self.assertIsNone(self.router.allow_relation(product, other))
+        self.assertIs(self.router.allow_migrate('replica_2', 'shop'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'shop'))
+
+
+@replica_settings('replica')
+class ReplicaPinningMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.reads = []
+        self.addCleanup(routers.start_request)
+
+    def view(self, write):
+        def get_response(request):
+            if write:
+                self.router.db_for_write(Cart)
+            self.reads.append(self.router.db_for_read(Product))
+            return HttpResponse()
+        return routers.ReplicaPinningMiddleware(get_response)
+
+    def test_write_sets_pin_cookie(self):
+        response = self.view(write=True)(RequestFactory().post('/cart/add/1/'))
+        cookie = response.cookies['shop_primary']
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(self.reads, [None])
+
+    def test_pin_cookie_reads_from_default(self):
+        request = RequestFactory().get('/products/')
+        request.COOKIES['shop_primary'] = '1'
+        response = self.view(write=False)(request)
+        self.assertNotIn('shop_primary', response.cookies)
+        self.assertEqual(self.reads, [None])
+
+    def test_each_request_starts_unpinned(self):
+        self.view(write=True)(RequestFactory().post('/cart/add/1/'))
+        response = self.view(write=False)(RequestFactory().get('/products/'))
+        self.assertNotIn('shop_primary', response.cookies)
+        self.assertEqual(self.reads, [None, 'replica'])
+
+    @replica_settings()
+    def test_not_used_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            routers.ReplicaPinningMiddleware(lambda request: HttpResponse())
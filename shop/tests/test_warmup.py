@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from shop import warmup
+
+
+class WarmTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(warmup, 'completed', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def steps(self, *failing):
+        def step(name):
+            def run():
+                if name in failing:
+                    raise RuntimeError(name)
+            return run
+        return mock.patch.object(warmup, 'STEPS', tuple((name, step(name)) for name in ('connections', 'urls')))
+
+    def connections(self, *in_atomic_block):
+        found = [mock.Mock(in_atomic_block=atomic) for atomic in in_atomic_block]
+        return found, mock.patch('shop.warmup.connections.all', return_value=found)
+
+    def test_all_steps_succeed(self):
+        found, connections = self.connections(False)
+        with self.steps(), connections:
+            self.assertEqual(set(warmup.warm()), {'connections', 'urls'})
+        self.assertIsNotNone(warmup.completed)
+        found[0].close.assert_called_once_with()
+
+    def test_failed_step_is_logged_and_skipped(self):
+        _, connections = self.connections()
+        with self.steps('connections'), connections, self.assertLogs('shop.warmup', 'ERROR'):
+            self.assertEqual(set(warmup.warm()), {'urls'})
+        self.assertIsNone(warmup.completed)
+
+    def test_connections_in_a_transaction_stay_open(self):
+        (idle, busy), connections = self.connections(False, True)
+        with self.steps(), connections:
+            warmup.warm()
+        idle.close.assert_called_once_with()
+        busy.close.assert_not_called()
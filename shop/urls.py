@@ -1,9 +1,11 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('products/', views.products_list, name='products_list'),
+    path('products/facets/', views.product_facets, name='product_facets'),
+    path('products/autocomplete/', views.product_autocomplete, name='product_autocomplete'),
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
     path('cart/', views.cart_view, name='cart'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
@@ -23,4 +25,12 @@ urlpatterns = [
     path('login/', views.user_login, name='login'),
     path('signup/', views.user_signup, name='signup'),
     path('logout/', views.user_logout, name='logout'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('healthz', views.healthz, name='healthz'),
+    path('readyz', views.readyz, name='readyz'),
+    path('robots.txt', views.robots_txt, name='robots_txt'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    re_path(r'^(?P<filename>sitemap-(?:catalog|products)-\d+\.xml\.gz)$', views.sitemap_section,
+            name='sitemap_section'),
+    re_path(r'^feeds/(?P<filename>products\.(?:xml|csv)\.gz)$', views.product_feed, name='product_feed'),
 ]
@@ -1,80 +1,69 @@
+import time
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, Http404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
 from django.contrib import messages
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition
+from . import autocomplete, carts, catalog, facets, feeds, health, metrics, recommendations
+from .accounts import create_customer, load_profile, profile_validators, update_profile
+from .addresses import add_address, address_book, save_address
+from .backends import users_by_login
+from .ratelimit import ratelimit, post_field
 from .models import Product, Category, Cart, CartItem, Address, UserProfile, Wishlist, WishlistItem
 
 
-# Helper functions for session-based cart
+# Helper functions for the anonymous cart, kept in the session or a cookie (shop.carts)
 def get_session_cart(request):
-    """Get cart dictionary from session, create if doesn't exist"""
-    if 'cart' not in request.session:
-        request.session['cart'] = {}
-    return request.session['cart']
+    """Get the cart dictionary of product id to quantity"""
+    return carts.load(request)
 
 
 def add_to_session_cart(request, product_id, quantity=1):
     """Add product to session cart"""
-    cart = get_session_cart(request)
-    product_id_str = str(product_id)
-    
-    if product_id_str in cart:
-        cart[product_id_str] += quantity
-    else:
-        cart[product_id_str] = quantity
-    
-    request.session.modified = True
+    cart = carts.load(request)
+    cart[product_id] = cart.get(product_id, 0) + quantity
+    carts.save(request, cart)
 
 
 def remove_from_session_cart(request, product_id):
     """Remove product from session cart"""
-    cart = get_session_cart(request)
-    product_id_str = str(product_id)
-    
-    if product_id_str in cart:
-        del cart[product_id_str]
-        request.session.modified = True
+    cart = carts.load(request)
+    if cart.pop(product_id, None) is not None:
+        carts.save(request, cart)
 
 
 def update_session_cart_item(request, product_id, quantity):
     """Update product quantity in session cart"""
-    cart = get_session_cart(request)
-    product_id_str = str(product_id)
-    
+    cart = carts.load(request)
     if quantity > 0:
-        cart[product_id_str] = quantity
-    elif product_id_str in cart:
-        del cart[product_id_str]
-    
-    request.session.modified = True
+        cart[product_id] = quantity
+    else:
+        cart.pop(product_id, None)
+    carts.save(request, cart)
 
 
 def clear_session_cart(request):
     """Clear all items from session cart"""
-    request.session['cart'] = {}
-    request.session.modified = True
+    carts.save(request, {})
 
 
 def get_session_cart_items(request):
-    """Get list of cart items from session"""
-    cart = get_session_cart(request)
-    items = []
-    
-    for product_id_str, quantity in cart.items():
-        try:
-            product = Product.objects.get(pk=int(product_id_str))
-            items.append({
-                'product': product,
-                'quantity': quantity,
-                'product_id': int(product_id_str)
-            })
-        except Product.DoesNotExist:
-            pass
-    
-    return items
+    """Get list of cart items, with their products loaded in one query"""
+    cart = carts.load(request)
+    products = Product.objects.in_bulk(cart)
+    return [
+        {'product': products[product_id], 'quantity': quantity, 'product_id': product_id}
+        for product_id, quantity in cart.items()
+        if product_id in products
+    ]
 
 
 def get_session_cart_total_price(request):
@@ -97,31 +86,40 @@ def merge_session_cart_to_user(request, user):
     session_items = get_session_cart_items(request)
     
     if session_items:
-        # Get or create user's cart
-        user_cart, created = Cart.objects.get_or_create(user=user)
-        
-        # Add each session item to user's cart
-        for item in session_items:
-            product = item['product']
-            quantity = item['quantity']
+        with metrics.CART_MERGE_SECONDS.time():
+            # Get or create user's cart
+            user_cart, created = Cart.objects.get_or_create(user=user)
             
-            # Get or create cart item
-            cart_item, item_created = CartItem.objects.get_or_create(
-                cart=user_cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
+            # Add each session item to user's cart
+            for item in session_items:
+                product = item['product']
+                quantity = item['quantity']
+                
+                # Get or create cart item
+                cart_item, item_created = CartItem.objects.get_or_create(
+                    cart=user_cart,
+                    product=product,
+                    defaults={'quantity': quantity}
+                )
+                
+                # If item already exists, add to quantity
+                if not item_created:
+                    cart_item.quantity += quantity
+                    cart_item.save()
             
-            # If item already exists, add to quantity
-            if not item_created:
-                cart_item.quantity += quantity
-                cart_item.save()
-        
-        # Clear session cart
-        clear_session_cart(request)
+            # Clear session cart
+            clear_session_cart(request)
+
+
 
+def _product_validators(request, pk):
+    if not Product.objects.filter(pk=pk).exists():
+        return None
+    # Related products come from any category, so any catalog change counts
+    return catalog.validators(request, catalog.CATALOG, catalog.RECOMMENDATIONS)
 
 
+@catalog.catalog_page(lambda request: catalog.validators(request, catalog.CATALOG))
 def home(request):
     """
     Home page view - displays featured products and categories
@@ -137,18 +135,32 @@ def home(request):
     return render(request, 'shop/index.html', context)
 
 
+def _facet_filters(request):
+    """Selected categories and price buckets; 404 for unknown category slugs"""
+    category_slugs = {slug for slug in request.GET.getlist('category') if slug}
+    selected_categories = list(Category.objects.filter(slug__in=category_slugs)) if category_slugs else []
+    if len(selected_categories) != len(category_slugs):
+        raise Http404('No Category matches the given query.')
+    return selected_categories, facets.parse_buckets(request.GET.getlist('price'))
+
+
+# The sidebar shows counts for every category, so listings depend on the whole catalog
+@catalog.catalog_page(lambda request: catalog.validators(request, catalog.CATALOG))
 def products_list(request):
     """
     Products listing view - displays all products with filtering and pagination
+    Filters by any number of categories and price buckets
     """
-    products = Product.objects.all()
+    started = time.perf_counter()
+    products = Product.objects.select_related('category')
     categories = Category.objects.all()
     
-    # Filter by category if provided
-    category_slug = request.GET.get('category')
-    if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
+    # Filter by categories and price buckets if provided
+    selected_categories, price_buckets = _facet_filters(request)
+    if selected_categories:
+        products = products.filter(category__in=selected_categories)
+    if price_buckets:
+        products = products.filter(facets.price_filter(price_buckets))
     
     # Sort by price if provided
     sort_by = request.GET.get('sort', '-created_at')
@@ -173,24 +185,65 @@ def products_list(request):
         'page_obj': page_obj,
         'products': page_obj.object_list,
         'categories': categories,
-        'selected_category': category_slug,
+        'facets': facets.sidebar(request.GET, categories, selected_categories, price_buckets),
         'search_query': search_query,
         'sort_by': sort_by,
     }
     
-    return render(request, 'shop/products_list.html', context)
+    response = render(request, 'shop/products_list.html', context)
+    if search_query:
+        metrics.SEARCH_SECONDS.observe(time.perf_counter() - started)
+    return response
+
+
+@catalog.catalog_page(lambda request: catalog.validators(request, catalog.CATALOG, per_user=False), per_user=False)
+def product_facets(request):
+    """
+    Facet counts for the listing sidebar as JSON
+    Accepts the same category and price parameters as the products list
+    """
+    selected_categories, price_buckets = _facet_filters(request)
+    categories = Category.objects.only('pk', 'name', 'slug')
+    return JsonResponse(facets.sidebar(request.GET, categories, selected_categories, price_buckets))
+
+
+def product_autocomplete(request):
+    """
+    Search-as-you-type suggestions as JSON
+    Served from the in-memory index in shop.autocomplete, without queries
+    """
+    query = request.GET.get('q', '')[:100]
+    try:
+        limit = int(request.GET['limit'])
+    except (KeyError, ValueError):
+        limit = None
+    products, categories = autocomplete.suggest(query, limit)
+    listing = reverse('products_list')
+    response = JsonResponse({
+        'query': query,
+        'products': [
+            {'id': pk, 'name': name, 'url': reverse('product_detail', args=[pk])}
+            for pk, name in products
+        ],
+        'categories': [
+            {'slug': slug, 'name': name, 'url': f'{listing}?{urlencode({"category": slug})}'}
+            for slug, name in categories
+        ],
+    })
+    # Suggestions are the same for everyone; let browsers and CDNs reuse them briefly
+    patch_cache_control(response, public=True, max_age=settings.SHOP_AUTOCOMPLETE['HTTP_MAX_AGE'])
+    return response
 
 
+@catalog.catalog_page(_product_validators)
 def product_detail(request, pk):
     """
     Product detail view - displays a single product's information
     """
     product = get_object_or_404(Product, pk=pk)
     
-    # Get related products from the same category
-    related_products = Product.objects.filter(
-        category=product.category
-    ).exclude(pk=pk)[:3]
+    # Precomputed recommendations, topped up from the same category
+    related_products = recommendations.related_products(product, 3)
     
     context = {
         'product': product,
@@ -231,6 +284,7 @@ def cart_view(request):
 
 
 
+@ratelimit('cart', '120/m', methods=None)
 def add_to_cart(request, product_id):
     """
     Add a product to the cart or update quantity
@@ -263,6 +317,8 @@ def add_to_cart(request, product_id):
         total_items = get_session_cart_total_items(request)
         total_price = str(get_session_cart_total_price(request))
     
+    metrics.CART_ADDS.inc(user='authenticated' if request.user.is_authenticated else 'anonymous')
+    
     # Check if this is an AJAX request
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -294,6 +350,7 @@ def remove_from_cart(request, item_id):
     return redirect('cart')
 
 
+@ratelimit('cart', '120/m')
 def update_cart_item(request, item_id):
     """
     Update the quantity of a cart item - supports both authenticated and anonymous users
@@ -431,31 +488,9 @@ def address(request):
                         'message': 'Please fill all required fields'
                     })
                 
-                # Check if identical address already exists for this user
-                existing_address = Address.objects.filter(
-                    user=request.user,
-                    first_name=address_data['first_name'],
-                    last_name=address_data['last_name'],
-                    address=address_data['address'],
-                    address2=address_data['address2'],
-                    city=address_data['city'],
-                    postal_code=address_data['postal_code'],
-                    state=address_data['state'],
-                    country=address_data['country'],
-                    phone=address_data['phone'],
-                ).first()
-                
-                if existing_address:
-                    # Use existing address instead of creating duplicate
-                    address_id = existing_address.id
-                    message = 'Using existing address'
-                    is_new = False
-                else:
-                    # Save new address to database
-                    new_address = Address.objects.create(user=request.user, **address_data)
-                    address_id = new_address.id
-                    message = 'Address saved successfully'
-                    is_new = True
+                # Reuse an identical saved address instead of creating a duplicate
+                address_id, is_new = add_address(request.user, address_data)
+                message = 'Address saved successfully' if is_new else 'Using existing address'
                 
                 # Store address in session
                 request.session['delivery_address'] = address_data
@@ -475,7 +510,7 @@ def address(request):
     context = {
         'cart': cart,
         'cart_total': cart.get_total_price() if cart else 0,
-        'existing_addresses': Address.objects.filter(user=request.user),
+        'existing_addresses': address_book(request.user),
     }
     
     return render(request, 'shop/address.html', context)
@@ -561,13 +596,14 @@ def update_address(request, address_id):
         address.country = request.POST.get('country', address.country)
         address.phone = request.POST.get('phone', address.phone)
         
-        address.save()
+        # An edit that duplicates another saved address is merged into it
+        address_id = save_address(address)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
                 'message': 'Address updated successfully',
-                'address_id': address.id
+                'address_id': address_id
             })
         else:
             return redirect('profile')
@@ -579,6 +615,7 @@ def update_address(request, address_id):
 
 
 @login_required(login_url='login')
+@metrics.timed(metrics.CHECKOUT_SECONDS)
 def payment(request):
     """
     Payment view - collect payment method and process payment
@@ -639,103 +676,43 @@ def payment(request):
     return render(request, 'shop/payment.html', context)
 
 
+def _profile_validators(request):
+    """ETag and Last-Modified of the profile page, computed once per request"""
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        # Pending flash messages must be rendered, never answered with a 304
+        return None, None
+    if not hasattr(request, '_profile_validators'):
+        request._profile_validators = profile_validators(request.user)
+    return request._profile_validators
+
+
 @login_required(login_url='home')
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: _profile_validators(request)[0],
+    last_modified_func=lambda request: _profile_validators(request)[1],
+)
 def profile(request):
     """
     User profile view - display and manage user profile information
+    Unchanged profiles are answered with 304 Not Modified
     """
-    # Get or create user profile
-    try:
-        user_profile = UserProfile.objects.get(user=request.user)
-    except UserProfile.DoesNotExist:
-        user_profile = UserProfile.objects.create(user=request.user)
-    
     if request.method == 'POST':
-        # Handle profile update
+        user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        update_profile(request.user, user_profile, request.POST, request.FILES)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            # AJAX request
-            first_name = request.POST.get('first_name', '')
-            last_name = request.POST.get('last_name', '')
-            email = request.POST.get('email', '')
-            date_of_birth = request.POST.get('date_of_birth', '')
-            gender = request.POST.get('gender', '')
-            phone_number = request.POST.get('phone_number', '')
-            country_code = request.POST.get('country_code', '+1')
-            
-            # Update user info
-            request.user.first_name = first_name
-            request.user.last_name = last_name
-            request.user.email = email
-            request.user.save()
-            
-            # Update profile info
-            user_profile.date_of_birth = date_of_birth if date_of_birth else None
-            user_profile.gender = gender if gender else None
-            user_profile.phone_number = phone_number
-            user_profile.country_code = country_code
-            
-            # Handle profile picture upload
-            if 'profile_picture' in request.FILES:
-                user_profile.profile_picture = request.FILES['profile_picture']
-            
-            user_profile.save()
-            
             return JsonResponse({
                 'success': True,
                 'message': 'Profile updated successfully!'
             })
-        else:
-            # Regular form submission
-            first_name = request.POST.get('first_name', '')
-            last_name = request.POST.get('last_name', '')
-            email = request.POST.get('email', '')
-            date_of_birth = request.POST.get('date_of_birth', '')
-            gender = request.POST.get('gender', '')
-            phone_number = request.POST.get('phone_number', '')
-            country_code = request.POST.get('country_code', '+1')
-            
-            # Update user info
-            request.user.first_name = first_name
-            request.user.last_name = last_name
-            request.user.email = email
-            request.user.save()
-            
-            # Update profile info
-            user_profile.date_of_birth = date_of_birth if date_of_birth else None
-            user_profile.gender = gender if gender else None
-            user_profile.phone_number = phone_number
-            user_profile.country_code = country_code
-            
-            # Handle profile picture upload
-            if 'profile_picture' in request.FILES:
-                user_profile.profile_picture = request.FILES['profile_picture']
-            
-            user_profile.save()
-            
-            return redirect('profile')
-    
-    # Get user's saved addresses
-    user_addresses = Address.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Get user's wishlist
-    try:
-        wishlist = Wishlist.objects.get(user=request.user)
-        wishlist_items = wishlist.items.all()
-    except Wishlist.DoesNotExist:
-        wishlist = None
-        wishlist_items = []
+        return redirect('profile')
     
-    context = {
-        'user': request.user,
-        'profile': user_profile,
-        'addresses': user_addresses,
-        'wishlist': wishlist,
-        'wishlist_items': wishlist_items,
-    }
-    
-    return render(request, 'shop/profile.html', context)
+    return render(request, 'shop/profile.html', load_profile(request.user))
 
 
+@ratelimit('login-ip', '30/m')
+@ratelimit('login-account', '5/m', key=post_field('username'))
+@metrics.timed(metrics.LOGIN_SECONDS)
 def user_login(request):
     """
     User login view - authenticate user and create session
@@ -752,28 +729,12 @@ def user_login(request):
             messages.error(request, 'Please enter both email and password.')
             return render(request, 'shop/login.html')
         
-        # Try to authenticate with email or username
-        user = None
-        
-        # If input contains @, treat it as email
-        if '@' in email_or_username:
-            try:
-                # Get the first user with matching email (in case of duplicates)
-                user_obj = User.objects.filter(email=email_or_username).first()
-                if user_obj:
-                    user = authenticate(request, username=user_obj.username, password=password)
-                else:
-                    messages.error(request, 'Invalid email or password. Please try again.')
-                    return render(request, 'shop/login.html')
-            except Exception as e:
-                messages.error(request, 'Invalid email or password. Please try again.')
-                return render(request, 'shop/login.html')
-        else:
-            # Treat as username
-            user = authenticate(request, username=email_or_username, password=password)
+        # Authenticate with email or username (see shop.backends)
+        user = authenticate(request, username=email_or_username, password=password)
         
         if user is not None:
             login(request, user)
+            metrics.LOGINS.inc(result='success')
             
             # Merge session cart with user cart
             merge_session_cart_to_user(request, user)
@@ -790,6 +751,7 @@ def user_login(request):
             next_page = request.GET.get('next', 'home')
             return redirect(next_page)
         else:
+            metrics.LOGINS.inc(result='failure')
             messages.error(request, 'Invalid email or password. Please try again.')
             return render(request, 'shop/login.html')
     
@@ -797,6 +759,8 @@ def user_login(request):
     return render(request, 'shop/login.html', context)
 
 
+@ratelimit('signup-ip', '10/h')
+@ratelimit('signup-account', '3/h', key=post_field('email'))
 def user_signup(request):
     """
     User signup view - create new user account
@@ -825,33 +789,19 @@ def user_signup(request):
             return render(request, 'shop/signup.html')
         
         # Check if email already exists
-        if User.objects.filter(email=email).exists():
+        if users_by_login(email).exists():
             messages.error(request, 'Email already registered. Please login or use a different email.')
             return render(request, 'shop/signup.html')
         
-        # Create user
+        # Create user and profile (username derived from the email)
         try:
-            # Use email as username
-            username = email.split('@')[0]
-            
-            # Make username unique if it already exists
-            if User.objects.filter(username=username).exists():
-                counter = 1
-                while User.objects.filter(username=f'{username}{counter}').exists():
-                    counter += 1
-                username = f'{username}{counter}'
-            
-            user = User.objects.create_user(
-                username=username,
+            user = create_customer(
                 email=email,
                 password=password,
                 first_name=first_name,
                 last_name=last_name
             )
             
-            # Create user profile
-            UserProfile.objects.create(user=user)
-            
             # Auto-login the new user
             login(request, user)
             
@@ -993,3 +943,74 @@ def is_in_wishlist(request, product_id):
         })
 
 
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint - requires the metrics token or a staff session
+    """
+    if not metrics.enabled():
+        raise Http404
+    if not metrics.authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@never_cache
+def healthz(request):
+    """
+    Liveness probe - answers without touching the database or cache
+    """
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+def readyz(request):
+    """
+    Readiness probe - 503 until the database, cache and migrations check out
+    and this worker has warmed up (see shop.health)
+    """
+    ready, checks = health.readiness()
+    return JsonResponse({'status': 'ok' if ready else 'unavailable', 'checks': checks},
+                        status=200 if ready else 503)
+
+
+def sitemap_index(request):
+    """
+    Sitemap index listing the catalog and product sitemaps
+    Generated by the generate_feeds command; served from disk without queries
+    """
+    return feeds.serve(request, feeds.SITEMAP_INDEX)
+
+
+def sitemap_section(request, filename):
+    """
+    One gzipped sitemap file (home, listings and categories, or a product chunk)
+    """
+    return feeds.serve(request, filename)
+
+
+def product_feed(request, filename):
+    """
+    Merchant product feed as gzipped RSS or CSV
+    """
+    return feeds.serve(request, filename)
+
+
+def robots_txt(request):
+    """
+    robots.txt pointing crawlers at the sitemap instead of paginated listings
+    """
+    lines = [
+        'User-agent: *',
+        'Disallow: /cart/',
+        'Disallow: /wishlist/',
+        'Disallow: /profile/',
+        # Every product is in the sitemap; pages, sorts and filters only add crawl load
+        'Disallow: /products/?*page=',
+        'Disallow: /products/?*sort=',
+        'Disallow: /products/?*search=',
+        'Disallow: /products/?*price=',
+        'Disallow: /products/facets/',
+        'Disallow: /products/autocomplete/',
+        f'Sitemap: {request.build_absolute_uri(reverse("sitemap_index"))}',
+    ]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; charset=utf-8')
@@ -0,0 +1,91 @@
+"""
+Warm the per-process caches before a worker takes traffic, so the first
+requests of a new or recycled worker cost what later ones do:
+
+* ``connections`` - connects to every configured database (primary and
+  replicas), which also opens the connection pool when pooling is on
+* ``urls`` - the URL resolver builds its reverse and resolve tables on first use
+* ``templates`` - the cached template loader compiles each template once
+* ``facets`` - category and price facet counts of the product list (shop.facets)
+* ``autocomplete`` - the search suggestion index (shop.autocomplete)
+
+Called by gunicorn's ``post_worker_init`` hook (gunicorn.conf.py), and by
+``/readyz`` in processes that have not warmed up yet (shop.health).
+
+Connections belong to the thread that opened them, and gunicorn's request
+threads never use the one the warmup thread opened, so ``warm`` closes them
+at the end. With pooling they go back to the pool, which stays open for the
+request threads; without it they would otherwise sit idle until the worker
+exits.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+from . import autocomplete, facets
+
+
+logger = logging.getLogger('shop.warmup')
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+# time.time() of the last warmup in which every step succeeded; until then
+# /readyz reports not ready and retries it
+completed = None
+
+
+def _connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _close_connections():
+    for connection in connections.all(initialized_only=True):
+        # Not one a caller's transaction is using
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def _urls():
+    get_resolver().resolve(reverse('products_list'))
+
+
+def _templates():
+    for path in sorted(TEMPLATE_DIR.glob('shop/*.html')):
+        get_template(path.relative_to(TEMPLATE_DIR).as_posix())
+
+
+STEPS = (
+    ('connections', _connections),
+    ('urls', _urls),
+    ('templates', _templates),
+    ('facets', facets.facet_counts),
+    ('autocomplete', autocomplete.current),
+)
+
+
+def warm():
+    """
+    Run every step and return ``{step: seconds}`` for those that succeeded.
+    A failing step is logged and skipped; the worker serves either way.
+    """
+    global completed
+    timings = {}
+    try:
+        for name, step in STEPS:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception('Warmup step %s failed', name)
+                continue
+            timings[name] = time.perf_counter() - started
+    finally:
+        _close_connections()
+    if len(timings) == len(STEPS):
+        completed = time.time()
+    return timings